@@ -0,0 +1,160 @@
+"""Benchmark the per-point latency of AGA8Detail.run() and of its density iteration.
+
+Run from the repository root with the package installed (pip install -e ./src):
+
+    python benchmarks/bench_run.py
+"""
+
+import timeit
+
+from modules.AGA8Detail import AGA8Detail
+
+# C++ reference mixture and the UniSim mixtures from tests/test_AGA8Detail.py
+CASES = {
+    "C++ example": (
+        50000,
+        400,
+        [
+            0.0,
+            0.77824,
+            0.02,
+            0.06,
+            0.08,
+            0.03,
+            0.0015,
+            0.003,
+            0.0005,
+            0.00165,
+            0.00215,
+            0.00088,
+            0.00024,
+            0.00015,
+            0.00009,
+            0.004,
+            0.005,
+            0.002,
+            0.0001,
+            0.0025,
+            0.007,
+            0.001,
+        ],
+    ),
+    "UniSim example 1": (
+        11672.30591,
+        329.1959501,
+        [
+            0.0,
+            0.8605181275,
+            0.00468943511,
+            0.021032297039999998,
+            0.0830931073,
+            0.024005787129999998,
+            0.00266965599,
+            0.00310500342,
+            0.00039002352999999997,
+            0.00023977192000000002,
+            3.197816e-05,
+            4.9399800000000004e-06,
+        ]
+        + [0.0] * 10,
+    ),
+    "UniSim example 2": (
+        11778.85981,
+        331.3596863,
+        [
+            0.0,
+            0.8645574829,
+            0.00471616099,
+            0.02077505707,
+            0.08100759773,
+            0.02299965451,
+            0.0024834801,
+            0.00286307457,
+            0.00035400357,
+            0.00021567912000000001,
+            2.520598e-05,
+            2.6290599999999997e-06,
+        ]
+        + [0.0] * 10,
+    ),
+    "UniSim example 3": (
+        11133.88937,
+        331.0980687,
+        [
+            0.0,
+            0.8616455105,
+            0.00469811792,
+            0.021060977329999998,
+            0.08256866667000001,
+            0.02373943755,
+            0.0026173493199999997,
+            0.0030427240999999997,
+            0.00037079653999999996,
+            0.00022267528000000002,
+            3.035669e-05,
+            3.37521e-06,
+        ]
+        + [0.0] * 10,
+    ),
+    "UniSim example 4": (
+        11845.12799,
+        331.11875,
+        [
+            0.0,
+            0.8627619880999999,
+            0.00491112452,
+            0.02085074657,
+            0.08144546933999999,
+            0.02354307161,
+            0.0026650497,
+            0.00307708257,
+            0.00039213710999999997,
+            0.00024061062,
+            3.428013e-05,
+            6.89542e-06,
+            8.67e-07,
+        ]
+        + [0.0] * 9,
+    ),
+    "UniSim example 5": (
+        11188.62433,
+        328.6182424000824,
+        [
+            0.0,
+            0.8618463533,
+            0.00470927796,
+            0.02033212472,
+            0.08267388868999999,
+            0.02401060257,
+            0.0026570938599999997,
+            0.00309789558,
+            0.0003977758,
+            0.00023328679000000002,
+            3.573006e-05,
+            5.96658e-06,
+        ]
+        + [0.0] * 10,
+    ),
+}
+
+
+def best_of(func, number, repeat=5):
+    """Return the best time per call of func (in microseconds) over repeat runs of number calls."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    """Print the latency of run() and of one pressure_detail() call for each case."""
+    for name, (p, t, x) in CASES.items():
+        run = best_of(lambda: AGA8Detail(p=p, t=t, x=x).run(), number=200)
+
+        aga8 = AGA8Detail(p=p, t=t, x=x).run()
+        pressure = best_of(aga8.pressure_detail, number=2000)
+
+        print(f"{name}:")
+        print(f"\trun()             {run:10.1f} us/point")
+        print(f"\tpressure_detail() {pressure:10.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Benchmark the cold start, every stage of the DETAIL pipeline, batch throughput versus N and multi-core scaling.
+
+The results are written as JSON, so runs on different machines, engines or versions can be compared.
+Run from the repository root with the package installed (pip install -e ./src):
+
+    python benchmarks/bench_suite.py --output results.json
+    python benchmarks/bench_suite.py --quick --engines numpy numba
+    python benchmarks/bench_suite.py --compare baseline.json results.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+from modules.AGA8Detail import AGA8Detail
+from modules.constants import ENGINES, VERSION
+from modules.parallel import compute_parallel
+
+import numpy as np
+
+from bench_run import CASES
+
+BATCH_SIZES = (1, 10, 100, 1_000, 10_000, 100_000)
+SCALING_POINTS = 200_000  # points of the multi-core scaling benchmark
+REGRESSION = 1.10  # --compare flags timings that are more than 10 % slower
+
+
+def best_of(func, number, repeat=5):
+    """Return the best time per call of func (in microseconds) over repeat runs of number calls."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def _timed(func, repeat=3):
+    """Return the best wall time (s) of repeat calls of func and the result of the last call."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+
+def environment():
+    """Return the interpreter, library and machine details of the run."""
+    try:
+        import numba
+
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "aga8_version": VERSION,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": numba_version,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def bench_stages(p, t, x, number):
+    """Time each stage of AGA8Detail.run() for one state point (microseconds per call)."""
+    calc = AGA8Detail(p=p, t=t, x=x).run()
+
+    def density():
+        calc.D = 1e10  # every call starts from the ideal gas estimate, as run() does
+        calc.density_detail()
+
+    return {
+        "init_us": best_of(lambda: AGA8Detail(p=p, t=t, x=x), number),
+        "setup_detail_us": best_of(calc.setup_detail, number),
+        "molar_mass_detail_us": best_of(calc.molar_mass_detail, number),
+        "x_terms_detail_us": best_of(calc.x_terms_detail, number),
+        "density_detail_us": best_of(density, number),
+        "density_iterations": calc.niter,
+        "properties_detail_us": best_of(calc.properties_detail, number),
+        "run_us": best_of(lambda: AGA8Detail(p=p, t=t, x=x).run(), number),
+        "z": calc.z,
+    }
+
+
+def bench_batch(engine, sizes, seed=0):
+    """Time AGA8Detail.run_batch() for N random states of the C++ reference mixture per engine and N."""
+    _, _, x = CASES["C++ example"]
+    rng = np.random.default_rng(seed)
+    AGA8Detail.run_batch([5000], [300], x, engine=engine)  # compile (numba) and warm up outside the timings
+
+    results = []
+    for n in sizes:
+        P = rng.uniform(100, 20000, n)  # Kpa
+        T = rng.uniform(250, 400, n)  # K
+        repeat = 3 if n < 100_000 else 1
+        elapsed, output = _timed(lambda: AGA8Detail.run_batch(P, T, x, engine=engine), repeat)
+        results.append(
+            {
+                "n": n,
+                "seconds": elapsed,
+                "us_per_point": elapsed / n * 1e6,
+                "points_per_second": n / elapsed,
+                "mean_iterations": float(output["niter"].mean()),
+                "failed": int(np.count_nonzero(output["ierr"])),
+            }
+        )
+
+    return results
+
+
+def bench_scaling(engine, n, workers):
+    """Time compute_parallel() on n random states of the C++ reference mixture for each number of workers."""
+    _, _, x = CASES["C++ example"]
+    rng = np.random.default_rng(1)
+    P = rng.uniform(100, 20000, n)  # Kpa
+    T = rng.uniform(250, 400, n)  # K
+
+    results = []
+    for count in workers:
+        # the pool start-up is part of the cost of a call, so it is included in the timing
+        elapsed, _ = _timed(lambda: compute_parallel(P, T, x, workers=count, engine=engine), repeat=1)
+        results.append({"workers": count, "seconds": elapsed, "points_per_second": n / elapsed})
+    for result in results:
+        result["speedup"] = results[0]["seconds"] / result["seconds"]
+        result["efficiency"] = result["speedup"] / result["workers"]
+
+    return results
+
+
+def bench_startup(repeat=5):
+    """Time a cold start in fresh interpreters: importing AGA8Detail and the first run() (milliseconds, best of repeat)."""
+    code = (
+        "import time; start = time.perf_counter(); from modules.AGA8Detail import AGA8Detail; "
+        "imported = time.perf_counter(); AGA8Detail(p=5000, t=300, x=[0, 1] + [0] * 20).run(); "
+        "print(imported - start, time.perf_counter() - start)"
+    )
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        timings.append([float(value) for value in output.split()])
+
+    return {
+        "import_ms": min(imported for imported, _ in timings) * 1e3,
+        "first_result_ms": min(first for _, first in timings) * 1e3,
+    }
+
+
+def run_suite(engines, quick=False):
+    """Run every benchmark and return the results as a JSON-serialisable dict."""
+    number = 20 if quick else 200
+    sizes = BATCH_SIZES[:-1] if quick else BATCH_SIZES
+    n = SCALING_POINTS // 10 if quick else SCALING_POINTS
+    cores = os.cpu_count() or 1
+    workers = sorted({1, *(2**k for k in range(1, cores.bit_length()) if 2**k <= cores), cores})
+
+    report = {
+        "environment": environment(),
+        "startup": bench_startup(3 if quick else 10),
+        "stages": {},
+        "batch": {},
+        "scaling": {},
+    }
+    for name, (p, t, x) in CASES.items():
+        report["stages"][name] = bench_stages(p, t, x, number)
+    for engine in engines:
+        report["batch"][engine] = bench_batch(engine, sizes)
+        report["scaling"][engine] = bench_scaling(engine, n, workers)
+
+    return report
+
+
+def _timings(report):
+    """Flatten the timings of a report into {key: seconds or microseconds} for comparison."""
+    flat = {f"startup/{name}": value for name, value in report.get("startup", {}).items()}
+    for case, stages in report["stages"].items():
+        for name, value in stages.items():
+            if name.endswith("_us"):
+                flat[f"stages/{case}/{name}"] = value
+    for engine, results in report["batch"].items():
+        for result in results:
+            flat[f"batch/{engine}/n={result['n']}/us_per_point"] = result["us_per_point"]
+    for engine, results in report["scaling"].items():
+        for result in results:
+            flat[f"scaling/{engine}/workers={result['workers']}/seconds"] = result["seconds"]
+
+    return flat
+
+
+def compare(baseline, current, threshold=REGRESSION):
+    """Print the ratio current / baseline of every shared timing and return the keys slower than threshold."""
+    old, new = _timings(baseline), _timings(current)
+    slower = []
+    for key in sorted(old.keys() & new.keys()):
+        ratio = new[key] / old[key]
+        flag = ""
+        if ratio > threshold:
+            slower.append(key)
+            flag = "  <-- slower"
+        print(f"{key:70s} {old[key]:12.3f} {new[key]:12.3f} {ratio:6.2f}x{flag}")
+
+    return slower
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="JSON file of the results (default: print them)")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=["numpy"], help="batch engines to time")
+    parser.add_argument("--quick", action="store_true", help="fewer repetitions and smaller batches")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two result files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as old, open(args.compare[1]) as new:
+            slower = compare(json.load(old), json.load(new))
+        return 1 if slower else 0
+
+    report = run_suite(args.engines, quick=args.quick)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
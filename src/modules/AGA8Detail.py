@@ -1,53 +1,189 @@
 """AGA8Detail.py module contains the functionality used in the DETAIL method."""
 
 import math
-
-from modules.initialise import (
-    initialise_an,
-    initialise_bn,
-    initialise_bs,
-    initialise_bsnij2,
-    initialise_csn,
-    initialise_ei,
-    initialise_fi,
-    initialise_fn,
-    initialise_gi,
-    initialise_gn,
-    initialise_i25_arrays,
-    initialise_ij5_arrays,
-    initialise_ij_arrays,
-    initialise_ki,
-    initialise_kn,
-    initialise_n0i,
-    initialise_qi,
-    initialise_qn,
-    initialise_si,
-    initialise_sn,
-    initialise_th0i,
-    initialise_tun,
-    initialise_un,
-    initialise_wi,
-    initialise_wn,
+import sys
+
+from modules.cache import IsothermTerms, composition_key
+from modules.composition import Composition, nonzero_components
+from modules.constants import (
+    EPSILON,
+    FLASH_MAXITER,
+    FLASH_MAXSTEP,
+    FLASH_TOL,
+    MAXFLDS,
+    NCDETAIL,
+    NTERMS,
+    R,
+    SOLVERS,
+    TOLR,
+    get_constants,
+    packed_index,
 )
 from modules.molecule import MmDetail
-
-import numpy as np
+from modules.outputs import FLASH_FAILED, CompositionTerms, evaluation_plan
+from modules.result import DetailResult
+
+# NumPy and the modules built on it (batch, sensitivity) are imported on first use by run_batch() and
+# sensitivity_detail(), so that importing the scalar path and its first run() stay light.
+
+
+def _csn_coefficients(constants):
+    """Return (n, an, un, gn, qn, fn) of the third virial and higher terms n = 13..58, with the flags as bools."""
+    return tuple(
+        (
+            n,
+            constants.an[n],
+            constants.un[n],
+            constants.gn[n] == 1,
+            constants.qn[n] == 1,
+            constants.fn[n] == 1,
+        )
+        for n in range(13, NTERMS + 1)
+    )
+
+
+def _alpha_0_coefficients(constants):
+    """Return, per component, (th0i, n0i, is_sinh) of the hyperbolic ideal gas terms j = 4..7 with th0i > 0."""
+    return tuple(
+        tuple(
+            (constants.th0i[i][j], constants.n0i[i][j], j in (4, 6))
+            for j in range(4, 8)
+            if constants.th0i[i][j] > 0
+        )
+        for i in range(NCDETAIL + 1)
+    )
+
+
+def _x_terms_coefficients(constants):
+    """Return the pure fluid (ki25, ei25, gi, qi, fi) rows and the packed binary pair rows of x_terms_detail().
+
+    Pair row packed_index(i, j) holds (kij5, uij5, gij5, bsnij2[1..18]); the diagonal rows (i = j) feed bs.
+    """
+    pure = tuple(
+        (constants.ki25[i], constants.ei25[i], constants.gi[i], constants.qi[i], constants.fi[i])
+        for i in range(NCDETAIL + 1)
+    )
+    pairs = tuple(
+        (k, u, g) + tuple(b)
+        for k, u, g, b in zip(
+            constants.kij5_packed, constants.uij5_packed, constants.gij5_packed, constants.bsnij2_packed
+        )
+    )
+
+    return pure, pairs
+
+
+def _alpha_r_coefficients(constants):
+    """Precalculate the coefficients of alpha_r_detail() that do not depend on the state or composition.
+
+    Returns:
+        coeft1, coeft2: temperature derivative coefficients R * (un - 1) and R * (un - 1) * un.
+        exp_terms: (n, bn, kn, kn * kn, 1 - kn) of the exponential terms n = 13..58.
+    """
+    un, bn, kn = constants.un, constants.bn, constants.kn
+    coeft1 = tuple(R * (un[n] - 1) for n in range(NTERMS + 1))
+    coeft2 = tuple(coeft1[n] * un[n] for n in range(NTERMS + 1))
+    exp_terms = tuple(
+        (n, int(bn[n]), int(kn[n]), kn[n] * kn[n], 1 - kn[n]) for n in range(13, NTERMS + 1)
+    )
+
+    return coeft1, coeft2, exp_terms
+
+
+def _halley_correction(f, df, d2f):
+    """Return the divisor turning the Newton step f / df of f(vlog) = log(P2 / P) into a Halley step.
+
+    Arguments:
+        f, df, d2f: f and its first and second derivatives with respect to log(v).
+
+    A Newton step is kept (divisor 1) where the correction would more than halve or double the step.
+    """
+    correction = 1 - f * d2f / (2 * df * df)
+    if 0.5 <= correction <= 2:
+        return correction
+
+    return 1
 
 
 class AGA8Detail:
     """Class to approximate the compressibility factor, Z for a gas given its composition x, Pressure, P and temperature, T using AGA8 Detail method."""
 
-    def __init__(self, p, t, x):
-        """Initialisation."""
-        # constant terms
-        self.nterms = 58
-        self.ncdetail = 21
-        self.maxflds = 21
-        self.epsilon = 1e-15
-        self.tolr = 0.0000001
-        self.R = 8.31451
+    # constant terms
+    nterms = NTERMS
+    ncdetail = NCDETAIL
+    maxflds = MAXFLDS
+    epsilon = EPSILON
+    tolr = TOLR
+    R = R
+    mmdetail = MmDetail
+
+    # mixture-independent parameter tables, built once per process and shared by every instance
+    _constants = get_constants()
+    an = _constants.an
+    bn = _constants.bn
+    kn = _constants.kn
+    un = _constants.un
+    fn = _constants.fn
+    gn = _constants.gn
+    qn = _constants.qn
+    sn = _constants.sn
+    wn = _constants.wn
+    ei = _constants.ei  # energy params
+    ki = _constants.ki  # size params
+    gi = _constants.gi  # orientation params
+    eij = _constants.eij
+    uij = _constants.uij
+    kij = _constants.kij
+    gij = _constants.gij
+    # quadrupole params
+    qi = _constants.qi
+    fi = _constants.fi
+    si = _constants.si
+    wi = _constants.wi
+    # ideal gas params (n0i already shifted to the reference density)
+    n0i = _constants.n0i
+    th0i = _constants.th0i
+    # precalculation of constants
+    ki25 = _constants.ki25
+    ei25 = _constants.ei25
+    bsnij2 = _constants.bsnij2
+    kij5 = _constants.kij5
+    uij5 = _constants.uij5
+    gij5 = _constants.gij5
+    # state-invariant coefficients of x_terms_detail(), alpha_r_detail() and alpha_0_detail()
+    _csn_terms = _csn_coefficients(_constants)
+    _coeft1, _coeft2, _exp_terms = _alpha_r_coefficients(_constants)
+    _hyp_terms = _alpha_0_coefficients(_constants)
+    _pure_terms, _pair_terms = _x_terms_coefficients(_constants)
+
+    def __init__(
+        self, p, t, x, cache=None, isotherm_cache=None, solver="newton", properties=None, telemetry=None
+    ):
+        """Initialisation.
+
+        Arguments:
+            p: pressure (kPa).
+            t: temperature (K).
+            x: gas composition as a 22-element list (dummy 0 at index 0) or a modules.composition.Composition.
+            cache: optional LRUCache (modules.cache) shared between calculations to reuse the
+                composition terms of previously seen gas compositions.
+            isotherm_cache: optional LRUCache shared between calculations to reuse the temperature-dependent
+                terms (tun and the ideal gas hyperbolic sums) of previously seen (composition, T) pairs.
+            solver: density iteration scheme, "newton" (first order, as in the C++ code) or "halley"
+                (third order, also uses d2(P)/d(D)2 and usually needs fewer iterations).
+            properties: names of the outputs needed (e.g. {"z", "D"}), every output if None. properties_detail()
+                skips the stages no requested output needs, and the other outputs keep their initial values.
+            telemetry: optional Telemetry (modules.telemetry) recording the stage timings and density
+                iterations of this calculator.
+        """
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown density solver {solver!r}, expected one of {SOLVERS}.")
+
         self.itau = 0
-        self.mmdetail = MmDetail
+        self.solver = solver
+        self.plan = evaluation_plan(properties)
+        self.cache = cache
+        self.isotherm_cache = isotherm_cache
 
         # inputs
         self.P = p  # raw initial P (kPa)
@@ -63,6 +199,7 @@ class AGA8Detail:
         self.MM = 0  # Molar Mass (g/mol)
         self.ar = None
         self.dpddsave = None  # d(P)/d(D) (kPa/(mol/l)) (at constant temperature)
+        self.d2pddsave = None  # d2(P)/d(D)2 (kPa/(mol/l)^2) used by the Halley density iteration
         self.K3 = 0
         self.F = 0
         self.Q = 0
@@ -83,87 +220,36 @@ class AGA8Detail:
         self.G = 0  # Gibbs energy (J/mol)
         self.JT = 0  # Joule-Thomson coefficient (K/kPa)
         self.kappa = 0  # Isentropic exponent
-
-        # initialise arrays
-        self.bs = initialise_bs()
-        self.bsnij2 = initialise_bsnij2(n=self.maxflds)
-        self.an = initialise_an(n=self.nterms)
-        self.bn = initialise_bn(n=self.nterms)
-        self.kn = initialise_kn(n=self.nterms)
-        self.un = initialise_un(n=self.nterms)
-        self.fn = initialise_fn(n=self.nterms)
-        self.gn = initialise_gn(n=self.nterms)
-        self.qn = initialise_qn(n=self.nterms)
-        self.sn = initialise_sn(n=self.nterms)
-        self.wn = initialise_wn(n=self.nterms)
-        self.ei = initialise_ei(n=self.maxflds)  # energy params
-        self.ki = initialise_ki(n=self.maxflds)  # size params
-        self.gi = initialise_gi(n=self.maxflds)  # orientation params
-        self.eij, self.uij, self.kij, self.gij = initialise_ij_arrays(n=self.maxflds)
-        # quadrupole params
-        self.qi = initialise_qi(n=self.maxflds)
-        self.fi = initialise_fi(n=self.maxflds)
-        self.si = initialise_si(n=self.maxflds)
-        self.wi = initialise_wi(n=self.maxflds)
-        # ideal gas params
-        self.n0i = initialise_n0i(n=self.maxflds)
-        self.th0i = initialise_th0i(n=self.maxflds)
-        # precalculation of constants
-        self.ki25, self.ei25 = initialise_i25_arrays(n=self.maxflds)
-        self.kij5, self.uij5, self.gij5 = initialise_ij5_arrays(n=self.maxflds)
-        self.csn = initialise_csn(n=self.nterms)
-        self.tun = initialise_tun(n=self.nterms)
+        self.niter = 0  # number of density iterations of the last density_detail() call
+        self.ncreep = 0  # steps of the last density_detail() call without a usable Newton step
+        self.failure = None  # cause of the last density_detail() failure (see modules.telemetry.FAILURES)
+        self.nflash = 0  # number of temperature iterations of the last flash_ph() or flash_ps() call
+        self._flash_composition = None  # composition whose terms the flash iterations use
+        self.dzdx = None  # d(Z)/d(xi) at constant P and T, see sensitivity_detail() (dummy 0 at index 0)
+        self.dDdx = None  # d(D)/d(xi) at constant P and T (mol/l)
+
+        # initialise per-state arrays
+        self.bs = [0] * (18 + 1)
+        self.csn = [0] * (self.nterms + 1)
+        self.tun = [0] * (self.nterms + 1)
+        self.sumhyp = None
+        self._sumhyp_key = None  # (composition key, T) of sumhyp, as the sums depend on both
+
+        self.telemetry = telemetry
+        if telemetry is not None:
+            telemetry.instrument(self)
 
     def setup_detail(self):
-        """Initialize all the constants and parameters in the DETAIL model."""
-        for i in range(1, self.maxflds + 1):
-            self.ki25[i] = math.pow(self.ki[i], 2.5)
-            self.ei25[i] = math.pow(self.ei[i], 2.5)
-
-        for i in range(1, self.maxflds + 1):
-            for j in range(1, self.maxflds + 1):
-                for n in range(1, 18 + 1):
-                    bsnij = 1  # initialise Bs_nij @ 1
-                    if self.gn[n] == 1:
-                        bsnij = self.gij[i][j] * (self.gi[i] + self.gi[j]) / 2
-                    if self.qn[n] == 1:
-                        bsnij = bsnij * self.qi[i] * self.qi[j]
-                    if self.fn[n] == 1:
-                        bsnij = bsnij * self.fi[i] * self.fi[j]
-                    if self.sn[n] == 1:
-                        bsnij = bsnij * self.si[i] * self.si[j]
-                    if self.wn[n] == 1:
-                        bsnij = bsnij * self.wi[i] * self.wi[j]
-
-                    self.bsnij2[i][j][n] = (
-                        self.an[n]
-                        * math.pow(
-                            self.eij[i][j] * math.sqrt(self.ei[i] * self.ei[j]),
-                            self.un[n],
-                        )
-                        * math.pow(self.ki[i] * self.ki[j], 1.5)
-                        * bsnij
-                    )
-
-                self.kij5[i][j] = (
-                    (math.pow(self.kij[i][j], 5) - 1) * self.ki25[i] * self.ki25[j]
-                )
-                self.uij5[i][j] = (
-                    (math.pow(self.uij[i][j], 5) - 1) * self.ei25[i] * self.ei25[j]
-                )
-                self.gij5[i][j] = (self.gij[i][j] - 1) * (self.gi[i] + self.gi[j]) / 2
-
-        # Ideal gas terms
-        d0 = 101.325 / self.R / 298.15
-
-        for i in range(1, self.maxflds + 1):
-            self.n0i[i][3] = self.n0i[i][3] - 1
-            self.n0i[i][1] = self.n0i[i][1] - math.log(d0)
+        """Initialize all the constants and parameters in the DETAIL model.
 
+        The constants are mixture-independent, so they are built once per process by
+        modules.constants.get_constants() and shared by every instance as class attributes.
+        """
         return self
 
     def molar_mass_detail(self):
         """Calculate the M using (M = Σ mi * xi) where xi = mole fraction of ith component in gas mixture and mi = molar mass of ith component."""
+        self.MM = 0  # reset so that the calculation can be repeated
         for xi in list(
             zip(self.x[1:], self.mmdetail.keys())
         ):  # [:1] to avoid considering dummy 0 at index 0 in list
@@ -173,42 +259,14 @@ class AGA8Detail:
 
     def x_terms_detail(self):
         """Calculate all of the variables related to the input gas composition."""
-        # Calculate pure fluid contributions
-        for i in range(1, self.ncdetail + 1):
-            if self.x[i] > 0:
-                xi2 = math.pow(self.x[i], 2)
-                self.K3 += (
-                    self.x[i] * self.ki25[i]
-                )  # K, U, and G are the sums of a pure fluid contribution and a
-                self.U += self.x[i] * self.ei25[i]  # binary pair contribution
-                self.G += self.x[i] * self.gi[i]
-                self.Q += (
-                    self.x[i] * self.qi[i]
-                )  # Q and F depend only on the pure fluid parts
-                self.F += xi2 * self.fi[i]
-
-                for n in range(1, 18 + 1):
-                    self.bs[n] = (
-                        self.bs[n] + xi2 * self.bsnij2[i][i][n]
-                    )  # Pure fluid contributions to second virial coefficient
-
-        self.K3 = math.pow(self.K3, 2)
-        self.U = math.pow(self.U, 2)
-
-        # Binary pair contributions
-        for i in range(1, self.ncdetail + 1):
-            if self.x[i] > 0:
-                for j in range(i + 1, self.ncdetail + 1):
-                    if self.x[j] > 0:
-                        xij = 2 * self.x[i] * self.x[j]
-                        self.K3 += xij * self.kij5[i][j]
-                        self.U += xij * self.uij5[i][j]
-                        self.G += xij * self.gij5[i][j]
-
-                        for n in range(1, 18 + 1):
-                            self.bs[n] = (
-                                self.bs[n] + xij * self.bsnij2[i][j][n]
-                            )  # Second virial coefficients of mixture
+        # K, U, and G are the sums of a pure fluid contribution and a binary pair contribution,
+        # Q and F depend only on the pure fluid parts. The pure fluid and binary pair sums
+        # (including the second virial coefficients, bs) only visit the nonzero components.
+        # Both kernels add the terms in the same order and give identical sums; the NumPy one is
+        # faster for many components but is only used once the batch module has been loaded.
+        batch = sys.modules.get("modules.batch")
+        x_terms = batch.x_terms_packed if batch is not None else self._x_terms_sums
+        self.K3, self.U, self.G, self.Q, self.F, self.bs = x_terms(self.x)
 
         self.K3 = math.pow(self.K3, 0.6)
         self.U = math.pow(self.U, 0.2)
@@ -216,14 +274,193 @@ class AGA8Detail:
         # Third virial and higher coefficients
         self.Q2 = math.pow(self.Q, 2)
 
-        for n in range(13, self.nterms + 1):
-            self.csn[n] = self.an[n] * math.pow(self.U, self.un[n])
-            if self.gn[n] == 1:
-                self.csn[n] = self.csn[n] * self.G
-            if self.qn[n] == 1:
-                self.csn[n] = self.csn[n] * self.Q2
-            if self.fn[n] == 1:
-                self.csn[n] = self.csn[n] * self.F
+        csn = [0] * (self.nterms + 1)
+        for n, an, un, gn, qn, fn in self._csn_terms:
+            csn[n] = an * math.pow(self.U, un)
+            if gn:
+                csn[n] = csn[n] * self.G
+            if qn:
+                csn[n] = csn[n] * self.Q2
+            if fn:
+                csn[n] = csn[n] * self.F
+        self.csn = csn
+
+        return self
+
+    def _x_terms_sums(self, x):
+        """Calculate the composition sums of x_terms_detail() in pure Python, as modules.batch.x_terms_packed().
+
+        Returns:
+            K3, U, G, Q, F as floats and bs as a 19-element list (bs[0] = 0).
+        """
+        nz = nonzero_components(x)
+        pure = self._pure_terms
+        pairs = self._pair_terms
+        k3 = u = g = q = f = 0.0
+
+        # Calculate pure fluid contributions
+        for i in nz:
+            ki25, ei25, gi, qi, fi = pure[i]
+            k3 += x[i] * ki25
+            u += x[i] * ei25
+            g += x[i] * gi
+            q += x[i] * qi
+            f += math.pow(x[i], 2) * fi
+
+        # Binary pair contributions, accumulated as [K, U, G, bs[1..18]] in the order of the reference loops:
+        # the squared pure fluid sums, the pure fluid bs terms, then the pairs i < j
+        sums = [math.pow(k3, 2), math.pow(u, 2), g] + [0.0] * 18
+        for i in nz:
+            xi2 = math.pow(x[i], 2)
+            diagonal = pairs[packed_index(i, i)]
+            sums[3:] = [total + xi2 * bsnij2 for total, bsnij2 in zip(sums[3:], diagonal[3:])]
+        for a, i in enumerate(nz):
+            xi = 2 * x[i]
+            for j in nz[a + 1 :]:
+                xij = xi * x[j]
+                sums = [total + xij * value for total, value in zip(sums, pairs[packed_index(i, j)])]
+
+        return sums[0], sums[1], sums[2], q, f, [0] + sums[3:]
+
+    def composition_terms(self):
+        """Return the terms calculated by molar_mass_detail() and x_terms_detail() as CompositionTerms."""
+        return CompositionTerms(
+            MM=self.MM,
+            K3=self.K3,
+            U=self.U,
+            G=self.G,
+            Q=self.Q,
+            F=self.F,
+            Q2=self.Q2,
+            bs=tuple(self.bs),
+            csn=tuple(self.csn),
+        )
+
+    def _update_tun(self):
+        """Recalculate the temperature-dependent terms only when T has changed since the last call."""
+        if abs(self.T - self.told) > 0.0000001:
+            self.isotherm_detail()
+
+        self.told = self.T
+
+    def isotherm_detail(self):
+        """Calculate the temperature-dependent terms at T: tun[n] = T^(-un[n]).
+
+        The ideal gas hyperbolic sums are left to alpha_0_detail(), so plans without the ideal gas part never
+        calculate them. With an isotherm cache both are reused for a (composition, T) that has been seen before.
+        """
+        key = None
+        if self.isotherm_cache is not None:
+            key = (composition_key(self.x), self.T)
+            terms = self.isotherm_cache.get(key)
+            if terms is not None:
+                self.tun = terms.tun
+                if terms.sumhyp is not None:
+                    self.sumhyp, self._sumhyp_key = terms.sumhyp, key
+                self.told = self.T
+                return self
+
+        T = self.T
+        un = self.un
+        self.tun = [0] + [math.pow(T, (-1) * un[n]) for n in range(1, self.nterms + 1)]
+        self.told = T
+
+        if key is not None:
+            self.isotherm_cache.put(key, IsothermTerms(tuple(self.tun), None))  # sumhyp added by alpha_0_detail()
+
+        return self
+
+    def _update_sumhyp(self):
+        """Calculate the ideal gas hyperbolic sums unless they are held for the current composition and T."""
+        key = (composition_key(self.x), self.T)
+        if self._sumhyp_key == key:
+            return
+
+        self.sumhyp = self._hyperbolic_sums()
+        self._sumhyp_key = key
+        if self.isotherm_cache is not None:
+            self.isotherm_cache.put(key, IsothermTerms(tuple(self.tun), self.sumhyp))
+
+    def _hyperbolic_sums(self):
+        """Calculate (sumhyp0, sumhyp1, sumhyp2) of the ideal gas part for every component present (None otherwise)."""
+        T = self.T
+        x = self.x
+        sumhyp = [None] * (self.ncdetail + 1)
+
+        for i in nonzero_components(x):
+            sumhyp0 = 0
+            sumhyp1 = 0
+            sumhyp2 = 0
+
+            for th0, n0, sinh in self._hyp_terms[i]:
+                th0t = th0 / T
+                ep = math.exp(th0t)
+                em = 1 / ep
+                hsn = (ep - em) / 2
+                hcn = (ep + em) / 2
+
+                if sinh:
+                    loghyp = math.log(abs(hsn))
+                    sumhyp0 += n0 * loghyp
+                    sumhyp1 += n0 * (loghyp - th0t * hcn / hsn)
+                    sumhyp2 += n0 * (th0t / hsn) ** 2
+                else:
+                    loghyp = math.log(abs(hcn))
+                    sumhyp0 += (-1) * n0 * loghyp
+                    sumhyp1 += (-1) * n0 * (loghyp - th0t * hsn / hcn)
+                    sumhyp2 += n0 * (th0t / hcn) ** 2
+
+            sumhyp[i] = (sumhyp0, sumhyp1, sumhyp2)
+
+        return tuple(sumhyp)
+
+    def _dknn_expn(self, dred):
+        """Precalculate the common powers (dknn) and exponents (expn) of the reduced density."""
+        dknn = [1, dred]
+        for _ in range(2, 9 + 1):
+            dknn.append(dred * dknn[-1])
+
+        expn = [
+            1,
+            math.exp(-1 * dknn[1]),
+            math.exp(-1 * dknn[2]),
+            math.exp(-1 * dknn[3]),
+            math.exp(-1 * dknn[4]),
+        ]
+
+        return dknn, expn
+
+    def set_composition_terms(self, terms):
+        """Set the molar mass and composition terms from CompositionTerms instead of calculating them."""
+        self.MM = terms.MM
+        self.K3 = terms.K3
+        self.U = terms.U
+        self.G = terms.G
+        self.Q = terms.Q
+        self.F = terms.F
+        self.Q2 = terms.Q2
+        self.bs = terms.bs
+        self.csn = terms.csn
+
+        return self
+
+    def composition_detail(self):
+        """Calculate the molar mass and composition terms, reusing them from the cache when x has been seen before.
+
+        A Composition carries its own terms, calculated once and reused by every calculator it is passed to.
+        """
+        if isinstance(self.x, Composition):
+            return self.set_composition_terms(self.x.terms)
+        if self.cache is None:
+            return self.molar_mass_detail().x_terms_detail()
+
+        key = composition_key(self.x)
+        terms = self.cache.get(key)
+        if terms is None:
+            self.molar_mass_detail().x_terms_detail()
+            self.cache.put(key, self.composition_terms())
+        else:
+            self.set_composition_terms(terms)
 
         return self
 
@@ -231,170 +468,183 @@ class AGA8Detail:
         """Calculate the derivatives of the residual Helmholtz energy (ar) with respect to T and D.
 
         Arguments:
-            itau: highest derivatives needed. Set to 1 for "ar" derivatives w.r.t T, 0 otherwise.
+            itau: highest derivatives needed. Set to 1 for "ar" derivatives w.r.t T, 0 otherwise
+                (2 also calculates ar[1][2], ar[1][3] and ar[2][1], which no property uses).
         """
-        # reset ar @ 0 each call
-        self.ar = [[0 for _ in range(4)] for _ in range(4)]
+        self._update_tun()
 
-        if np.abs(self.T - self.told) > 0.0000001:
-            for n in range(1, self.nterms + 1):
-                self.tun[n] = math.pow(self.T, (-1) * self.un[n])
-
-        self.told = self.T
+        D = self.D
+        RT = self.R * self.T
+        tun = self.tun
+        bs = self.bs
+        csn = self.csn
+        coeft1 = self._coeft1
+        coeft2 = self._coeft2
 
         # Precalculation of common powers and exponents of density
-        dred = self.K3 * self.D
-        dknn = [0] * (9 + 1)  # create a an array Dknn (10, 1)
-        dknn[0] = 1
-        for n in range(1, len(dknn)):
-            dknn[n] = dred * dknn[n - 1]
-
-        expn = [0] * (5)  # create an array (5, 1) for exponents
-        expn[0] = 1
-        for n in range(1, len(expn)):
-            expn[n] = math.exp(-1 * dknn[n])
-
-        sum0 = [0] * (self.nterms + 1)
-        sumb = [0] * (self.nterms + 1)
-        coefd1 = [0] * (self.nterms + 1)
-        coefd2 = [0] * (self.nterms + 1)
-        coefd3 = [0] * (self.nterms + 1)
-        coeft1 = [0] * (self.nterms + 1)
-        coeft2 = [0] * (self.nterms + 1)
-
-        for n in range(1, self.nterms + 1):
-            # Contributions to the Helmholtz energy and its derivatives with respect to temperature
-            coeft1[n] = self.R * (self.un[n] - 1)
-            coeft2[n] = coeft1[n] * self.un[n]
-            # Contributions to the virial coefficients
-            sumb[n] = 0
-            sum0[n] = 0
-
-            if n <= 18:
-                _sum = self.bs[n] * self.D
-                if n >= 13:
-                    _sum += (-1) * self.csn[n] * dred
-                sumb[n] = _sum * self.tun[n]
-
-            if n >= 13:
-                # Contributions to the residual part of the Helmholtz energy
-                sum0[n] = (
-                    self.csn[n]
-                    * dknn[int(self.bn[n])]
-                    * self.tun[n]
-                    * expn[int(self.kn[n])]
-                )
-
-                # Contributions to the derivatives of the Helmholtz energy with respect to density
-                bkd = self.bn[n] - self.kn[n] * dknn[int(self.kn[n])]
-                ckd = self.kn[n] * self.kn[n] * dknn[int(self.kn[n])]
-                coefd1[n] = bkd
-                coefd2[n] = bkd * (bkd - 1) - ckd
-                coefd3[n] = (bkd - 2) * coefd2[n] + ckd * (1 - self.kn[n] - 2 * bkd)
+        dred = self.K3 * D
+        dknn, expn = self._dknn_expn(dred)
 
+        ar00 = ar01 = ar02 = ar03 = 0
+        ar10 = ar11 = ar12 = ar13 = ar20 = ar21 = 0
+
+        # Terms n < 13 only contribute to the virial coefficients (sum0 = 0, coefd = 0)
+        for n in range(1, 12 + 1):
+            sumb = bs[n] * D * tun[n]
+            ar00 = ar00 + RT * sumb
+            ar01 = ar01 + RT * sumb
+            if itau > 0:
+                ar10 = ar10 - coeft1[n] * sumb
+                ar11 = ar11 - coeft1[n] * sumb
+                ar20 = ar20 + coeft2[n] * sumb
+                if itau > 1:
+                    ar21 = ar21 + coeft2[n] * sumb
+
+        for n, bn, kn, kn2, kn1 in self._exp_terms:
+            # Contributions to the residual part of the Helmholtz energy
+            sum0 = csn[n] * dknn[bn] * tun[n] * expn[kn]
+
+            # Contributions to the derivatives of the Helmholtz energy with respect to density
+            bkd = bn - kn * dknn[kn]
+            ckd = kn2 * dknn[kn]
+            coefd2 = bkd * (bkd - 1) - ckd
+            coefd3 = (bkd - 2) * coefd2 + ckd * (kn1 - 2 * bkd)
+
+            # Density derivatives (terms n <= 18 also contribute to the virial coefficients)
+            if n > 18:
+                s0 = sum0
+                s1 = sum0 * bkd
             else:
-                coefd1[n] = 0
-                coefd2[n] = 0
-                coefd3[n] = 0
-
-        for n in range(1, self.nterms + 1):
-            # Density derivatives
-            s0 = sum0[n] + sumb[n]
-            s1 = sum0[n] * coefd1[n] + sumb[n]
-            s2 = sum0[n] * coefd2[n]
-            s3 = sum0[n] * coefd3[n]
-            self.ar[0][0] = self.ar[0][0] + (self.R * self.T) * s0
-            self.ar[0][1] = self.ar[0][1] + (self.R * self.T) * s1
-            self.ar[0][2] = self.ar[0][2] + (self.R * self.T) * s2
-            self.ar[0][3] = self.ar[0][3] + (self.R * self.T) * s3
+                sumb = (bs[n] * D - csn[n] * dred) * tun[n]
+                s0 = sum0 + sumb
+                s1 = sum0 * bkd + sumb
+            s2 = sum0 * coefd2
+            s3 = sum0 * coefd3
+            ar00 = ar00 + RT * s0
+            ar01 = ar01 + RT * s1
+            ar02 = ar02 + RT * s2
+            ar03 = ar03 + RT * s3
 
             # temperature derivatives
             if itau > 0:
-                self.ar[1][0] = self.ar[1][0] - coeft1[n] * s0
-                self.ar[1][1] = self.ar[1][1] - coeft1[n] * s1
-                self.ar[2][0] = self.ar[2][0] + coeft2[n] * s0
+                ar10 = ar10 - coeft1[n] * s0
+                ar11 = ar11 - coeft1[n] * s1
+                ar20 = ar20 + coeft2[n] * s0
+            if itau > 1:
                 # The following are not used, but fully functional
-                self.ar[1][2] = self.ar[1][2] - coeft1[n] * s2
-                self.ar[1][3] = self.ar[1][3] - coeft1[n] * s3
-                self.ar[2][1] = self.ar[2][1] + coeft2[n] * s1
+                ar12 = ar12 - coeft1[n] * s2
+                ar13 = ar13 - coeft1[n] * s3
+                ar21 = ar21 + coeft2[n] * s1
+
+        self.ar = [
+            [ar00, ar01, ar02, ar03],
+            [ar10, ar11, ar12, ar13],
+            [ar20, ar21, 0, 0],
+            [0, 0, 0, 0],
+        ]
 
         return self
 
+    def _alpha_r_density(self):
+        """Calculate only ar[0][1] and ar[0][2], the density derivatives needed by the density iteration.
+
+        The terms are evaluated and accumulated in the same order as alpha_r_detail(), so the values are identical.
+        """
+        self._update_tun()
+
+        D = self.D
+        RT = self.R * self.T
+        tun = self.tun
+        bs = self.bs
+        csn = self.csn
+
+        dred = self.K3 * D
+        dknn, expn = self._dknn_expn(dred)
+
+        ar01 = ar02 = 0
+        for n in range(1, 12 + 1):
+            ar01 = ar01 + RT * (bs[n] * D * tun[n])
+
+        for n, bn, kn, kn2, _ in self._exp_terms[:6]:  # n = 13..18
+            sum0 = csn[n] * dknn[bn] * tun[n] * expn[kn]
+            bkd = bn - kn * dknn[kn]
+            ar01 = ar01 + RT * (sum0 * bkd + (bs[n] * D - csn[n] * dred) * tun[n])
+            ar02 = ar02 + RT * (sum0 * (bkd * (bkd - 1) - kn2 * dknn[kn]))
+
+        for n, bn, kn, kn2, _ in self._exp_terms[6:]:  # n = 19..58
+            sum0 = csn[n] * dknn[bn] * tun[n] * expn[kn]
+            bkd = bn - kn * dknn[kn]
+            ar01 = ar01 + RT * (sum0 * bkd)
+            ar02 = ar02 + RT * (sum0 * (bkd * (bkd - 1) - kn2 * dknn[kn]))
+
+        return ar01, ar02
+
     def alpha_0_detail(self):
         """Calculate the ideal gas Helmholtz energy and its derivatives with respect to T and D."""
-        # reset ar @ 0 each call
-        self.a0 = [0, 0, 0]
+        T = self.T
+        x = self.x
+        a00 = a01 = a02 = 0
 
         if self.D > self.epsilon:
             logd = math.log(self.D)
         else:
             logd = math.log(self.epsilon)
 
-        logt = math.log(self.T)
-
-        for i in range(1, self.ncdetail + 1):
-            if self.x[i] > 0:
-                logxd = logd + math.log(self.x[i])
-                sumhyp0 = 0
-                sumhyp1 = 0
-                sumhyp2 = 0
-
-                for j in range(4, 8):
-                    if self.th0i[i][j] > 0:
-                        th0t = self.th0i[i][j] / self.T
-                        ep = math.exp(th0t)
-                        em = 1 / ep
-                        hsn = (ep - em) / 2
-                        hcn = (ep + em) / 2
-
-                        if (j == 4) | (j == 6):
-                            loghyp = math.log(abs(hsn))
-                            sumhyp0 += self.n0i[i][j] * loghyp
-                            sumhyp1 += self.n0i[i][j] * (loghyp - th0t * hcn / hsn)
-                            sumhyp2 += self.n0i[i][j] * (th0t / hsn) ** 2
-                        else:
-                            loghyp = math.log(abs(hcn))
-                            sumhyp0 += (-1) * self.n0i[i][j] * loghyp
-                            sumhyp1 += (
-                                (-1) * self.n0i[i][j] * (loghyp - th0t * hsn / hcn)
-                            )
-                            sumhyp2 += self.n0i[i][j] * (th0t / hcn) ** 2
-
-                self.a0[0] += self.x[i] * (
-                    logxd
-                    + self.n0i[i][1]
-                    + self.n0i[i][2] / self.T
-                    - self.n0i[i][3] * logt
-                    + sumhyp0
-                )
-                self.a0[1] += self.x[i] * (
-                    logxd + self.n0i[i][1] - self.n0i[i][3] * (1 + logt) + sumhyp1
-                )
-                self.a0[2] += (-1) * self.x[i] * (self.n0i[i][3] + sumhyp2)
-
-        self.a0[0] = self.a0[0] * self.R * self.T
-        self.a0[1] = self.a0[1] * self.R
-        self.a0[2] = self.a0[2] * self.R
+        logt = math.log(T)
+
+        self._update_tun()
+        self._update_sumhyp()  # the hyperbolic sums depend on T and x, and are only needed here
+        sumhyp = self.sumhyp
+
+        for i in nonzero_components(x):
+            logxd = logd + math.log(x[i])
+            sumhyp0, sumhyp1, sumhyp2 = sumhyp[i]
+
+            n0i = self.n0i[i]
+            a00 += x[i] * (logxd + n0i[1] + n0i[2] / T - n0i[3] * logt + sumhyp0)
+            a01 += x[i] * (logxd + n0i[1] - n0i[3] * (1 + logt) + sumhyp1)
+            a02 += (-1) * x[i] * (n0i[3] + sumhyp2)
+
+        self.a0 = [a00 * self.R * T, a01 * self.R, a02 * self.R]
 
         return self
 
     def pressure_detail(self):
         """Calculate pressure as a function of temperature and density.  The derivative d(P)/d(D) is also calculated."""
-        self.alpha_r_detail(itau=0)  # updates ar with new density, D
+        ar01, ar02 = self._alpha_r_density()  # ar[0][1] and ar[0][2] at the new density, D
         self.z = (
-            1 + self.ar[0][1] / self.R / self.T
+            1 + ar01 / self.R / self.T
         )  # ar[0][1] is the first derivative of alpha(r) with respect to density
         self.P2 = self.D * self.R * self.T * self.z
         self.dpddsave = (
-            self.R * self.T + 2 * self.ar[0][1] + self.ar[0][2]
+            self.R * self.T + 2 * ar01 + ar02
         )  # d(P)/d(D) for use in density iteration
 
         return self
 
+    def pressure_halley_detail(self):
+        """Calculate pressure, d(P)/d(D) and d2(P)/d(D)2 as a function of temperature and density for the Halley iteration."""
+        self.alpha_r_detail(0)
+        _, ar01, ar02, ar03 = self.ar[0]
+        self.z = 1 + ar01 / self.R / self.T
+        self.P2 = self.D * self.R * self.T * self.z
+        self.dpddsave = self.R * self.T + 2 * ar01 + ar02
+        self.d2pddsave = (2 * ar01 + 4 * ar02 + ar03) / self.D
+
+        return self
+
     def density_detail(self):
-        """Calculate density as a function of temperature, T and pressure, P. This is an iterative routine that calls PressureDetail()."""
-        if np.abs(self.P) < self.epsilon:
+        """Calculate density as a function of temperature, T and pressure, P. This is an iterative routine that calls PressureDetail().
+
+        With solver="halley" the first order Newton step in log(v) is replaced by a third order Halley step,
+        which also uses d2(P)/d(D)2 (from ar[0][3]). The number of iterations used is stored in niter.
+        """
+        self.niter = 0
+        self.ncreep = 0
+        self.failure = None
+        if abs(self.P) < self.epsilon:
             # failed to converge
+            self.failure = "zero_pressure"
             self.z = None
             self.P2 = None
             self.D = 0
@@ -414,10 +664,13 @@ class AGA8Detail:
 
         plog = math.log(self.P)
         vlog = (-1) * math.log(self.D)
+        halley = self.solver == "halley"
 
-        for _ in range(1, 20 + 1):
+        for niter in range(1, 20 + 1):
+            self.niter = niter
             if (vlog < -7) | (vlog > 100):
                 # fail to converge
+                self.failure = "out_of_range"
                 self.z = None
                 self.P2 = None
                 self.D = self.P / self.R / self.T  # return ideal gas estimate
@@ -429,17 +682,26 @@ class AGA8Detail:
             self.D = math.exp(-vlog)  # update the density
 
             # run pressure calculations
-            self.pressure_detail()
+            if halley:
+                self.pressure_halley_detail()
+            else:
+                self.pressure_detail()
 
             if (self.dpddsave < self.epsilon) | (self.P2 < self.epsilon):
                 vlog += 0.1
+                self.ncreep += 1
             else:
                 # Find the next density with a first order Newton's type iterative scheme, with
                 # log(P) as the known variable and log(v) as the unknown property.
                 dpdlv = -self.D * self.dpddsave  # d(p)/d[log(v)]
                 vdiff = (math.log(self.P2) - plog) * self.P2 / dpdlv
+                if halley:
+                    # d(log P)/d(log v) and d2(log P)/d(log v)2 from d(P)/d(D) and d2(P)/d(D)2
+                    dfdlv = dpdlv / self.P2
+                    d2fdlv2 = self.D * self.D * self.d2pddsave / self.P2 - dfdlv - dfdlv * dfdlv
+                    vdiff = vdiff / _halley_correction(math.log(self.P2) - plog, dfdlv, d2fdlv2)
                 vlog = vlog - vdiff
-                if np.abs(vdiff) < self.tolr:
+                if abs(vdiff) < self.tolr:
                     # iteration converged
                     self.D = math.exp(-vlog)
                     self.ierr = 0
@@ -448,6 +710,7 @@ class AGA8Detail:
                     return self
 
         # failed to converge (reset D back to ideal gas density)
+        self.failure = "max_iterations"
         self.z = None
         self.P2 = None
         self.D = self.P / self.R / self.T
@@ -459,44 +722,58 @@ class AGA8Detail:
     def properties_detail(self):
         """Calculate thermodynamic properties of as gas as a function of temperature and density.
 
-        This method should be run after apprximating the gas density using DensityDetail().
+        This method should be run after apprximating the gas density using DensityDetail(). Only the stages
+        needed by the requested properties (self.plan) are run.
         """
         if self.z is None:
             # density_detail() failed to converge, return object
             return self
 
+        plan = self.plan
+        # store the Z approximated by DensityDetail approach
+        self.zd = self.z
+        if not plan.properties:
+            # only outputs of the density iteration were requested
+            return self
+
         # Calculate the ideal gas Helmholtz energy, and its first and second derivatives with respect to temperature.
-        self.alpha_0_detail()
+        if plan.alpha_0:
+            self.alpha_0_detail()
         # Calculate the real gas Helmholtz energy, and its derivatives with respect to temperature and/or density.
-        self.alpha_r_detail(itau=2)
+        self.alpha_r_detail(itau=plan.itau)
 
-        # store the Z approximated by DensityDetail approach
-        self.zd = self.z
         # overwrite Z with the new Z from properties method
         self.z = 1 + self.ar[0][1] / (self.R * self.T)
         # create a new approximated P3 from new Z
         self.P3 = self.D * self.R * self.T * self.z
 
         self.dpdd = (self.R * self.T) + 2 * self.ar[0][1] + self.ar[0][2]
-        self.dpdt = (self.D * self.R) + (self.D * self.ar[1][1])
-        self.A = self.a0[0] + self.ar[0][0]
+        dense = self.D > self.epsilon
+        if dense:
+            self.d2pdd2 = (
+                2 * self.ar[0][1] + 4 * self.ar[0][2] + self.ar[0][3]
+            ) / self.D
+        else:
+            self.d2pdd2 = 0
+        if plan.itau > 0:
+            self.dpdt = (self.D * self.R) + (self.D * self.ar[1][1])
+        if plan.alpha_0:
+            self.A = self.a0[0] + self.ar[0][0]
+            self.G = self.A + self.P3 / self.D if dense else self.A + (self.R * self.T)
+        if not (plan.alpha_0 and plan.itau > 0):
+            return self
+
         self.S = (-1) * self.a0[1] - self.ar[1][0]
         self.U = self.A + self.T * self.S
         self.cv = -(self.a0[2] + self.ar[2][0])
 
-        if self.D > self.epsilon:
+        if dense:
             self.H = self.U + self.P3 / self.D
-            self.G = self.A + self.P3 / self.D
             self.cp = self.cv + self.T * (self.dpdt / self.D) ** 2 / self.dpdd
-            self.d2pdd2 = (
-                2 * self.ar[0][1] + 4 * self.ar[0][2] + self.ar[0][3]
-            ) / self.D
             self.JT = (self.T / self.D * self.dpdt / self.dpdd - 1) / self.cp / self.D
         else:
             self.H = self.U + (self.R * self.T)
-            self.G = self.A + (self.R * self.T)
             self.cp = self.cv + self.R
-            self.d2pdd2 = 0
             self.JT = 1e20
 
         self.W = 1000 * self.cp / self.cv * self.dpdd / self.MM
@@ -508,17 +785,159 @@ class AGA8Detail:
 
         return self
 
+    def sensitivity_detail(self, normalise=False):
+        """Calculate the derivatives of Z and D with respect to each mole fraction at constant P and T (dzdx, dDdx).
+
+        Call after density_detail() (e.g. after run()). The derivatives are analytic (see modules.sensitivity), so
+        all 21 components cost about as much as one properties_detail() call and carry no iteration noise.
+
+        Arguments:
+            normalise: if True, differentiate the composition renormalised to a sum of 1, otherwise each xi
+                independently.
+        """
+        if self.ierr != 0:
+            self.dzdx = None
+            self.dDdx = None
+            return self
+
+        import numpy as np
+
+        from modules.batch import composition_array
+        from modules.sensitivity import composition_gradient
+
+        dzdx, dddx = composition_gradient(np.array([self.T]), np.array([self.D]), composition_array(self.x), normalise)
+        self.dzdx = [0] + dzdx[0].tolist()
+        self.dDdx = [0] + dddx[0].tolist()
+
+        return self
+
+    def flash_ph(self, h, tol=FLASH_TOL, maxiter=FLASH_MAXITER):
+        """Find the temperature at which the gas at pressure P has the molar enthalpy h (J/mol).
+
+        Each iteration solves the density at the current T and takes a Newton step in T with cp = d(H)/d(T) at
+        constant P. The iteration starts from the current T and, if its last density iteration converged, its density
+        (otherwise the ideal gas estimate), so a converged calculator is a warm start for the next flash of a
+        nearby state. The composition terms are only recalculated when x changes.
+        On return T, D and every property are those of the solution and nflash holds the iterations used;
+        ierr=2 if the temperature iteration did not converge.
+
+        Arguments:
+            h: target enthalpy (J/mol).
+            tol: convergence tolerance of the temperature step, relative to T.
+            maxiter: largest number of temperature iterations.
+        """
+        return self._flash(h, "H", tol, maxiter)
+
+    def flash_ps(self, s, tol=FLASH_TOL, maxiter=FLASH_MAXITER):
+        """Find the temperature at which the gas at pressure P has the molar entropy s (J/(mol-K)).
+
+        As flash_ph(), with a Newton step in log(T) using cp = d(S)/d(log T) at constant P.
+
+        Arguments:
+            s: target entropy (J/(mol-K)).
+            tol: convergence tolerance of the temperature step, relative to T.
+            maxiter: largest number of temperature iterations.
+        """
+        return self._flash(s, "S", tol, maxiter)
+
+    def _flash(self, target, name, tol, maxiter):
+        """Run the temperature iteration of flash_ph() (name="H") or flash_ps() (name="S")."""
+        key = composition_key(self.x)
+        if key != self._flash_composition:
+            self.composition_detail()
+            self._flash_composition = key
+
+        # the iteration needs the target property and cp, the selection of the caller is restored afterwards
+        plan = self.plan
+        if not {name, "cp"} <= set(plan.outputs):
+            self.plan = evaluation_plan(set(plan.outputs) | {name, "cp"})
+        try:
+            return self._flash_iterate(target, name, tol, maxiter)
+        finally:
+            self.plan = plan
+
+    def _flash_iterate(self, target, name, tol, maxiter):
+        """Iterate the temperature of _flash() until the Newton step is below tol or maxiter is reached."""
+        if self.z is not None and self.D > self.epsilon:  # z is None until a density iteration converges
+            self.D = -self.D  # start the first density iteration from the last converged density
+        self.nflash = 0
+        for nflash in range(1, maxiter + 1):
+            self.nflash = nflash
+            self.density_detail()
+            if self.ierr != 0:
+                return self
+            self.properties_detail()
+
+            # Newton step in T (enthalpy) or log(T) (entropy), limited to a fraction FLASH_MAXSTEP of T
+            step = (target - getattr(self, name)) / self.cp
+            step = max(-FLASH_MAXSTEP, min(FLASH_MAXSTEP, step if name == "S" else step / self.T))
+            if abs(step) < tol:
+                return self
+
+            self.T = self.T * math.exp(step) if name == "S" else self.T * (1 + step)
+            self.isotherm_detail()  # the final steps are below the 1e-7 K threshold of _update_tun()
+            self.D = -self.D  # start the next density iteration from this density
+
+        self.ierr = 2
+        self.herr = FLASH_FAILED
+
+        return self
+
+    def result(self):
+        """Return the outputs of the last calculation as an immutable DetailResult (modules.result).
+
+        The record holds no reference to this calculator or its intermediate arrays, so keep it instead of
+        the AGA8Detail object when many results are stored or sent between processes.
+        """
+        return DetailResult.from_detail(self)
+
     def run(self):
         """Call the AGA8 DETAIL method for a given P, T and x."""
         # 1. Initialise constants and parameters for DETAIL
         self.setup_detail()
-        # 2. Calculate the molar mass from the input gas composition
-        self.molar_mass_detail()
-        # 3. Calculate terms dependent only on gas composition (only need to run once as gas comp doesn't change)
-        self.x_terms_detail()
+        # 2. Calculate the molar mass from the input gas composition and
+        # 3. Calculate terms dependent only on gas composition (taken from the cache for a known composition)
+        self.composition_detail()
         # 4. Calculate gas density as a function of temperature and pressure and return approximated P and compressibility factor, Z
         self.density_detail()
         # 5. Calculate gas thermodynamic properties of as gas as a function of temperature and density.
         self.properties_detail()
 
         return self
+
+    @classmethod
+    def run_batch(
+        cls, p, t, x, cache=None, solver="newton", engine="numpy", properties=None, telemetry=None
+    ):
+        """Call the AGA8 DETAIL method for N (P, T) points with NumPy (or the compiled Numba engine).
+
+        The composition terms, density iteration and properties are evaluated for all points at once.
+
+        Arguments:
+            p: pressures (kPa), array-like of shape (N,) or scalar.
+            t: temperatures (K), array-like of shape (N,) or scalar.
+            x: gas composition shared by every point as a 22-element list (dummy 0 at index 0), or
+                one composition per point as an (N, 21) matrix (or (N, 22) with the dummy column).
+            cache: optional LRUCache for the composition terms of a shared composition.
+            solver: density iteration scheme, "newton" or "halley" (see AGA8Detail.density_detail()).
+            engine: "numpy" or "numba" (compiled, see modules.numba_engine; falls back to "numpy" without Numba).
+            properties: names of the outputs to calculate (e.g. {"z", "D"}), every output if None.
+            telemetry: optional Telemetry recording the stage timings and density iterations of the batch.
+
+        Returns:
+            dict of arrays keyed by the requested output attribute names (z, zd, D, P2, P3, cp, W, JT, kappa, ...)
+            plus MM, ierr, herr and niter.
+        """
+        import numpy as np
+
+        from modules.batch import composition_array, run_batch
+
+        options = dict(solver=solver, engine=engine, properties=properties, telemetry=telemetry)
+        if np.ndim(x) > 1:
+            return run_batch(p, t, x, **options)
+
+        if telemetry is not None and cache is not None:
+            telemetry.watch("composition", cache)
+        terms = cls(p=None, t=None, x=x, cache=cache).composition_detail().composition_terms()
+
+        return run_batch(p, t, composition_array(x), terms, **options)
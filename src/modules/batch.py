@@ -0,0 +1,707 @@
+"""batch.py module contains the vectorised (NumPy) functionality used to run the DETAIL method on many state points at once."""
+
+import math
+import warnings
+
+from modules.composition import nonzero_components
+from modules.constants import (
+    ENGINES,
+    EPSILON,
+    NCDETAIL,
+    NTERMS,
+    R,
+    SOLVERS,
+    TOLR,
+    get_constants,
+)
+from modules.molecule import MmDetail
+from modules.outputs import (
+    DENSITY_OUTPUTS,
+    FAILED_TO_CONVERGE,
+    FLASH_FAILED,
+    OUTPUTS,
+    CompositionTerms,
+    evaluation_plan,
+)
+
+import numpy as np
+
+# per-point error messages, indexed by the ierr code (2 is only used by the flash calculations)
+HERR = np.array(["", FAILED_TO_CONVERGE, FLASH_FAILED], dtype=object)
+
+CHUNKSIZE = 4096  # default number of points evaluated together by run_batch()
+
+
+def _array(table):
+    """Convert a shared DETAIL table into a read-only float array."""
+    array = np.array(table, dtype=float)
+    array.flags.writeable = False
+
+    return array
+
+
+_constants = get_constants()
+UN = _array(_constants.un)[1:]  # un(1..58)
+# indices 13..58 of the exponential terms, shifted to 0-based column positions
+BN = np.array(_constants.bn[13:], dtype=int)
+KN = np.array(_constants.kn[13:], dtype=int)
+KNF = _array(_constants.kn)[13:]
+BNF = _array(_constants.bn)[13:]
+# the exponential terms n = 13..58 share only a few (bn, kn) pairs, so the density iteration sums
+# their temperature coefficients per pair once and evaluates each density function once per pair
+PAIRS = sorted(set(zip(BN.tolist(), KN.tolist())))
+PAIR_BN = np.array([b for b, _ in PAIRS], dtype=int)
+PAIR_KN = np.array([k for _, k in PAIRS], dtype=int)
+PAIR_BNF = PAIR_BN.astype(float)
+PAIR_KNF = PAIR_KN.astype(float)
+PAIR_MAP = np.array([[float(pair == (b, k)) for pair in PAIRS] for b, k in zip(BN, KN)])
+AN = _array(_constants.an)[13:]
+UN13 = UN[12:]
+GN13 = np.array(_constants.gn[13:]) == 1
+QN13 = np.array(_constants.qn[13:]) == 1
+FN13 = np.array(_constants.fn[13:]) == 1
+COEFT1 = R * (UN - 1)
+COEFT2 = COEFT1 * UN
+N0I = _array(_constants.n0i)[1:]  # (21, 8)
+TH0I = _array(_constants.th0i)[1:]  # (21, 8)
+# pure fluid parameters of the 21 components
+KI25 = _array(_constants.ki25)[1:]
+EI25 = _array(_constants.ei25)[1:]
+GI = _array(_constants.gi)[1:]
+QI = _array(_constants.qi)[1:]
+FI = _array(_constants.fi)[1:]
+PURE_TABLE = np.column_stack((KI25, EI25, GI, QI))
+MMI = _array(list(MmDetail.values()))
+
+
+# packed upper-triangular (i <= j) binary tables and the lookup of a pair's position in them
+PACKED_BSNIJ2 = _array(_constants.bsnij2_packed)  # (231, 18)
+PACKED_KIJ5 = _array(_constants.kij5_packed)
+PACKED_UIJ5 = _array(_constants.uij5_packed)
+PACKED_GIJ5 = _array(_constants.gij5_packed)
+PACKED_PAIRS = np.column_stack((PACKED_KIJ5, PACKED_UIJ5, PACKED_GIJ5, PACKED_BSNIJ2))
+PACKED_INDEX = np.zeros((NCDETAIL, NCDETAIL), dtype=int)
+PACKED_INDEX[np.triu_indices(NCDETAIL)] = np.arange(PACKED_KIJ5.shape[0])
+PACKED_INDEX = np.maximum(PACKED_INDEX, PACKED_INDEX.T)
+# (i, j > i) positions within a gas of k nonzero components, for k = 0..21
+PAIR_POSITIONS = [np.triu_indices(k, k=1) for k in range(NCDETAIL + 1)]
+
+
+def _symmetric(packed, diagonal=True):
+    """Unpack a packed binary table into a symmetric (21, 21, ...) array."""
+    full = packed[PACKED_INDEX]
+    if not diagonal:
+        full[np.arange(NCDETAIL), np.arange(NCDETAIL)] = 0
+    full.flags.writeable = False
+
+    return full
+
+
+# binary tables as symmetric matrices so that the pair sums become quadratic forms x^T M x
+BSNIJ2 = _symmetric(PACKED_BSNIJ2)  # (21, 21, 18)
+KIJ5 = _symmetric(PACKED_KIJ5, diagonal=False)
+UIJ5 = _symmetric(PACKED_UIJ5, diagonal=False)
+GIJ5 = _symmetric(PACKED_GIJ5, diagonal=False)
+
+
+def x_terms_packed(x):
+    """Calculate the composition sums of AGA8Detail.x_terms_detail() for one gas over its nonzero components.
+
+    Every pure fluid and binary pair product is formed at once from the packed tables, and the sums
+    are accumulated sequentially in the order of the reference loops (pure fluids, then pairs i < j)
+    so the result is identical to the element-by-element calculation.
+
+    Arguments:
+        x: 22-element composition list (dummy 0 at index 0).
+
+    Returns:
+        K3, U, G, Q, F as floats and bs as a 19-element list (bs[0] = 0).
+    """
+    nz = list(nonzero_components(x))
+    if not nz:
+        return 0.0, 0.0, 0.0, 0.0, 0.0, [0] * (18 + 1)
+
+    xn = np.array([x[i] for i in nz])
+    xi2 = np.array([math.pow(x[i], 2) for i in nz])
+    nz = np.array(nz, dtype=int) - 1
+    a, b = PAIR_POSITIONS[nz.size]
+    xij = (2 * xn[a]) * xn[b]
+    pure = PACKED_INDEX[nz, nz]
+    pair = PACKED_INDEX[nz[a], nz[b]]
+    acc = np.add.accumulate
+
+    # Calculate pure fluid contributions
+    k3, u, g, q = acc(xn[:, None] * PURE_TABLE[nz], axis=0)[-1].tolist()
+    f = acc(xi2 * FI[nz])[-1]
+
+    # Binary pair contributions, with the rows of the K, U, G and bs sums stacked as
+    # [pure fluid sums, pure fluid bs terms, binary pair terms] and summed in that order
+    rows = np.zeros((1 + nz.size + pair.size, 3 + 18))
+    rows[0, :3] = (math.pow(k3, 2), math.pow(u, 2), g)
+    rows[1 : nz.size + 1, 3:] = xi2[:, None] * PACKED_BSNIJ2[pure]
+    rows[nz.size + 1 :] = xij[:, None] * PACKED_PAIRS[pair]
+    sums = acc(rows, axis=0)[-1].tolist()
+    k3, u, g = sums[:3]
+    bs = [0] + sums[3:]  # Second virial coefficients of mixture
+
+    return k3, u, g, q, float(f), bs
+
+
+def as_state(p, t, x=None):
+    """Broadcast pressures, temperatures (and per-row compositions) to a common number of points N.
+
+    Returns:
+        p, t: 1-D float arrays of length N.
+        x: mole fractions of shape (1, 21) for a shared composition or (N, 21) for per-row compositions.
+    """
+    p = np.atleast_1d(np.asarray(p, dtype=float)).ravel()
+    t = np.atleast_1d(np.asarray(t, dtype=float)).ravel()
+    if x is None:
+        p, t = np.broadcast_arrays(p, t)
+        return p.copy(), t.copy()
+
+    x = np.atleast_2d(composition_array(x))
+    n = np.broadcast_shapes(p.shape, t.shape, x.shape[:1])[0]
+    p, t = np.broadcast_to(p, (n,)).copy(), np.broadcast_to(t, (n,)).copy()
+
+    return p, t, x
+
+
+def molar_mass_batch(x):
+    """Calculate the molar mass M = Σ mi * xi for each row of x, shape (N, 21)."""
+    return x @ MMI
+
+
+def x_terms_batch(x):
+    """Calculate all of the variables related to the gas composition for each row of x.
+
+    The pure fluid and binary pair sums of AGA8Detail.x_terms_detail() are evaluated as
+    quadratic forms over the symmetric binary tables.
+
+    Arguments:
+        x: mole fractions of the 21 components, shape (N, 21).
+
+    Returns:
+        CompositionTerms with per-row arrays: MM, K3, U, G, Q, F, Q2 of shape (N,),
+        bs of shape (N, 19) and csn of shape (N, 59).
+    """
+    x = np.where(x > 0, x, 0)  # only components present in the gas contribute
+    n = x.shape[0]
+
+    # K, U, and G are the sums of a pure fluid contribution and a binary pair contribution
+    k3 = (x @ KI25) ** 2 + np.einsum("ni,ij,nj->n", x, KIJ5, x)
+    u = (x @ EI25) ** 2 + np.einsum("ni,ij,nj->n", x, UIJ5, x)
+    g = x @ GI + np.einsum("ni,ij,nj->n", x, GIJ5, x)
+    # Q and F depend only on the pure fluid parts
+    q = x @ QI
+    f = (x * x) @ FI
+
+    # Second virial coefficients of mixture
+    bs = np.zeros((n, 18 + 1))
+    bs[:, 1:] = np.einsum("ni,nik->nk", x, np.tensordot(x, BSNIJ2, axes=(1, 0)))
+
+    k3 = k3**0.6
+    u = u**0.2
+
+    # Third virial and higher coefficients
+    q2 = q**2
+    csn = np.zeros((n, NTERMS + 1))
+    csn[:, 13:] = AN * u[:, None] ** UN13
+    csn[:, 13:] *= np.where(GN13, g[:, None], 1)
+    csn[:, 13:] *= np.where(QN13, q2[:, None], 1)
+    csn[:, 13:] *= np.where(FN13, f[:, None], 1)
+
+    return CompositionTerms(
+        MM=molar_mass_batch(x), K3=k3, U=u, G=g, Q=q, F=f, Q2=q2, bs=bs, csn=csn
+    )
+
+
+def _rows(terms, n):
+    """Return K3 (n,), bs (n, 19) and csn (n, 59) broadcast to n points."""
+    k3 = np.broadcast_to(np.asarray(terms.K3, dtype=float), (n,))
+    bs = np.broadcast_to(np.asarray(terms.bs, dtype=float), (n, 18 + 1))
+    csn = np.broadcast_to(np.asarray(terms.csn, dtype=float), (n, NTERMS + 1))
+
+    return k3, bs, csn
+
+
+def tun_batch(t):
+    """Calculate the temperature powers tun[n] = T^(-un[n]) for n = 1..58, shape (N, 58)."""
+    return t[:, None] ** -UN
+
+
+def alpha_r_batch(t, d, k3, bs, csn, itau=0, tun=None):
+    """Calculate the derivatives of the residual Helmholtz energy (ar) with respect to T and D for N points.
+
+    Arguments:
+        t: temperatures (N,) in K.
+        d: molar densities (N,) in mol/l.
+        k3, bs, csn: composition terms broadcast to (N,), (N, 19) and (N, 59).
+        itau: highest derivatives needed. Set to 1 for "ar" derivatives w.r.t T, 0 otherwise
+            (2 also calculates ar[1][2], ar[1][3] and ar[2][1], which no property uses).
+        tun: optional precalculated tun_batch(t), reused across density iterations.
+
+    Returns:
+        ar: array of shape (4, 4, N) laid out as ar[i][j] in AGA8Detail.alpha_r_detail().
+    """
+    n = t.shape[0]
+    ar = np.zeros((4, 4, n))
+    rt = R * t
+
+    if tun is None:
+        tun = tun_batch(t)
+
+    # Precalculation of common powers and exponents of density
+    dred = k3 * d
+    dknn = np.empty((n, 9 + 1))
+    dknn[:, 0] = 1
+    for k in range(1, 9 + 1):
+        dknn[:, k] = dred * dknn[:, k - 1]
+    expn = np.exp(-dknn[:, :5])
+    expn[:, 0] = 1
+
+    # Contributions to the virial coefficients (n = 1..18)
+    sumb = bs[:, 1:] * d[:, None]
+    sumb[:, 12:] -= csn[:, 13:19] * dred[:, None]
+    sumb *= tun[:, :18]
+
+    # Contributions to the residual part of the Helmholtz energy (n = 13..58)
+    sum0 = csn[:, 13:] * dknn[:, BN] * tun[:, 12:] * expn[:, KN]
+
+    # Contributions to the derivatives of the Helmholtz energy with respect to density
+    dknk = dknn[:, KN]
+    bkd = BNF - KNF * dknk
+    ckd = KNF * KNF * dknk
+    coefd1 = bkd
+    coefd2 = bkd * (bkd - 1) - ckd
+    coefd3 = (bkd - 2) * coefd2 + ckd * (1 - KNF - 2 * bkd)
+
+    s1 = sum0 * coefd1
+    s2 = sum0 * coefd2
+    s3 = sum0 * coefd3
+
+    # Density derivatives
+    ar[0][0] = rt * (sumb.sum(axis=1) + sum0.sum(axis=1))
+    ar[0][1] = rt * (sumb.sum(axis=1) + s1.sum(axis=1))
+    ar[0][2] = rt * s2.sum(axis=1)
+    ar[0][3] = rt * s3.sum(axis=1)
+
+    # temperature derivatives
+    if itau > 0:
+        ct1b, ct1e = COEFT1[:18], COEFT1[12:]
+        ct2b, ct2e = COEFT2[:18], COEFT2[12:]
+        ar[1][0] = -(sumb @ ct1b + sum0 @ ct1e)
+        ar[1][1] = -(sumb @ ct1b + s1 @ ct1e)
+        ar[2][0] = sumb @ ct2b + sum0 @ ct2e
+    if itau > 1:
+        # The following are not used, but fully functional
+        ar[1][2] = -(s2 @ ct1e)
+        ar[1][3] = -(s3 @ ct1e)
+        ar[2][1] = sumb @ ct2b + s1 @ ct2e
+
+    return ar
+
+
+def alpha_0_batch(t, d, x):
+    """Calculate the ideal gas Helmholtz energy and its derivatives with respect to T and D for N points.
+
+    Arguments:
+        t: temperatures (N,) in K.
+        d: molar densities (N,) in mol/l.
+        x: mole fractions of the 21 components, shape (21,) or (N, 21).
+
+    Returns:
+        a0: array of shape (3, N) laid out as a0[i] in AGA8Detail.alpha_0_detail().
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    cols = np.flatnonzero((x > 0).any(axis=0))  # only components present in the gas
+    xc = x[:, cols]
+    n0i = N0I[cols]
+    th0i = TH0I[cols]
+
+    logd = np.log(np.maximum(d, EPSILON))[:, None]
+    logt = np.log(t)[:, None]
+    logx = np.log(np.where(xc > 0, xc, 1))
+    logxd = logd + logx
+
+    sumhyp0 = 0
+    sumhyp1 = 0
+    sumhyp2 = 0
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for j in range(4, 8):
+            present = th0i[:, j] > 0
+            th0t = th0i[:, j] / t[:, None]
+            ep = np.exp(th0t)
+            em = 1 / ep
+            hsn = (ep - em) / 2
+            hcn = (ep + em) / 2
+
+            if j in (4, 6):
+                loghyp = np.log(np.abs(hsn))
+                term0 = n0i[:, j] * loghyp
+                term1 = n0i[:, j] * (loghyp - th0t * hcn / hsn)
+                term2 = n0i[:, j] * (th0t / hsn) ** 2
+            else:
+                loghyp = np.log(np.abs(hcn))
+                term0 = -n0i[:, j] * loghyp
+                term1 = -n0i[:, j] * (loghyp - th0t * hsn / hcn)
+                term2 = n0i[:, j] * (th0t / hcn) ** 2
+
+            sumhyp0 = sumhyp0 + np.where(present, term0, 0)
+            sumhyp1 = sumhyp1 + np.where(present, term1, 0)
+            sumhyp2 = sumhyp2 + np.where(present, term2, 0)
+
+    a0 = np.empty((3, t.shape[0]))
+    a0[0] = (
+        xc
+        * (logxd + n0i[:, 1] + n0i[:, 2] / t[:, None] - n0i[:, 3] * logt + sumhyp0)
+    ).sum(axis=1) * (R * t)
+    a0[1] = (xc * (logxd + n0i[:, 1] - n0i[:, 3] * (1 + logt) + sumhyp1)).sum(
+        axis=1
+    ) * R
+    a0[2] = -(xc * (n0i[:, 3] + sumhyp2)).sum(axis=1) * R
+
+    return a0
+
+
+def isotherm_batch(bs, csn, tun):
+    """Collapse the temperature-dependent coefficients used by the density iteration.
+
+    Returns:
+        bt: sum of bs[n] * tun[n] over n = 1..18, shape (N,).
+        ct: sum of csn[n] * tun[n] over n = 13..18, shape (N,).
+        cg: csn[n] * tun[n] over n = 13..58 summed per (bn, kn) pair, shape (N, len(PAIRS)).
+    """
+    bt = np.einsum("ij,ij->i", bs[:, 1:], tun[:, :18])
+    ct = np.einsum("ij,ij->i", csn[:, 13:19], tun[:, 12:18])
+    cg = (csn[:, 13:] * tun[:, 12:]) @ PAIR_MAP
+
+    return bt, ct, cg
+
+
+def pressure_batch(t, d, k3, bt, ct, cg, second=False):
+    """Calculate pressure, Z and d(P)/d(D) as a function of temperature and density for N points.
+
+    Only ar[0][1] and ar[0][2] (and ar[0][3] with second=True) are needed, so they are evaluated
+    from the isotherm_batch() coefficients. With second=True d2(P)/d(D)2 is returned as well.
+    """
+    rt = R * t
+    dred = k3 * d
+    dknn = np.empty((d.shape[0], 9 + 1))
+    dknn[:, 0] = 1
+    for k in range(1, 9 + 1):
+        dknn[:, k] = dred * dknn[:, k - 1]
+
+    dknk = dknn[:, PAIR_KN]
+    expk = np.exp(-dknk)
+    expk[:, PAIR_KN == 0] = 1  # expn[0] = 1
+    sum0 = cg * dknn[:, PAIR_BN] * expk
+    bkd = PAIR_BNF - PAIR_KNF * dknk
+    ckd = PAIR_KNF * PAIR_KNF * dknk
+
+    ar01 = rt * (d * bt - dred * ct + np.einsum("ij,ij->i", sum0, bkd))
+    ar02 = rt * np.einsum("ij,ij->i", sum0, bkd * (bkd - 1) - ckd)
+
+    z = 1 + ar01 / R / t
+    p2 = d * R * t * z
+    dpdd = rt + 2 * ar01 + ar02  # d(P)/d(D) for use in density iteration
+    if not second:
+        return z, p2, dpdd
+
+    coefd2 = bkd * (bkd - 1) - ckd
+    ar03 = rt * np.einsum("ij,ij->i", sum0, (bkd - 2) * coefd2 + ckd * (1 - PAIR_KNF - 2 * bkd))
+    d2pdd2 = (2 * ar01 + 4 * ar02 + ar03) / d
+
+    return z, p2, dpdd, d2pdd2
+
+
+def check_solver(solver):
+    """Raise a ValueError if solver is not one of the density iteration schemes in SOLVERS."""
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown density solver {solver!r}, expected one of {SOLVERS}.")
+
+
+def density_batch(p, t, terms, d0=None, solver="newton"):
+    """Calculate density as a function of temperature and pressure for N points.
+
+    The Newton (or Halley) iteration in log(v) of AGA8Detail.density_detail() is run on all points
+    together; points drop out of the iteration individually as they converge or fail.
+
+    Arguments:
+        p: pressures (N,) in kPa.
+        t: temperatures (N,) in K.
+        terms: CompositionTerms, either shared by all points or with per-row arrays.
+        d0: optional initial density estimates (N,); the ideal gas estimate is used where d0 <= 0.
+        solver: density iteration scheme, "newton" or "halley".
+
+    Returns:
+        dict of arrays: D, z (density z), P2, ierr and niter (iterations used per point), plus creep, the
+        number of steps taken without a usable Newton step (vlog += 0.1) over all points.
+    """
+    check_solver(solver)
+    halley = solver == "halley"
+    n = p.shape[0]
+    k3, bs, csn = _rows(terms, n)
+
+    ideal = p / R / t
+    d = ideal.copy()
+    if d0 is not None:
+        d0 = np.broadcast_to(np.asarray(d0, dtype=float), (n,))
+        d = np.where(d0 > 0, d0, d)
+    z = np.full(n, np.nan)
+    p2 = np.full(n, np.nan)
+    ierr = np.ones(n, dtype=np.int8)
+    niter = np.zeros(n, dtype=np.int16)
+
+    valid = np.abs(p) >= EPSILON
+    d[~valid] = 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plog = np.log(p)
+        vlog = -np.log(d)
+
+    bt, ct, cg = isotherm_batch(bs, csn, tun_batch(t))  # T does not change during the iteration
+    active = np.flatnonzero(valid)
+    ncreep = 0
+    for _ in range(1, 20 + 1):
+        if active.size == 0:
+            break
+
+        # fail to converge, return ideal gas estimate
+        diverged = (vlog[active] < -7) | (vlog[active] > 100)
+        if diverged.any():
+            d[active[diverged]] = ideal[active[diverged]]
+            active = active[~diverged]
+
+        niter[active] += 1
+        vl = vlog[active]
+        da = np.exp(-vl)  # update the density
+        ta = t[active]
+        pressure = pressure_batch(
+            ta, da, k3[active], bt[active], ct[active], cg[active], second=halley
+        )
+        za, p2a, dpdda = pressure[:3]
+        d[active] = da
+        z[active] = za
+        p2[active] = p2a
+
+        creep = (dpdda < EPSILON) | (p2a < EPSILON)
+        ncreep += int(np.count_nonzero(creep))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Find the next density with a first order Newton's type iterative scheme, with
+            # log(P) as the known variable and log(v) as the unknown property.
+            dpdlv = -da * dpdda  # d(p)/d[log(v)]
+            vdiff = (np.log(p2a) - plog[active]) * p2a / dpdlv
+            if halley:
+                # Halley step from d(log P)/d(log v) and d2(log P)/d(log v)2, keeping the
+                # Newton step where the correction would more than halve or double it
+                dfdlv = dpdlv / p2a
+                d2fdlv2 = da * da * pressure[3] / p2a - dfdlv - dfdlv * dfdlv
+                correction = 1 - (np.log(p2a) - plog[active]) * d2fdlv2 / (2 * dfdlv * dfdlv)
+                vdiff = np.where((correction >= 0.5) & (correction <= 2), vdiff / correction, vdiff)
+        vl = np.where(creep, vl + 0.1, vl - vdiff)
+        vlog[active] = vl
+
+        converged = ~creep & (np.abs(vdiff) < TOLR)
+        done = active[converged]
+        d[done] = np.exp(-vl[converged])
+        ierr[done] = 0
+        active = active[~converged]
+
+    # failed to converge (reset D back to ideal gas density)
+    d[active] = ideal[active]
+    failed = ierr != 0
+    z[failed] = np.nan
+    p2[failed] = np.nan
+
+    return {"D": d, "z": z, "P2": p2, "ierr": ierr, "niter": niter, "creep": ncreep}
+
+
+def properties_batch(t, d, x, terms, plan=None):
+    """Calculate thermodynamic properties of a gas as a function of temperature and density for N points.
+
+    Arguments:
+        t: temperatures (N,) in K.
+        d: converged molar densities (N,) in mol/l.
+        x: mole fractions of the 21 components, shape (21,) or (N, 21).
+        terms: CompositionTerms, either shared by all points or with per-row arrays.
+        plan: EvaluationPlan of the requested outputs, every output by default. Stages that no requested
+            output needs are skipped, so the returned dict may hold more outputs than requested but not all.
+    """
+    plan = plan or evaluation_plan()
+    n = t.shape[0]
+    k3, bs, csn = _rows(terms, n)
+    mm = np.broadcast_to(np.asarray(terms.MM, dtype=float), (n,))
+
+    # Calculate the ideal gas Helmholtz energy, and its first and second derivatives with respect to temperature.
+    if plan.alpha_0:
+        a0 = alpha_0_batch(t, d, x)
+    # Calculate the real gas Helmholtz energy, and its derivatives with respect to temperature and/or density.
+    ar = alpha_r_batch(t, d, k3, bs, csn, itau=plan.itau)
+
+    rt = R * t
+    out = {}
+    out["z"] = z = 1 + ar[0][1] / rt
+    out["P3"] = p3 = d * rt * z
+    out["dpdd"] = dpdd = rt + 2 * ar[0][1] + ar[0][2]
+
+    dense = d > EPSILON
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["d2pdd2"] = np.where(dense, (2 * ar[0][1] + 4 * ar[0][2] + ar[0][3]) / d, 0)
+        if plan.itau > 0:
+            out["dpdt"] = dpdt = d * R + d * ar[1][1]
+        if plan.alpha_0:
+            out["A"] = a = a0[0] + ar[0][0]
+            out["G"] = np.where(dense, a + p3 / d, a + rt)
+        if plan.alpha_0 and plan.itau > 0:
+            out["S"] = s = -a0[1] - ar[1][0]
+            out["U"] = u = a + t * s
+            out["cv"] = cv = -(a0[2] + ar[2][0])
+            out["H"] = np.where(dense, u + p3 / d, u + rt)
+            out["cp"] = cp = np.where(dense, cv + t * (dpdt / d) ** 2 / dpdd, cv + R)
+            out["JT"] = np.where(dense, (t / d * dpdt / dpdd - 1) / cp / d, 1e20)
+
+            w = 1000 * cp / cv * dpdd / mm
+            out["W"] = w = np.sqrt(np.maximum(w, 0))  # force >= 0
+            out["kappa"] = w**2 * mm / (rt * 1000 * z)
+
+    return out
+
+
+def _take(terms, x, rows):
+    """Select the rows of per-row composition terms and mole fractions (shared ones are kept as is)."""
+    if np.ndim(terms.K3) > 0:
+        terms = CompositionTerms(*(np.asarray(value)[rows] for value in terms))
+    if x.shape[0] > 1:
+        x = x[rows]
+
+    return terms, x
+
+
+def _run_chunk(p, t, x, terms, d0, results, start, solver="newton", plan=None, telemetry=None):
+    """Run the density and properties calculations for one chunk of points and store the planned outputs in results."""
+    plan = plan or evaluation_plan()
+    stop = start + p.shape[0]
+    if telemetry is None:
+        density = density_batch(p, t, terms, d0=d0, solver=solver)
+    else:
+        density = telemetry.timed("density", density_batch)(p, t, terms, d0=d0, solver=solver)
+        telemetry.record_density_batch(p, density["niter"], density["ierr"], density["creep"])
+    density["zd"] = density["z"]
+    for name in DENSITY_OUTPUTS:
+        if name in results:
+            results[name][start:stop] = density[name]
+    results["ierr"][start:stop] = density["ierr"]
+    results["niter"][start:stop] = density["niter"]
+
+    rows = np.flatnonzero(density["ierr"] == 0)
+    if rows.size and plan.properties:
+        terms_ok, x_ok = _take(terms, x, rows)
+        if telemetry is None:
+            props = properties_batch(t[rows], density["D"][rows], x_ok, terms_ok, plan)
+        else:
+            props = telemetry.timed("properties", properties_batch)(t[rows], density["D"][rows], x_ok, terms_ok, plan)
+        for name in plan.outputs:
+            if name in props:
+                results[name][start + rows] = props[name]
+
+
+def run_batch(
+    p,
+    t,
+    x,
+    terms=None,
+    d0=None,
+    chunksize=CHUNKSIZE,
+    solver="newton",
+    engine="numpy",
+    properties=None,
+    telemetry=None,
+):
+    """Run the density and properties calculations of the DETAIL method on N (P, T) points.
+
+    Points are processed in chunks of chunksize to bound the size of the (chunk, 58) work arrays.
+
+    Arguments:
+        p, t: pressures (kPa) and temperatures (K), broadcast to 1-D arrays of length N.
+        x: mole fractions of the 21 components, shape (21,) or (N, 21) (a dummy 0 at index 0 is dropped).
+        terms: CompositionTerms for x (shared or per-row); calculated with x_terms_batch() when None.
+        d0: optional initial density estimates (N,).
+        chunksize: number of points evaluated together.
+        solver: density iteration scheme, "newton" or "halley".
+        engine: "numpy" (vectorised, chunked) or "numba" (compiled, parallel over points, see
+            modules.numba_engine). The NumPy engine is used, with a warning, if Numba is not installed.
+        properties: names of the outputs to calculate (see evaluation_plan()), every output if None.
+        telemetry: optional Telemetry (modules.telemetry) recording the stage timings and density iterations.
+            The Numba engine is timed as one "numba" stage and does not count the creep steps.
+
+    Returns:
+        dict of 1-D arrays keyed by the requested AGA8Detail output names, plus MM, ierr, herr and niter.
+        Points where the density iteration failed have ierr=1, D set to the ideal gas density and
+        NaN for every other property.
+    """
+    check_solver(solver)
+    plan = evaluation_plan(properties)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}.")
+    if engine == "numba":
+        from modules import numba_engine  # imported on first use as it depends on this module
+
+        if numba_engine.HAVE_NUMBA:
+            run = numba_engine.run_batch_numba
+            if telemetry is None:
+                return run(p, t, x, terms=terms, d0=d0, solver=solver, properties=properties)
+            results = telemetry.timed("numba", run)(p, t, x, terms=terms, d0=d0, solver=solver, properties=properties)
+            p = np.broadcast_to(np.asarray(p, dtype=float), results["ierr"].shape)
+            telemetry.record_density_batch(p, results["niter"], results["ierr"])
+            return results
+        warnings.warn("Numba is not installed, using the NumPy engine instead.", RuntimeWarning)
+
+    p, t, x = as_state(p, t, x)
+    n = p.shape[0]
+    if d0 is not None:
+        d0 = np.broadcast_to(np.asarray(d0, dtype=float), (n,))
+    if terms is None and x.shape[0] == 1:
+        terms = x_terms_batch(x)
+        terms = CompositionTerms(*(np.asarray(value)[0] for value in terms))
+
+    results = {name: np.full(n, np.nan) for name in plan.outputs}
+    results["MM"] = np.empty(n)
+    results["ierr"] = np.ones(n, dtype=np.int8)
+    results["niter"] = np.zeros(n, dtype=np.int16)
+
+    for start in range(0, n, chunksize):
+        rows = slice(start, min(start + chunksize, n))
+        if terms is None:
+            x_chunk = x[rows]
+            if telemetry is None:
+                terms_chunk = x_terms_batch(x_chunk)
+            else:
+                terms_chunk = telemetry.timed("x_terms", x_terms_batch)(x_chunk)
+        else:
+            terms_chunk, x_chunk = _take(terms, x, rows)
+        results["MM"][rows] = terms_chunk.MM
+        _run_chunk(
+            p[rows],
+            t[rows],
+            x_chunk,
+            terms_chunk,
+            None if d0 is None else d0[rows],
+            results,
+            start,
+            solver,
+            plan,
+            telemetry,
+        )
+
+    results["herr"] = HERR[results["ierr"]]
+
+    return results
+
+
+def composition_array(x):
+    """Convert 22-element compositions (dummy 0 at index 0) into arrays of the 21 mole fractions."""
+    x = np.asarray(x, dtype=float)
+    if x.shape[-1] == NCDETAIL + 1:
+        x = x[..., 1:]
+
+    return x
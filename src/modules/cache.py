@@ -0,0 +1,103 @@
+"""cache.py module contains the opt-in caches used to skip repeated work in the DETAIL method."""
+
+import hashlib
+import struct
+import threading
+from collections import OrderedDict, namedtuple
+
+from modules.composition import Composition
+
+# Temperature-dependent terms of one (composition, T): tun[n] = T^(-un[n]) and, per component,
+# the (sumhyp0, sumhyp1, sumhyp2) sums of the ideal gas part, None until a calculation needed them
+# (see AGA8Detail.isotherm_detail()).
+IsothermTerms = namedtuple("IsothermTerms", ["tun", "sumhyp"])
+
+
+class LRUCache:
+    """Bounded least-recently-used cache with hit, miss and eviction counters.
+
+    The cache is thread-safe, so one instance can be shared by every AGA8Detail calculation in a process.
+    """
+
+    def __init__(self, maxsize=256):
+        """Initialisation.
+
+        Arguments:
+            maxsize: maximum number of entries kept; the least recently used entry is evicted beyond it.
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1.")
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of cached entries."""
+        return len(self._data)
+
+    def __contains__(self, key):
+        """Return True if key is cached (without counting a hit or a miss)."""
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Return the value cached for key, marking it as most recently used, or default on a miss."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def put(self, key, value):
+        """Cache value under key, evicting the least recently used entry if the cache is full."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """Return the cache counters as a dict."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+
+def composition_key(x):
+    """Return a canonical, hashable key for a 22-element gas composition (dummy 0 at index 0).
+
+    Lists, tuples, NumPy arrays and Compositions with the same mole fractions map to the same key.
+    """
+    if isinstance(x, Composition):
+        return x.key
+
+    return tuple(float(xi) for xi in x[1:])
+
+
+def composition_hash(x):
+    """Return a stable hex digest of a 22-element gas composition, e.g. to label stored results."""
+    key = composition_key(x)
+
+    return hashlib.sha256(struct.pack(f"<{len(key)}d", *key)).hexdigest()
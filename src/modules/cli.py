@@ -0,0 +1,268 @@
+"""cli.py module contains the command line batch processor for CSV and Parquet files of gas states."""
+
+import argparse
+import csv
+import sys
+import time
+
+from modules.batch import OUTPUTS
+from modules.constants import ENGINES, NCDETAIL, SOLVERS
+from modules.molecule import COMPONENTS
+from modules.parallel import compute_parallel, make_pool
+
+import numpy as np
+
+CHUNKSIZE = 100_000  # default number of rows read, evaluated and written at a time
+RESULTS = OUTPUTS + ("MM", "ierr", "niter")  # columns that can be written for every row
+
+
+def _is_parquet(path):
+    """Return True if the file extension is .parquet or .pq."""
+    return str(path).lower().endswith((".parquet", ".pq"))
+
+
+def _import_pyarrow():
+    """Import pyarrow and pyarrow.parquet, which are only needed for Parquet files."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise SystemExit("Parquet files need pyarrow to be installed (pip install pyarrow).") from error
+
+    return pa, pq
+
+
+def _csv_chunks(path, chunksize):
+    """Read a CSV file chunksize rows at a time, yielding dicts of column name -> list of strings.
+
+    Blank lines are skipped.
+
+    Raises:
+        ValueError: if a row does not have one value per header column.
+    """
+    with open(path, newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        rows = []
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != len(header):
+                raise ValueError(
+                    f"Line {reader.line_num} of the input file has {len(row)} values, expected {len(header)} "
+                    f"(one per header column)."
+                )
+            rows.append(row)
+            if len(rows) == chunksize:
+                yield dict(zip(header, zip(*rows)))
+                rows = []
+        if rows:
+            yield dict(zip(header, zip(*rows)))
+
+
+def _parquet_chunks(path, chunksize):
+    """Read a Parquet file chunksize rows at a time, yielding dicts of column name -> array."""
+    _, pq = _import_pyarrow()
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+        yield {
+            name: column.to_numpy(zero_copy_only=False)
+            for name, column in zip(batch.schema.names, batch.columns)
+        }
+
+
+def read_chunks(path, chunksize=CHUNKSIZE):
+    """Stream the rows of a CSV or Parquet file as dicts of columns, without loading the whole file."""
+    if _is_parquet(path):
+        return _parquet_chunks(path, chunksize)
+
+    return _csv_chunks(path, chunksize)
+
+
+class CsvWriter:
+    """Write result chunks to a CSV file as they are produced."""
+
+    def __init__(self, path, columns):
+        """Initialisation."""
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, chunk):
+        """Append the rows of a dict of equal-length columns."""
+        self.writer.writerows(zip(*(np.asarray(values).tolist() for values in chunk.values())))
+
+    def close(self):
+        """Close the file."""
+        self.file.close()
+
+
+class ParquetWriter:
+    """Write result chunks to a Parquet file as they are produced (one row group per chunk)."""
+
+    def __init__(self, path, columns):
+        """Initialisation."""
+        self.pa, self.pq = _import_pyarrow()
+        self.path = path
+        self.columns = columns
+        self.writer = None
+
+    def write(self, chunk):
+        """Append the rows of a dict of equal-length columns as a row group."""
+        table = self.pa.table({name: np.asarray(chunk[name]) for name in self.columns})
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        """Close the file."""
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _floats(chunk, name, first_row=1):
+    """Return a column of a chunk as a float array.
+
+    Arguments:
+        chunk: dict of column name -> values, see read_chunks().
+        name: column to convert.
+        first_row: number of the first row of the chunk in the input file (1 for the first data row),
+            used to report an empty or non-numeric value.
+    """
+    if name not in chunk:
+        raise SystemExit(f"Column {name!r} not found in the input file.")
+
+    try:
+        return np.asarray(chunk[name], dtype=float)
+    except (TypeError, ValueError):
+        for i, value in enumerate(chunk[name]):
+            try:
+                float(value)
+            except (TypeError, ValueError):
+                raise SystemExit(
+                    f"Row {first_row + i} of the input file: column {name!r} holds {value!r}, not a number."
+                ) from None
+        raise
+
+
+def composition_matrix(chunk, columns, scale=1.0, first_row=1):
+    """Return the (N, 21) mole fractions of a chunk; components without a column are 0."""
+    present = [name for name in columns if name in chunk]
+    if not present:
+        raise SystemExit("None of the composition columns were found in the input file (see --x-columns).")
+
+    n = len(chunk[present[0]])
+    x = np.zeros((n, NCDETAIL))
+    for i, name in enumerate(columns):
+        if name in chunk:
+            x[:, i] = _floats(chunk, name, first_row) / scale
+
+    return x
+
+
+def process(args, report=None):
+    """Evaluate every chunk of the input file and write the results incrementally.
+
+    Arguments:
+        args: parsed command line arguments, see parse_args().
+        report: text stream of the progress and throughput report, sys.stderr by default.
+
+    Returns:
+        dict with the number of rows, failed rows, chunks and elapsed seconds.
+    """
+    outputs = args.outputs.split(",") if args.outputs else list(RESULTS)
+    unknown = sorted(set(outputs) - set(RESULTS))
+    if unknown:
+        raise SystemExit(f"Unknown output column(s) {unknown}, expected a subset of {list(RESULTS)}.")
+    x_columns = args.x_columns.split(",") if args.x_columns else list(COMPONENTS)
+    if len(x_columns) != NCDETAIL:
+        raise SystemExit(f"--x-columns needs {NCDETAIL} column names in DETAIL component order.")
+    composition = None
+    if args.composition:
+        composition = np.array([float(value) for value in args.composition.split(",")]) / args.scale
+        if composition.size != NCDETAIL:
+            raise SystemExit(f"--composition needs {NCDETAIL} mole fractions in DETAIL component order.")
+
+    properties = [name for name in outputs if name in OUTPUTS]  # only the stages these need are run
+    report = report or sys.stderr
+    columns = args.keep + outputs
+    writer = (ParquetWriter if _is_parquet(args.output) else CsvWriter)(args.output, columns)
+    pool = make_pool(args.jobs) if args.jobs != 1 else None  # one pool of workers for every chunk
+    stats = {"rows": 0, "failed": 0, "chunks": 0}
+    start = time.perf_counter()
+    try:
+        for chunk in read_chunks(args.input, args.chunksize):
+            first_row = stats["rows"] + 1
+            p = _floats(chunk, args.p_column, first_row) * args.p_factor
+            t = _floats(chunk, args.t_column, first_row) + args.t_offset
+            x = composition if composition is not None else composition_matrix(chunk, x_columns, args.scale, first_row)
+            if x.ndim > 1 and (x == x[0]).all():
+                x = x[0]  # one composition for the whole chunk, its terms are calculated once
+
+            results = compute_parallel(
+                p, t, x, workers=args.jobs, solver=args.solver, engine=args.engine, pool=pool, properties=properties
+            )
+
+            out = {name: chunk[name] for name in args.keep}
+            out.update((name, results[name]) for name in outputs)
+            writer.write(out)
+
+            stats["rows"] += p.size
+            stats["failed"] += int(np.count_nonzero(results["ierr"]))
+            stats["chunks"] += 1
+            if not args.quiet:
+                elapsed = time.perf_counter() - start
+                print(f"{stats['rows']} rows ({stats['rows'] / elapsed:.0f} rows/s)", file=report)
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown()
+
+    stats["elapsed"] = time.perf_counter() - start
+    rate = stats["rows"] / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+    print(
+        f"Processed {stats['rows']} rows in {stats['chunks']} chunks, {stats['failed']} failed to converge, "
+        f"in {stats['elapsed']:.2f} s ({rate:.0f} rows/s).",
+        file=report,
+    )
+
+    return stats
+
+
+def parse_args(argv=None):
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="aga8-detail",
+        description="Run the AGA8 DETAIL method on every row of a CSV or Parquet file of P, T and gas compositions.",
+    )
+    parser.add_argument("input", help="input CSV or Parquet (.parquet, .pq) file")
+    parser.add_argument("output", help="output CSV or Parquet (.parquet, .pq) file")
+    parser.add_argument("--p-column", default="P", help="pressure column (default: P)")
+    parser.add_argument("--t-column", default="T", help="temperature column (default: T)")
+    parser.add_argument("--p-factor", type=float, default=1.0, help="factor converting the pressures to kPa (e.g. 100 for bar)")
+    parser.add_argument("--t-offset", type=float, default=0.0, help="offset converting the temperatures to K (e.g. 273.15 for C)")
+    parser.add_argument(
+        "--x-columns",
+        help=f"comma-separated names of the {NCDETAIL} composition columns in DETAIL order "
+        "(default: the component names, e.g. Methane,Nitrogen,...); missing columns are 0",
+    )
+    parser.add_argument("--composition", help=f"{NCDETAIL} comma-separated mole fractions used for every row")
+    parser.add_argument("--scale", type=float, default=1.0, help="divisor of the compositions (100 for mol%%)")
+    parser.add_argument("--keep", nargs="*", default=[], help="input columns copied to the output (e.g. a timestamp)")
+    parser.add_argument("--outputs", help=f"comma-separated output columns (default: all of {','.join(RESULTS)})")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help=f"rows per chunk (default: {CHUNKSIZE})")
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes (default: 1, 0 for all cores)")
+    parser.add_argument("--solver", choices=SOLVERS, default="newton", help="density iteration scheme")
+    parser.add_argument("--engine", choices=ENGINES, default="numpy", help="batch engine")
+    parser.add_argument("--quiet", action="store_true", help="only print the final report")
+
+    args = parser.parse_args(argv)
+    args.jobs = args.jobs or None  # compute_parallel() uses every core for None
+
+    return args
+
+
+def main(argv=None):
+    """Command line entry point."""
+    process(parse_args(argv))
+
+    return 0
@@ -0,0 +1,114 @@
+"""composition.py module contains the immutable gas composition type used in the AGA8 DETAIL method."""
+
+import math
+
+from modules.molecule import COMPONENTS, MmDetail
+
+NORMALISATION_TOL = 1e-6  # largest |sum(x) - 1| accepted as normalised by Composition.is_normalised
+
+
+class Composition(tuple):
+    """Immutable, hashable gas composition validated once and reused across calculations.
+
+    A Composition is the 22-element tuple of mole fractions (dummy 0 at index 0) that every function taking a
+    composition x accepts, so it can be passed wherever a list is. It also carries the indices of the components
+    present (nonzero), the molar mass (MM) and, computed on first use and kept, the composition terms of
+    x_terms_detail() (terms). Passing the same Composition to many AGA8Detail calculations therefore skips the
+    composition stage after the first one.
+    """
+
+    def __new__(cls, x, normalise=False):
+        """Build a composition from mole fractions.
+
+        Arguments:
+            x: mole fractions as a 22-element sequence (dummy 0 at index 0), a 21-element sequence in
+                COMPONENTS order, or a dict of {component name: mole fraction} (see from_names()).
+            normalise: divide the mole fractions by their sum.
+
+        Raises:
+            ValueError: for an unknown component name, a wrong length, or mole fractions that are negative,
+                not finite or all zero.
+        """
+        if isinstance(x, dict):
+            unknown = set(x) - set(COMPONENTS)
+            if unknown:
+                raise ValueError(f"Unknown components {sorted(unknown)}, expected names from {COMPONENTS}.")
+            fractions = [float(x.get(name, 0)) for name in COMPONENTS]
+        else:
+            fractions = [float(xi) for xi in x]
+            if len(fractions) == len(COMPONENTS) + 1:
+                fractions = fractions[1:]
+            elif len(fractions) != len(COMPONENTS):
+                raise ValueError(
+                    f"Expected {len(COMPONENTS)} mole fractions (or {len(COMPONENTS) + 1} with a dummy 0 at index 0), "
+                    f"got {len(fractions)}."
+                )
+
+        if not all(math.isfinite(xi) and xi >= 0 for xi in fractions):
+            raise ValueError("Mole fractions must be finite and non-negative.")
+        total = sum(fractions)
+        if total <= 0:
+            raise ValueError("At least one mole fraction must be positive.")
+        if normalise:
+            fractions = [xi / total for xi in fractions]
+
+        self = super().__new__(cls, [0] + fractions)
+        object.__setattr__(self, "key", tuple(fractions))  # see modules.cache.composition_key()
+        object.__setattr__(self, "nonzero", tuple(i for i in range(1, len(self)) if self[i] > 0))
+        # summed over every component in order, as AGA8Detail.molar_mass_detail() does
+        mm = 0
+        for xi, name in zip(fractions, COMPONENTS):
+            mm += xi * MmDetail[name]
+        object.__setattr__(self, "MM", mm)
+        object.__setattr__(self, "_terms", None)
+
+        return self
+
+    @classmethod
+    def from_names(cls, fractions, normalise=False):
+        """Build a composition from a dict of {component name: mole fraction}, e.g. {"Methane": 0.9, "Ethane": 0.1}."""
+        return cls(dict(fractions), normalise=normalise)
+
+    def __setattr__(self, name, value):
+        """Refuse to change an attribute, as the composition is immutable."""
+        raise AttributeError("Composition is immutable.")
+
+    def __delattr__(self, name):
+        """Refuse to delete an attribute, as the composition is immutable."""
+        raise AttributeError("Composition is immutable.")
+
+    def __repr__(self):
+        """Return the components present and their mole fractions."""
+        return f"Composition({self.as_dict()!r})"
+
+    def __reduce__(self):
+        """Pickle the mole fractions only, the derived attributes are rebuilt on loading."""
+        return (Composition, (tuple(self),))
+
+    @property
+    def is_normalised(self):
+        """True if the mole fractions sum to 1 within NORMALISATION_TOL."""
+        return abs(sum(self[1:]) - 1) <= NORMALISATION_TOL
+
+    @property
+    def terms(self):
+        """Return the CompositionTerms (molar mass and x_terms_detail() terms), calculated on first use."""
+        if self._terms is None:
+            from modules.AGA8Detail import AGA8Detail  # imported on first use as it depends on this module
+
+            calc = AGA8Detail(p=None, t=None, x=self).molar_mass_detail().x_terms_detail()
+            object.__setattr__(self, "_terms", calc.composition_terms())
+
+        return self._terms
+
+    def as_dict(self):
+        """Return {component name: mole fraction} of the components present."""
+        return {COMPONENTS[i - 1]: self[i] for i in self.nonzero}
+
+
+def nonzero_components(x):
+    """Return the indices (1..21) of the components present in a 22-element composition, precomputed for a Composition."""
+    if isinstance(x, Composition):
+        return x.nonzero
+
+    return tuple(i for i in range(1, len(x)) if x[i] > 0)
@@ -0,0 +1,371 @@
+"""constants.py module builds the mixture-independent constants used in the AGA8 DETAIL method once per process."""
+
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import warnings
+from functools import lru_cache
+
+VERSION = "1.0.0"  # package version, read by setup.py and recorded in the constants file and stored results
+NTERMS = 58  # number of terms in the DETAIL equation of state
+NCDETAIL = 21  # number of components in the DETAIL model
+MAXFLDS = 21
+EPSILON = 1e-15
+TOLR = 0.0000001  # convergence tolerance of the density iteration
+R = 8.31451  # molar gas constant (J/(mol-K))
+SOLVERS = ("newton", "halley")  # density iteration schemes, see AGA8Detail.density_detail()
+ENGINES = ("numpy", "numba")  # batch engines, see batch.run_batch()
+FLASH_TOL = 1e-10  # convergence tolerance of the PH and PS flash, relative to T
+FLASH_MAXITER = 50  # temperature iterations of the PH and PS flash before it gives up
+FLASH_MAXSTEP = 0.2  # largest relative temperature change of one flash iteration
+
+# precompiled DETAIL parameter tables shipped with the package, see write_constants() and load_constants()
+CONSTANTS_FILE = os.path.join(os.path.dirname(__file__), "data", "detail_constants.bin")
+CONSTANTS_MAGIC = b"AGA8CONS"
+CONSTANTS_FORMAT = 1
+
+
+class DetailConstants:
+    """Read-only container holding the DETAIL parameter tables shared by every AGA8Detail instance.
+
+    All tables keep the 1-based layout of the C++ code (index 0 is a dummy) and are stored as
+    (nested) tuples so that they cannot be mutated by a calculation. The *_packed tables hold the
+    upper triangle (i <= j) of the binary tables, see packed_index(); bsnij2_packed rows hold n = 1..18.
+    """
+
+    __slots__ = (
+        "an",
+        "bn",
+        "kn",
+        "un",
+        "fn",
+        "gn",
+        "qn",
+        "sn",
+        "wn",
+        "ei",
+        "ki",
+        "gi",
+        "qi",
+        "fi",
+        "si",
+        "wi",
+        "eij",
+        "uij",
+        "kij",
+        "gij",
+        "n0i",
+        "th0i",
+        "ki25",
+        "ei25",
+        "bsnij2",
+        "kij5",
+        "uij5",
+        "gij5",
+        "bsnij2_packed",
+        "kij5_packed",
+        "uij5_packed",
+        "gij5_packed",
+    )
+
+    def __init__(self, **tables):
+        """Initialisation."""
+        for name in self.__slots__:
+            object.__setattr__(self, name, _freeze(tables[name]))
+
+    def __setattr__(self, name, value):
+        """Prevent the shared tables from being rebound."""
+        raise AttributeError("DETAIL constants are read-only.")
+
+
+def packed_index(i, j):
+    """Return the position of the pair (i, j), 1 <= i <= j <= MAXFLDS, in a packed upper-triangular table."""
+    return (i - 1) * MAXFLDS - (i - 1) * (i - 2) // 2 + (j - i)
+
+
+def _pack(table):
+    """Pack the upper triangle (i <= j) of a binary (i, j) table row by row into a flat list."""
+    return [table[i][j] for i in range(1, MAXFLDS + 1) for j in range(i, MAXFLDS + 1)]
+
+
+def _freeze(table):
+    """Recursively convert a nested list into nested tuples."""
+    if isinstance(table, list):
+        return tuple(_freeze(value) for value in table)
+
+    return table
+
+
+def build_constants():
+    """Initialise all the constants and parameters in the DETAIL model.
+
+    This is the work formerly done by AGA8Detail.setup_detail() on every run. get_constants() loads the
+    result from CONSTANTS_FILE instead, so this only runs to regenerate the file or when it cannot be read.
+    """
+    from modules.initialise import (
+        initialise_an,
+        initialise_bn,
+        initialise_bsnij2,
+        initialise_ei,
+        initialise_fi,
+        initialise_fn,
+        initialise_gi,
+        initialise_gn,
+        initialise_i25_arrays,
+        initialise_ij5_arrays,
+        initialise_ij_arrays,
+        initialise_ki,
+        initialise_kn,
+        initialise_n0i,
+        initialise_qi,
+        initialise_qn,
+        initialise_si,
+        initialise_sn,
+        initialise_th0i,
+        initialise_un,
+        initialise_wi,
+        initialise_wn,
+    )
+
+    an = initialise_an(n=NTERMS)
+    bn = initialise_bn(n=NTERMS)
+    kn = initialise_kn(n=NTERMS)
+    un = initialise_un(n=NTERMS)
+    fn = initialise_fn(n=NTERMS)
+    gn = initialise_gn(n=NTERMS)
+    qn = initialise_qn(n=NTERMS)
+    sn = initialise_sn(n=NTERMS)
+    wn = initialise_wn(n=NTERMS)
+    ei = initialise_ei(n=MAXFLDS)  # energy params
+    ki = initialise_ki(n=MAXFLDS)  # size params
+    gi = initialise_gi(n=MAXFLDS)  # orientation params
+    eij, uij, kij, gij = initialise_ij_arrays(n=MAXFLDS)
+    # quadrupole params
+    qi = initialise_qi(n=MAXFLDS)
+    fi = initialise_fi(n=MAXFLDS)
+    si = initialise_si(n=MAXFLDS)
+    wi = initialise_wi(n=MAXFLDS)
+    # ideal gas params
+    n0i = initialise_n0i(n=MAXFLDS)
+    th0i = initialise_th0i(n=MAXFLDS)
+    # precalculation of constants
+    ki25, ei25 = initialise_i25_arrays(n=MAXFLDS)
+    kij5, uij5, gij5 = initialise_ij5_arrays(n=MAXFLDS)
+    bsnij2 = initialise_bsnij2(n=MAXFLDS)
+
+    for i in range(1, MAXFLDS + 1):
+        ki25[i] = math.pow(ki[i], 2.5)
+        ei25[i] = math.pow(ei[i], 2.5)
+
+    for i in range(1, MAXFLDS + 1):
+        for j in range(1, MAXFLDS + 1):
+            for n in range(1, 18 + 1):
+                bsnij = 1  # initialise Bs_nij @ 1
+                if gn[n] == 1:
+                    bsnij = gij[i][j] * (gi[i] + gi[j]) / 2
+                if qn[n] == 1:
+                    bsnij = bsnij * qi[i] * qi[j]
+                if fn[n] == 1:
+                    bsnij = bsnij * fi[i] * fi[j]
+                if sn[n] == 1:
+                    bsnij = bsnij * si[i] * si[j]
+                if wn[n] == 1:
+                    bsnij = bsnij * wi[i] * wi[j]
+
+                bsnij2[i][j][n] = (
+                    an[n]
+                    * math.pow(eij[i][j] * math.sqrt(ei[i] * ei[j]), un[n])
+                    * math.pow(ki[i] * ki[j], 1.5)
+                    * bsnij
+                )
+
+            kij5[i][j] = (math.pow(kij[i][j], 5) - 1) * ki25[i] * ki25[j]
+            uij5[i][j] = (math.pow(uij[i][j], 5) - 1) * ei25[i] * ei25[j]
+            gij5[i][j] = (gij[i][j] - 1) * (gi[i] + gi[j]) / 2
+
+    # Ideal gas terms
+    d0 = 101.325 / R / 298.15
+
+    for i in range(1, MAXFLDS + 1):
+        n0i[i][3] = n0i[i][3] - 1
+        n0i[i][1] = n0i[i][1] - math.log(d0)
+
+    return DetailConstants(
+        an=an,
+        bn=bn,
+        kn=kn,
+        un=un,
+        fn=fn,
+        gn=gn,
+        qn=qn,
+        sn=sn,
+        wn=wn,
+        ei=ei,
+        ki=ki,
+        gi=gi,
+        qi=qi,
+        fi=fi,
+        si=si,
+        wi=wi,
+        eij=eij,
+        uij=uij,
+        kij=kij,
+        gij=gij,
+        n0i=n0i,
+        th0i=th0i,
+        ki25=ki25,
+        ei25=ei25,
+        bsnij2=bsnij2,
+        kij5=kij5,
+        uij5=uij5,
+        gij5=gij5,
+        # binary tables are only ever read for i <= j, so they are also stored packed
+        bsnij2_packed=[row[1:] for row in _pack(bsnij2)],
+        kij5_packed=_pack(kij5),
+        uij5_packed=_pack(uij5),
+        gij5_packed=_pack(gij5),
+    )
+
+
+def _flatten(table):
+    """Return the shape of a rectangular nested tuple and its values in C order."""
+    if not isinstance(table, tuple):
+        return (), [table]
+
+    shapes, values = zip(*(_flatten(value) for value in table))
+
+    return (len(table),) + shapes[0], [value for row in values for value in row]
+
+
+def _nest(values, shape):
+    """Rebuild a nested tuple of the given shape from its values in C order."""
+    if len(shape) == 1:
+        return tuple(values)
+
+    step = len(values) // shape[0]
+
+    return tuple(_nest(values[k * step : (k + 1) * step], shape[1:]) for k in range(shape[0]))
+
+
+def write_constants(path=CONSTANTS_FILE, constants=None):
+    """Serialise the DETAIL parameter tables into a versioned, checksummed binary file.
+
+    Layout: CONSTANTS_MAGIC (8 bytes), the length of the header (little-endian uint64), a UTF-8 JSON header
+    (format and engine versions, byte order, SHA-256 of the payload and, per table, its name, shape, kind and
+    byte offsets) and the payload. Each table is stored as float64 ("d"), int64 ("q") or, for tables mixing
+    ints and floats, float64 values followed by one uint8 per value marking the ints ("m"), so that the
+    loaded tables are identical to those of build_constants(). Run python -m modules.constants to regenerate
+    the file after changing modules/initialise.py.
+
+    Arguments:
+        path: file to create (overwritten if it exists).
+        constants: DetailConstants to write, build_constants() by default.
+    """
+    constants = constants or build_constants()
+    tables = []
+    payload = bytearray()
+    for name in DetailConstants.__slots__:
+        shape, values = _flatten(getattr(constants, name))
+        ints = [type(value) is int for value in values]
+        kind = "q" if all(ints) else "d" if not any(ints) else "m"
+        table = {"name": name, "shape": shape, "kind": kind, "offset": len(payload)}
+        payload += struct.pack(f"<{len(values)}{'q' if kind == 'q' else 'd'}", *values)
+        if kind == "m":
+            table["mask_offset"] = len(payload)
+            payload += bytes(ints)
+            payload += bytes(-len(payload) % 8)  # keep the next table 8-byte aligned
+        tables.append(table)
+
+    header = {
+        "format_version": CONSTANTS_FORMAT,
+        "engine_version": VERSION,
+        "byteorder": "little",
+        "checksum": hashlib.sha256(payload).hexdigest(),
+        "tables": tables,
+    }
+    encoded = json.dumps(header).encode()
+    encoded = encoded.ljust(len(encoded) + -(len(CONSTANTS_MAGIC) + 8 + len(encoded)) % 8)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(CONSTANTS_MAGIC + struct.pack("<Q", len(encoded)) + encoded + payload)
+
+
+def load_constants(path=CONSTANTS_FILE):
+    """Read the DETAIL parameter tables written by write_constants() through a read-only memory map.
+
+    The file is mapped only while it is read: the tables are copied into the nested tuples of DetailConstants,
+    which the scalar path indexes faster than buffer views, so nothing stays shared with the file.
+
+    Raises:
+        OSError: if the file cannot be opened.
+        ValueError: if the file is not a constants file or is truncated, its header or table descriptions are
+            damaged, it was written by another format or engine version or for another byte order, or its
+            checksum does not match.
+    """
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if data[: len(CONSTANTS_MAGIC)] != CONSTANTS_MAGIC:
+            raise ValueError(f"{path} is not a DETAIL constants file.")
+        try:
+            (length,) = struct.unpack_from("<Q", data, len(CONSTANTS_MAGIC))
+            start = len(CONSTANTS_MAGIC) + 8
+            header = json.loads(bytes(data[start : start + length]))
+            found = (header["format_version"], header["engine_version"], header["byteorder"])
+            checksum = header["checksum"]
+        except (struct.error, KeyError, TypeError, UnicodeDecodeError, json.JSONDecodeError) as error:
+            raise ValueError(f"{path} has a damaged header ({error!r}).") from error
+        expected = (CONSTANTS_FORMAT, VERSION, sys.byteorder)
+        if found != expected:
+            raise ValueError(f"{path} has (format, engine version, byte order) {found}, expected {expected}.")
+
+        with memoryview(data) as view, view[start + length :] as payload:
+            if hashlib.sha256(payload).hexdigest() != checksum:
+                raise ValueError(f"{path} is corrupt, its checksum does not match.")
+
+            try:
+                tables = {}
+                for table in header["tables"]:
+                    size = math.prod(table["shape"])
+                    offset = table["offset"]
+                    kind = "q" if table["kind"] == "q" else "d"
+                    values = payload[offset : offset + 8 * size].cast(kind).tolist()
+                    if table["kind"] == "m":
+                        mask = payload[table["mask_offset"] : table["mask_offset"] + size].tolist()
+                        values = [int(value) if flag else value for value, flag in zip(values, mask)]
+                    tables[table["name"]] = _nest(values, table["shape"])
+                constants = DetailConstants(**tables)
+            except (KeyError, TypeError) as error:
+                raise ValueError(f"{path} has a damaged table description ({error!r}).") from error
+
+    return constants
+
+
+@lru_cache(maxsize=None)
+def get_constants():
+    """Return the process-wide DetailConstants, loaded from CONSTANTS_FILE on first use.
+
+    The tables are built with build_constants() instead, with a RuntimeWarning, if the file is missing or invalid.
+    """
+    try:
+        return load_constants()
+    except (OSError, ValueError) as error:
+        warnings.warn(f"Building the DETAIL constants, as {error}", RuntimeWarning)
+        return build_constants()
+
+
+def main(argv=None):
+    """Regenerate CONSTANTS_FILE (or the file given as the first argument) from modules/initialise.py."""
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else CONSTANTS_FILE
+    write_constants(path)
+    print(f"Wrote the DETAIL constants to {path}.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
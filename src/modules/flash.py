@@ -0,0 +1,136 @@
+"""flash.py module contains the batch PH and PS flash calculations of the DETAIL method.
+
+A flash finds the temperature at which a gas at a known pressure has a given molar enthalpy (PH) or entropy
+(PS), e.g. across a throttling valve or a turbine stage. The temperature is iterated with Newton steps that
+use cp, each iteration solving the density at the current temperature starting from the previous density.
+AGA8Detail.flash_ph() and AGA8Detail.flash_ps() are the scalar forms of the same iteration.
+"""
+
+from modules.batch import (
+    CHUNKSIZE,
+    HERR,
+    CompositionTerms,
+    _take,
+    as_state,
+    check_solver,
+    density_batch,
+    evaluation_plan,
+    properties_batch,
+    x_terms_batch,
+)
+from modules.constants import FLASH_MAXITER, FLASH_MAXSTEP, FLASH_TOL
+
+import numpy as np
+
+T0 = 300.0  # K, starting temperature of points without an estimate
+
+
+def flash_ph_batch(
+    p, h, x, t0=None, d0=None, terms=None, tol=FLASH_TOL, maxiter=FLASH_MAXITER, solver="newton", chunksize=CHUNKSIZE
+):
+    """Find the temperatures at which the gas at pressures p has the molar enthalpies h, for N points.
+
+    Arguments:
+        p: pressures (kPa), broadcast to 1-D arrays of length N with h.
+        h: target enthalpies (J/mol).
+        x: mole fractions of the 21 components, shape (21,) or (N, 21) (a dummy 0 at index 0 is dropped).
+        t0: optional starting temperatures (K), T0 by default.
+        d0: optional starting densities (mol/l), e.g. those of the inlet; the ideal gas estimate by default.
+        terms: CompositionTerms for x (shared or per-row); calculated with x_terms_batch() when None.
+        tol: convergence tolerance of the temperature step, relative to T.
+        maxiter: largest number of temperature iterations.
+        solver: density iteration scheme, "newton" or "halley".
+        chunksize: number of points evaluated together.
+
+    Returns:
+        dict of 1-D arrays: T, every run_batch() output at (p, T), MM, ierr, herr and niter (temperature
+        iterations per point). ierr=1 where a density iteration failed and ierr=2 where the temperature
+        iteration did not converge; T holds the last temperature and every output is NaN at those points.
+    """
+    return _flash_batch(p, h, x, "H", t0, d0, terms, tol, maxiter, solver, chunksize)
+
+
+def flash_ps_batch(
+    p, s, x, t0=None, d0=None, terms=None, tol=FLASH_TOL, maxiter=FLASH_MAXITER, solver="newton", chunksize=CHUNKSIZE
+):
+    """Find the temperatures at which the gas at pressures p has the molar entropies s (J/(mol-K)), for N points.
+
+    As flash_ph_batch(), with Newton steps in log(T).
+    """
+    return _flash_batch(p, s, x, "S", t0, d0, terms, tol, maxiter, solver, chunksize)
+
+
+def _flash_batch(p, target, x, name, t0, d0, terms, tol, maxiter, solver, chunksize):
+    """Run the temperature iteration of flash_ph_batch() (name="H") or flash_ps_batch() (name="S")."""
+    check_solver(solver)
+    p, target, x = as_state(p, target, x)
+    n = p.shape[0]
+    t = np.full(n, T0) if t0 is None else np.array(np.broadcast_to(np.asarray(t0, dtype=float), (n,)))
+    d = np.zeros(n) if d0 is None else np.array(np.broadcast_to(np.asarray(d0, dtype=float), (n,)))
+    if terms is None and x.shape[0] == 1:
+        terms = x_terms_batch(x)
+        terms = CompositionTerms(*(np.asarray(value)[0] for value in terms))
+
+    plan = evaluation_plan()
+    results = {output: np.full(n, np.nan) for output in plan.outputs}
+    results["T"] = t
+    results["MM"] = np.empty(n)
+    results["ierr"] = np.full(n, 2, dtype=np.int8)
+    results["niter"] = np.zeros(n, dtype=np.int16)
+
+    for start in range(0, n, chunksize):
+        rows = slice(start, min(start + chunksize, n))
+        if terms is None:
+            terms_chunk, x_chunk = x_terms_batch(x[rows]), x[rows]
+        else:
+            terms_chunk, x_chunk = _take(terms, x, rows)
+        results["MM"][rows] = terms_chunk.MM
+        _flash_chunk(
+            p[rows], target[rows], x_chunk, terms_chunk, name, d[rows], tol, maxiter, solver, plan, results, start
+        )
+
+    results["herr"] = HERR[results["ierr"]]
+
+    return results
+
+
+def _flash_chunk(p, target, x, terms, name, d, tol, maxiter, solver, plan, results, start):
+    """Iterate the temperatures of one chunk of points and store the outputs of the converged points in results."""
+    t = results["T"][start : start + p.shape[0]]  # view, updated in place
+    ierr = results["ierr"][start : start + p.shape[0]]
+    niter = results["niter"][start : start + p.shape[0]]
+    active = np.arange(p.shape[0])
+    for iteration in range(1, maxiter + 1):
+        if active.size == 0:
+            break
+
+        niter[active] = iteration
+        terms_a, x_a = _take(terms, x, active)
+        density = density_batch(p[active], t[active], terms_a, d0=d[active], solver=solver)
+        failed = density["ierr"] != 0
+        ierr[active[failed]] = 1
+
+        ok = np.flatnonzero(~failed)
+        rows = active[ok]
+        terms_ok, x_ok = _take(terms_a, x_a, ok)
+        props = properties_batch(t[rows], density["D"][ok], x_ok, terms_ok, plan)
+        props["zd"] = density["z"][ok]
+        props["D"] = density["D"][ok]
+        props["P2"] = density["P2"][ok]
+
+        # Newton step in T (enthalpy) or log(T) (entropy), limited to a fraction FLASH_MAXSTEP of T
+        step = (target[rows] - props[name]) / props["cp"]
+        if name == "H":
+            step = step / t[rows]
+        step = np.clip(step, -FLASH_MAXSTEP, FLASH_MAXSTEP)
+        converged = np.abs(step) < tol
+
+        done = rows[converged]
+        ierr[done] = 0
+        for output in plan.outputs:
+            results[output][start + done] = props[output][converged]
+
+        moving = rows[~converged]
+        t[moving] = t[moving] * np.exp(step[~converged]) if name == "S" else t[moving] * (1 + step[~converged])
+        d[moving] = props["D"][~converged]  # start the next density iteration from this density
+        active = moving
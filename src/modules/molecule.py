@@ -23,3 +23,5 @@ MmDetail = {
     "Helium": 4.0026,
     "Argon": 39.948,
 }
+
+COMPONENTS = tuple(MmDetail)  # component names in DETAIL order, index 1..21 of a composition
@@ -0,0 +1,471 @@
+"""numba_engine.py module contains an optional Numba-compiled implementation of the DETAIL method over flat arrays.
+
+The kernels follow the element-by-element calculations of AGA8Detail (x_terms_detail(), alpha_r_detail(),
+alpha_0_detail(), density_detail() and properties_detail()) and are compiled in nopython mode with an
+on-disk cache, so only the first run in an environment pays for the compilation. The points of a batch
+are evaluated in parallel with prange. Without Numba the engine is unavailable (see HAVE_NUMBA) and
+batch.run_batch(..., engine="numba") falls back to the NumPy engine.
+"""
+
+import math
+
+from modules.batch import HERR, OUTPUTS, CompositionTerms, as_state, check_solver, evaluation_plan
+from modules.constants import EPSILON, MAXFLDS, NTERMS, R, TOLR, get_constants
+from modules.molecule import MmDetail
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # Numba is an optional dependency
+    numba = None
+
+HAVE_NUMBA = numba is not None
+
+if HAVE_NUMBA:
+    _jit = numba.njit(cache=True, nogil=True)
+    _jit_parallel = numba.njit(cache=True, nogil=True, parallel=True)
+    prange = numba.prange
+else:
+
+    def _jit(function):
+        """Leave the kernel as plain Python when Numba is not installed."""
+        return function
+
+    _jit_parallel = _jit
+    prange = range
+
+
+def _table(table):
+    """Convert a shared DETAIL table (1-based, dummy at index 0) into a float array."""
+    return np.array(table, dtype=float)
+
+
+_constants = get_constants()
+# mixture-independent tables in the 1-based layout of the C++ code, frozen into the compiled kernels
+AN = _table(_constants.an)
+BN = _table(_constants.bn)
+KN = _table(_constants.kn)
+UN = _table(_constants.un)
+GN = _table(_constants.gn)
+QN = _table(_constants.qn)
+FN = _table(_constants.fn)
+KI25 = _table(_constants.ki25)
+EI25 = _table(_constants.ei25)
+GI = _table(_constants.gi)
+QI = _table(_constants.qi)
+FI = _table(_constants.fi)
+KIJ5 = _table(_constants.kij5)
+UIJ5 = _table(_constants.uij5)
+GIJ5 = _table(_constants.gij5)
+BSNIJ2 = _table(_constants.bsnij2)
+N0I = _table(_constants.n0i)
+TH0I = _table(_constants.th0i)
+MMI = _table([0.0] + list(MmDetail.values()))
+COEFT1 = R * (UN - 1)
+COEFT2 = COEFT1 * UN
+
+# rows of the composition terms returned by x_terms_kernel() and of the outputs of state_kernel()
+MM, K3, U, G, Q, F, Q2 = range(7)
+IZ, IZD, ID, IP2, IP3, IDPDD, IDPDT, ID2PDD2 = (OUTPUTS.index(name) for name in OUTPUTS[:8])
+IA, IU, IH, IS, ICV, ICP, IW, IG, IJT, IKAPPA = (OUTPUTS.index(name) for name in OUTPUTS[8:])
+
+
+@_jit
+def _x_terms(x, scalars, bs, csn):
+    """Calculate the molar mass and composition terms of one gas, x (22,), into scalars (7,), bs (19,) and csn (59,)."""
+    mm = 0.0
+    for i in range(1, MAXFLDS + 1):
+        mm += x[i] * MMI[i]
+
+    k3 = u = g = q = f = 0.0
+    for n in range(19):
+        bs[n] = 0.0
+
+    # Calculate pure fluid contributions
+    for i in range(1, MAXFLDS + 1):
+        if x[i] > 0:
+            xi2 = x[i] * x[i]
+            k3 += x[i] * KI25[i]
+            u += x[i] * EI25[i]
+            g += x[i] * GI[i]
+            q += x[i] * QI[i]
+            f += xi2 * FI[i]
+            for n in range(1, 18 + 1):
+                bs[n] = bs[n] + xi2 * BSNIJ2[i, i, n]
+
+    k3 = k3 * k3
+    u = u * u
+
+    # Binary pair contributions
+    for i in range(1, MAXFLDS + 1):
+        if x[i] > 0:
+            for j in range(i + 1, MAXFLDS + 1):
+                if x[j] > 0:
+                    xij = 2 * x[i] * x[j]
+                    k3 += xij * KIJ5[i, j]
+                    u += xij * UIJ5[i, j]
+                    g += xij * GIJ5[i, j]
+                    for n in range(1, 18 + 1):
+                        bs[n] = bs[n] + xij * BSNIJ2[i, j, n]
+
+    k3 = k3**0.6
+    u = u**0.2
+
+    # Third virial and higher coefficients
+    q2 = q * q
+    for n in range(NTERMS + 1):
+        csn[n] = 0.0
+    for n in range(13, NTERMS + 1):
+        csn[n] = AN[n] * u ** UN[n]
+        if GN[n] == 1:
+            csn[n] = csn[n] * g
+        if QN[n] == 1:
+            csn[n] = csn[n] * q2
+        if FN[n] == 1:
+            csn[n] = csn[n] * f
+
+    scalars[MM] = mm
+    scalars[K3] = k3
+    scalars[U] = u
+    scalars[G] = g
+    scalars[Q] = q
+    scalars[F] = f
+    scalars[Q2] = q2
+
+
+@_jit_parallel
+def x_terms_kernel(x, scalars, bs, csn):
+    """Calculate the composition terms of every row of x (M, 22) into scalars (M, 7), bs (M, 19) and csn (M, 59)."""
+    for k in prange(x.shape[0]):
+        _x_terms(x[k], scalars[k], bs[k], csn[k])
+
+
+@_jit
+def _alpha_r(t, d, k3, bs, csn, tun, itau, ar):
+    """Calculate the derivatives of the residual Helmholtz energy with respect to T and D into ar (4, 4)."""
+    rt = R * t
+
+    # Precalculation of common powers and exponents of density
+    dred = k3 * d
+    dknn = np.empty(9 + 1)
+    dknn[0] = 1.0
+    for n in range(1, 9 + 1):
+        dknn[n] = dred * dknn[n - 1]
+    expn = np.empty(4 + 1)
+    expn[0] = 1.0
+    for n in range(1, 4 + 1):
+        expn[n] = math.exp(-1 * dknn[n])
+
+    ar00 = ar01 = ar02 = ar03 = 0.0
+    ar10 = ar11 = ar12 = ar13 = ar20 = ar21 = 0.0
+
+    # Terms n < 13 only contribute to the virial coefficients
+    for n in range(1, 12 + 1):
+        sumb = bs[n] * d * tun[n]
+        ar00 = ar00 + rt * sumb
+        ar01 = ar01 + rt * sumb
+        if itau > 0:
+            ar10 = ar10 - COEFT1[n] * sumb
+            ar11 = ar11 - COEFT1[n] * sumb
+            ar20 = ar20 + COEFT2[n] * sumb
+            if itau > 1:
+                ar21 = ar21 + COEFT2[n] * sumb
+
+    for n in range(13, NTERMS + 1):
+        bn = int(BN[n])
+        kn = int(KN[n])
+        sum0 = csn[n] * dknn[bn] * tun[n] * expn[kn]
+        bkd = BN[n] - KN[n] * dknn[kn]
+        ckd = KN[n] * KN[n] * dknn[kn]
+        coefd2 = bkd * (bkd - 1) - ckd
+        coefd3 = (bkd - 2) * coefd2 + ckd * ((1 - KN[n]) - 2 * bkd)
+
+        if n > 18:
+            s0 = sum0
+            s1 = sum0 * bkd
+        else:
+            sumb = (bs[n] * d - csn[n] * dred) * tun[n]
+            s0 = sum0 + sumb
+            s1 = sum0 * bkd + sumb
+        s2 = sum0 * coefd2
+        s3 = sum0 * coefd3
+        ar00 = ar00 + rt * s0
+        ar01 = ar01 + rt * s1
+        ar02 = ar02 + rt * s2
+        ar03 = ar03 + rt * s3
+
+        if itau > 0:
+            ar10 = ar10 - COEFT1[n] * s0
+            ar11 = ar11 - COEFT1[n] * s1
+            ar20 = ar20 + COEFT2[n] * s0
+        if itau > 1:
+            ar12 = ar12 - COEFT1[n] * s2
+            ar13 = ar13 - COEFT1[n] * s3
+            ar21 = ar21 + COEFT2[n] * s1
+
+    ar[:] = 0.0
+    ar[0, 0] = ar00
+    ar[0, 1] = ar01
+    ar[0, 2] = ar02
+    ar[0, 3] = ar03
+    ar[1, 0] = ar10
+    ar[1, 1] = ar11
+    ar[1, 2] = ar12
+    ar[1, 3] = ar13
+    ar[2, 0] = ar20
+    ar[2, 1] = ar21
+
+
+@_jit
+def _alpha_0(t, d, x, a0):
+    """Calculate the ideal gas Helmholtz energy and its derivatives with respect to T and D into a0 (3,)."""
+    a00 = a01 = a02 = 0.0
+    if d > EPSILON:
+        logd = math.log(d)
+    else:
+        logd = math.log(EPSILON)
+    logt = math.log(t)
+
+    for i in range(1, MAXFLDS + 1):
+        if x[i] > 0:
+            logxd = logd + math.log(x[i])
+            sumhyp0 = sumhyp1 = sumhyp2 = 0.0
+
+            for j in range(4, 7 + 1):
+                if TH0I[i, j] > 0:
+                    th0t = TH0I[i, j] / t
+                    ep = math.exp(th0t)
+                    em = 1 / ep
+                    hsn = (ep - em) / 2
+                    hcn = (ep + em) / 2
+
+                    if j == 4 or j == 6:
+                        loghyp = math.log(abs(hsn))
+                        sumhyp0 += N0I[i, j] * loghyp
+                        sumhyp1 += N0I[i, j] * (loghyp - th0t * hcn / hsn)
+                        sumhyp2 += N0I[i, j] * (th0t / hsn) ** 2
+                    else:
+                        loghyp = math.log(abs(hcn))
+                        sumhyp0 += (-1) * N0I[i, j] * loghyp
+                        sumhyp1 += (-1) * N0I[i, j] * (loghyp - th0t * hsn / hcn)
+                        sumhyp2 += N0I[i, j] * (th0t / hcn) ** 2
+
+            a00 += x[i] * (logxd + N0I[i, 1] + N0I[i, 2] / t - N0I[i, 3] * logt + sumhyp0)
+            a01 += x[i] * (logxd + N0I[i, 1] - N0I[i, 3] * (1 + logt) + sumhyp1)
+            a02 += (-1) * x[i] * (N0I[i, 3] + sumhyp2)
+
+    a0[0] = a00 * R * t
+    a0[1] = a01 * R
+    a0[2] = a02 * R
+
+
+@_jit
+def _density(p, t, d0, k3, bs, csn, tun, halley, ar):
+    """Calculate density as a function of temperature and pressure with the iteration of AGA8Detail.density_detail().
+
+    Returns:
+        (D, z, P2, ierr, niter); z and P2 are NaN and D is the ideal gas density when ierr = 1.
+    """
+    if abs(p) < EPSILON:
+        return 0.0, np.nan, np.nan, 1, 0
+
+    ideal = p / R / t
+    d = ideal if d0 > -EPSILON else abs(d0)  # a negative d0 is used as the initial estimate
+    plog = math.log(p)
+    vlog = -math.log(d)
+
+    for niter in range(1, 20 + 1):
+        if vlog < -7 or vlog > 100:
+            return ideal, np.nan, np.nan, 1, niter
+
+        d = math.exp(-vlog)  # update the density
+        _alpha_r(t, d, k3, bs, csn, tun, 0, ar)
+        z = 1 + ar[0, 1] / R / t
+        p2 = d * R * t * z
+        dpdd = R * t + 2 * ar[0, 1] + ar[0, 2]
+
+        if dpdd < EPSILON or p2 < EPSILON:
+            vlog += 0.1
+        else:
+            # first order Newton's type step with log(P) as the known variable and log(v) as the unknown
+            dpdlv = -d * dpdd
+            vdiff = (math.log(p2) - plog) * p2 / dpdlv
+            if halley:
+                dfdlv = dpdlv / p2
+                d2pdd2 = (2 * ar[0, 1] + 4 * ar[0, 2] + ar[0, 3]) / d
+                d2fdlv2 = d * d * d2pdd2 / p2 - dfdlv - dfdlv * dfdlv
+                correction = 1 - (math.log(p2) - plog) * d2fdlv2 / (2 * dfdlv * dfdlv)
+                if 0.5 <= correction <= 2:
+                    vdiff = vdiff / correction
+            vlog = vlog - vdiff
+            if abs(vdiff) < TOLR:
+                return math.exp(-vlog), z, p2, 0, niter
+
+    return ideal, np.nan, np.nan, 1, 20
+
+
+@_jit
+def _properties(t, d, x, mm, k3, bs, csn, tun, alpha_0, itau, ar, a0, out):
+    """Calculate the thermodynamic properties at a converged density into the rows of out (len(OUTPUTS),).
+
+    alpha_0 and itau select the stages of the EvaluationPlan, outputs of the skipped stages are not valid.
+    """
+    if alpha_0:
+        _alpha_0(t, d, x, a0)
+    else:
+        a0[:] = np.nan
+    _alpha_r(t, d, k3, bs, csn, tun, itau, ar)
+
+    rt = R * t
+    z = 1 + ar[0, 1] / rt
+    p3 = d * R * t * z
+    dpdd = rt + 2 * ar[0, 1] + ar[0, 2]
+    dpdt = d * R + d * ar[1, 1]
+    a = a0[0] + ar[0, 0]
+    s = (-1) * a0[1] - ar[1, 0]
+    u = a + t * s
+    cv = -(a0[2] + ar[2, 0])
+
+    if d > EPSILON:
+        h = u + p3 / d
+        g = a + p3 / d
+        cp = cv + t * (dpdt / d) ** 2 / dpdd
+        d2pdd2 = (2 * ar[0, 1] + 4 * ar[0, 2] + ar[0, 3]) / d
+        jt = (t / d * dpdt / dpdd - 1) / cp / d
+    else:
+        h = u + rt
+        g = a + rt
+        cp = cv + R
+        d2pdd2 = 0.0
+        jt = 1e20
+
+    w = 1000 * cp / cv * dpdd / mm
+    if w < 0:
+        w = 0.0  # force >= 0
+    w = math.sqrt(w)
+
+    out[IZ] = z
+    out[IP3] = p3
+    out[IDPDD] = dpdd
+    out[IDPDT] = dpdt
+    out[ID2PDD2] = d2pdd2
+    out[IA] = a
+    out[IU] = u
+    out[IH] = h
+    out[IS] = s
+    out[ICV] = cv
+    out[ICP] = cp
+    out[IW] = w
+    out[IG] = g
+    out[IJT] = jt
+    out[IKAPPA] = w**2 * mm / (rt * 1000 * z)
+
+
+@_jit_parallel
+def state_kernel(p, t, d0, rows, x, scalars, bs, csn, halley, properties, alpha_0, itau, out, ierr, niter):
+    """Run the density and properties calculations for N points in parallel.
+
+    Arguments:
+        p, t, d0: pressures (kPa), temperatures (K) and initial density estimates (N,).
+        rows: row of the composition of each point (N,).
+        x, scalars, bs, csn: compositions (M, 22) and their terms from x_terms_kernel().
+        halley: use the third order Halley density iteration.
+        properties, alpha_0, itau: stages of the outputs.EvaluationPlan of the requested outputs.
+        out, ierr, niter: output arrays of shapes (len(OUTPUTS), N), (N,) and (N,).
+    """
+    for k in prange(p.shape[0]):
+        row = rows[k]
+        tun = np.empty(NTERMS + 1)
+        tun[0] = 0.0
+        for n in range(1, NTERMS + 1):
+            tun[n] = t[k] ** ((-1) * UN[n])
+        ar = np.empty((4, 4))
+        a0 = np.empty(3)
+        point = np.empty(out.shape[0])
+        for m in range(out.shape[0]):
+            point[m] = np.nan
+
+        d, z, p2, err, it = _density(
+            p[k], t[k], d0[k], scalars[row, K3], bs[row], csn[row], tun, halley, ar
+        )
+        if err == 0:
+            if properties:
+                _properties(
+                    t[k], d, x[row], scalars[row, MM], scalars[row, K3], bs[row], csn[row], tun,
+                    alpha_0, itau, ar, a0, point,
+                )
+            point[IZD] = z
+            point[IP2] = p2
+        point[ID] = d
+
+        for m in range(out.shape[0]):
+            out[m, k] = point[m]
+        ierr[k] = err
+        niter[k] = it
+
+
+def _terms_arrays(terms):
+    """Convert CompositionTerms (shared or per-row) into the (M, 7), (M, 19) and (M, 59) arrays of the kernels."""
+    columns = [terms.MM, terms.K3, terms.U, terms.G, terms.Q, terms.F, terms.Q2]
+    scalars = np.ascontiguousarray(np.column_stack([np.atleast_1d(np.asarray(c, dtype=float)) for c in columns]))
+    bs = np.ascontiguousarray(np.atleast_2d(np.asarray(terms.bs, dtype=float)))
+    csn = np.ascontiguousarray(np.atleast_2d(np.asarray(terms.csn, dtype=float)))
+
+    return scalars, bs, csn
+
+
+def x_terms_numba(x):
+    """Calculate the composition terms of every row of x, shape (M, 21), with the compiled kernel.
+
+    Returns:
+        CompositionTerms with per-row arrays, laid out as batch.x_terms_batch().
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    x22 = np.zeros((x.shape[0], MAXFLDS + 1))
+    x22[:, 1:] = x
+    scalars = np.empty((x.shape[0], 7))
+    bs = np.empty((x.shape[0], 18 + 1))
+    csn = np.empty((x.shape[0], NTERMS + 1))
+    x_terms_kernel(x22, scalars, bs, csn)
+
+    return CompositionTerms(*scalars.T, bs=bs, csn=csn)
+
+
+def run_batch_numba(p, t, x, terms=None, d0=None, solver="newton", properties=None):
+    """Run the density and properties calculations of the DETAIL method on N (P, T) points with the compiled engine.
+
+    Arguments and results are those of batch.run_batch().
+    """
+    if not HAVE_NUMBA:
+        raise ImportError("The numba engine needs Numba to be installed (pip install numba).")
+
+    check_solver(solver)
+    plan = evaluation_plan(properties)
+    p, t, x = as_state(p, t, x)
+    n = p.shape[0]
+    # the kernel uses a negative d0 as the initial estimate and the ideal gas estimate otherwise
+    d0 = np.zeros(n) if d0 is None else np.broadcast_to(np.asarray(d0, dtype=float), (n,))
+    d0 = np.where(d0 > 0, -d0, 1e10)
+    if terms is None:
+        terms = x_terms_numba(x)
+    scalars, bs, csn = _terms_arrays(terms)
+
+    x22 = np.zeros((x.shape[0], MAXFLDS + 1))
+    x22[:, 1:] = x
+    out = np.empty((len(OUTPUTS), n))
+    ierr = np.ones(n, dtype=np.int8)
+    niter = np.zeros(n, dtype=np.int16)
+    rows = np.arange(n) if scalars.shape[0] > 1 else np.zeros(n, dtype=np.int64)
+    state_kernel(
+        p, t, d0, rows, x22, scalars, bs, csn, solver == "halley",
+        plan.properties, plan.alpha_0, plan.itau, out, ierr, niter,
+    )
+
+    results = {name: out[OUTPUTS.index(name)] for name in plan.outputs}
+    results["MM"] = np.broadcast_to(scalars[:, MM], (n,)).copy()
+    results["ierr"] = ierr
+    results["herr"] = HERR[ierr]
+    results["niter"] = niter
+
+    return results
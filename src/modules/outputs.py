@@ -0,0 +1,71 @@
+"""outputs.py module contains the names of the DETAIL outputs, the stages they need and the composition terms record.
+
+It depends on the standard library only, so the scalar AGA8Detail path can use it without importing NumPy.
+"""
+
+from collections import namedtuple
+
+# Terms that depend only on the gas composition (see AGA8Detail.x_terms_detail()).
+CompositionTerms = namedtuple(
+    "CompositionTerms", ["MM", "K3", "U", "G", "Q", "F", "Q2", "bs", "csn"]
+)
+
+FAILED_TO_CONVERGE = "Calculation failed to converge in DETAIL method, ideal gas density returned."
+FLASH_FAILED = "Temperature iteration of the PH or PS flash failed to converge."
+
+# names of the per-point outputs returned by run_batch(), matching the AGA8Detail attributes
+OUTPUTS = (
+    "z",
+    "zd",
+    "D",
+    "P2",
+    "P3",
+    "dpdd",
+    "dpdt",
+    "d2pdd2",
+    "A",
+    "U",
+    "H",
+    "S",
+    "cv",
+    "cp",
+    "W",
+    "G",
+    "JT",
+    "kappa",
+)
+# outputs of the density iteration, every other output needs the properties pass
+DENSITY_OUTPUTS = ("zd", "D", "P2")
+# outputs that need the temperature derivatives of ar
+TEMPERATURE_OUTPUTS = ("dpdt", "U", "H", "S", "cv", "cp", "W", "JT", "kappa")
+# outputs that need the ideal gas Helmholtz energy (alpha_0)
+IDEAL_GAS_OUTPUTS = ("A", "U", "H", "S", "cv", "cp", "W", "G", "JT", "kappa")
+
+# Stages of the DETAIL method needed for a selection of outputs (see evaluation_plan()).
+EvaluationPlan = namedtuple("EvaluationPlan", ["outputs", "properties", "alpha_0", "itau"])
+
+
+def evaluation_plan(properties=None):
+    """Return the EvaluationPlan of the stages needed to calculate a selection of outputs.
+
+    Arguments:
+        properties: names of the requested outputs (e.g. {"z", "D"} or {"W", "kappa"}), every output if None.
+
+    Returns:
+        EvaluationPlan with the requested outputs in OUTPUTS order, whether the properties pass is needed,
+        whether alpha_0 is needed and the itau of alpha_r (2 when every output is requested, as run()).
+    """
+    if properties is None:
+        return EvaluationPlan(OUTPUTS, True, True, 2)
+
+    selected = {properties} if isinstance(properties, str) else set(properties)
+    unknown = sorted(selected - set(OUTPUTS))
+    if unknown:
+        raise ValueError(f"Unknown properties {unknown}, expected a subset of {list(OUTPUTS)}.")
+
+    return EvaluationPlan(
+        outputs=tuple(name for name in OUTPUTS if name in selected),
+        properties=not selected <= set(DENSITY_OUTPUTS),
+        alpha_0=not selected.isdisjoint(IDEAL_GAS_OUTPUTS),
+        itau=0 if selected.isdisjoint(TEMPERATURE_OUTPUTS) else 1,
+    )
@@ -0,0 +1,140 @@
+"""parallel.py module contains the multi-process evaluation of large batches of DETAIL state points."""
+
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from modules.AGA8Detail import AGA8Detail
+from modules.batch import HERR, as_state, check_solver, evaluation_plan, run_batch
+from modules.constants import get_constants
+
+import numpy as np
+
+MIN_CHUNKSIZE = 1024  # smallest automatic chunk, below it the inter-process overhead dominates
+CHUNKS_PER_WORKER = 4  # automatic chunks per worker, so that uneven chunks still balance
+
+# per-process state of a pool worker, set once by _initialise_worker()
+_worker = {}
+
+
+def _initialise_worker(x=None, terms=None):
+    """Build the DETAIL constants of a worker process and keep the composition shared by every chunk.
+
+    Arguments:
+        x, terms: mole fractions (1, 21) and CompositionTerms of a composition shared by every point,
+            or None when the chunks carry their own compositions.
+    """
+    get_constants()
+    _worker.update(x=x, terms=terms)
+
+
+def _compute_chunk(chunk):
+    """Run one (p, t, x, terms, solver, engine, properties) chunk in a worker process (x is None for the shared composition)."""
+    p, t, x, terms, solver, engine, properties = chunk
+    if x is None:
+        x, terms = _worker["x"], _worker["terms"]
+
+    results = run_batch(p, t, x, terms, solver=solver, engine=engine, properties=properties)
+    del results["herr"]  # rebuilt from ierr by the parent process
+
+    return results
+
+
+def make_pool(workers=None, x=None, terms=None):
+    """Return a ProcessPoolExecutor of initialised workers that can be reused by several compute_parallel() calls.
+
+    Arguments:
+        workers: number of worker processes, os.cpu_count() by default.
+        x, terms: optional composition (1, 21) and CompositionTerms kept by every worker, see _initialise_worker().
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count() or 1,
+        # forking a process that has started threads (e.g. the Numba engine's thread pool) can deadlock
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_initialise_worker,
+        initargs=(x, terms),
+    )
+
+
+def auto_chunksize(n, workers):
+    """Return the number of points per task so that each worker receives about CHUNKS_PER_WORKER tasks."""
+    return max(MIN_CHUNKSIZE, math.ceil(n / (workers * CHUNKS_PER_WORKER)))
+
+
+def compute_parallel(
+    P, T, X, workers=None, chunksize=None, solver="newton", engine="numpy", pool=None, properties=None
+):
+    """Run the DETAIL method on N (P, T) points spread over a pool of worker processes.
+
+    The points are split into chunks that are evaluated with batch.run_batch() in the workers. Each worker
+    is started with the "spawn" method and builds the DETAIL constants once, and a composition shared by
+    every point is sent to it once rather than with every chunk. A batch that fits in a single chunk is
+    evaluated in this process.
+
+    Arguments:
+        P, T: pressures (kPa) and temperatures (K), broadcast to 1-D arrays of length N.
+        X: gas composition shared by every point as a 22-element list (dummy 0 at index 0), or
+            one composition per point as an (N, 21) matrix (or (N, 22) with the dummy column).
+        workers: number of worker processes, os.cpu_count() by default.
+        chunksize: number of points per task, chosen with auto_chunksize() by default.
+        solver: density iteration scheme, "newton" or "halley".
+        engine: batch engine of the workers, "numpy" or "numba".
+        pool: optional executor from make_pool() to reuse across calls instead of starting a new one
+            (a shared composition is then sent with every chunk).
+        properties: names of the outputs to calculate (see batch.evaluation_plan()), every output if None.
+
+    Returns:
+        dict of 1-D arrays in input order, as batch.run_batch(): the requested outputs plus MM, ierr, herr and niter.
+    """
+    check_solver(solver)
+    plan = evaluation_plan(properties)
+    p, t, x = as_state(P, T, X)
+    n = p.shape[0]
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or auto_chunksize(n, workers)
+    bounds = [(start, min(start + chunksize, n)) for start in range(0, n, chunksize)]
+    workers = min(workers, len(bounds))
+
+    terms = None
+    if x.shape[0] == 1:
+        # the shared composition terms are calculated once, exactly as AGA8Detail.run() does
+        gas = [0.0] + x[0].tolist()
+        terms = AGA8Detail(p=None, t=None, x=gas).composition_detail().composition_terms()
+
+    if workers <= 1:
+        return run_batch(p, t, x, terms, solver=solver, engine=engine, properties=properties)
+
+    if terms is None:
+        chunks = (
+            (p[start:stop], t[start:stop], x[start:stop], None, solver, engine, properties)
+            for start, stop in bounds
+        )
+    elif pool is None:
+        chunks = (
+            (p[start:stop], t[start:stop], None, None, solver, engine, properties) for start, stop in bounds
+        )
+    else:
+        chunks = ((p[start:stop], t[start:stop], x, terms, solver, engine, properties) for start, stop in bounds)
+
+    results = {name: np.empty(n) for name in plan.outputs}
+    results["MM"] = np.empty(n)
+    results["ierr"] = np.empty(n, dtype=np.int8)
+    results["niter"] = np.empty(n, dtype=np.int16)
+
+    executor = pool
+    if pool is None:
+        shared = (x, terms) if terms is not None else (None, None)
+        executor = make_pool(workers, *shared)
+    try:
+        # map() returns the chunks in submission order, so the results are stored in input order
+        for (start, stop), chunk in zip(bounds, executor.map(_compute_chunk, chunks)):
+            for name, values in chunk.items():
+                results[name][start:stop] = values
+    finally:
+        if pool is None:
+            executor.shutdown()
+
+    results["herr"] = HERR[results["ierr"]]
+
+    return results
@@ -0,0 +1,76 @@
+"""result.py module contains the compact result records of the DETAIL method."""
+
+from collections import namedtuple
+
+from modules.outputs import OUTPUTS
+
+# fields of a DetailResult: the state, the outputs, the convergence information and an optional timestamp
+FIELDS = ("P", "T") + OUTPUTS + ("MM", "ierr", "herr", "niter", "timestamp")
+
+
+class DetailResult(namedtuple("DetailResult", FIELDS, defaults=(None,) * len(FIELDS))):
+    """Immutable result of the DETAIL method at one state point.
+
+    A slotted tuple of Python scalars without references to the calculator or its intermediate arrays, so it is
+    small to keep in memory and cheap to pickle. Fields are read as attributes (result.z) or by name (result["z"]).
+    Outputs that were not calculated (failed density iteration or not in the properties selection) are None.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        """Return a field by name, or by position as a tuple does."""
+        if isinstance(key, str):
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+
+        return super().__getitem__(key)
+
+    @classmethod
+    def from_detail(cls, calc):
+        """Copy the planned outputs of an AGA8Detail calculation.
+
+        When the density iteration failed only D (the ideal gas density) is kept.
+        """
+        values = dict.fromkeys(calc.plan.outputs)
+        if calc.ierr == 0:
+            values = {name: getattr(calc, name) for name in values}
+        elif "D" in values:
+            values["D"] = calc.D
+
+        return cls(P=calc.P, T=calc.T, MM=calc.MM, ierr=calc.ierr, herr=calc.herr, niter=calc.niter, **values)
+
+    @classmethod
+    def from_batch(cls, results, i, p=None, t=None):
+        """Return the i-th point of run_batch() results (NaN marks the outputs of failed points).
+
+        Also accepts the results of the flash and sensitivity batches: a T column (flash) replaces t and
+        columns that are not fields (e.g. dzdx) are left out.
+        """
+        values = {"P": p, "T": t}
+        for name, column in results.items():
+            if name not in cls._fields:
+                continue
+            value = column[i]
+            values[name] = value.item() if hasattr(value, "item") else value  # NumPy scalars to Python scalars
+
+        return cls(**values)
+
+
+def to_structured(results):
+    """Pack run_batch() results into a NumPy structured array with one record per point.
+
+    herr is left out as it follows from ierr (batch.HERR[ierr]).
+
+    Returns:
+        1-D structured array with a field per result column (float64 outputs and MM, int8 ierr, int16 niter).
+    """
+    import numpy as np  # imported on first use, so that importing the scalar path does not load NumPy
+
+    names = [name for name in results if name != "herr"]
+    array = np.empty(len(results["ierr"]), dtype=[(name, np.asarray(results[name]).dtype) for name in names])
+    for name in names:
+        array[name] = results[name]
+
+    return array
@@ -0,0 +1,254 @@
+"""sensitivity.py module contains the analytic derivatives of the DETAIL outputs with respect to composition, P and T.
+
+At fixed P and T the composition only enters Z and D through the residual Helmholtz energy, so
+d(D)/d(xi) = -D * d(ar[0][1])/d(xi) / d(P)/d(D) and d(Z)/d(xi) = -Z / D * d(D)/d(xi). The derivative of
+ar[0][1] at fixed T and D follows from the derivatives of the composition terms of x_terms_batch() (K3, U,
+G, Q2, F, bs and csn), which are quadratic forms (or powers of them) in x. All 21 derivatives cost about
+as much as one extra evaluation of the properties.
+
+The derivatives with respect to P and T (jacobian_batch()) follow from d(P)/d(D), d(P)/d(T), cp and JT,
+which properties_batch() already calculates.
+"""
+
+from modules.batch import (
+    AN,
+    BN,
+    BNF,
+    BSNIJ2,
+    CHUNKSIZE,
+    EI25,
+    FI,
+    FN13,
+    GI,
+    GIJ5,
+    GN13,
+    KI25,
+    KIJ5,
+    KN,
+    KNF,
+    QI,
+    QN13,
+    UIJ5,
+    UN13,
+    as_state,
+    run_batch,
+    tun_batch,
+    x_terms_batch,
+)
+from modules.constants import R
+
+import numpy as np
+
+# outputs with analytic derivatives with respect to P and T, and the outputs these derivatives use
+JACOBIAN_PROPERTIES = ("z", "D", "H", "S")
+JACOBIAN_INPUTS = {"z": ("dpdd", "dpdt"), "D": ("dpdd", "dpdt"), "H": ("cp", "JT"), "S": ("cp", "dpdd", "dpdt")}
+
+
+def x_terms_gradient(x):
+    """Calculate the derivatives of the composition terms of x_terms_batch() with respect to each mole fraction.
+
+    Arguments:
+        x: mole fractions of the 21 components, shape (N, 21).
+
+    Returns:
+        K3, U, G, Q2, F: derivatives of shape (N, 21), element [n, i] being d(term)/d(xi) of row n.
+        bs: shape (N, 21, 19) and csn: shape (N, 21, 59), with the same layout as the terms.
+    """
+    x = np.where(x > 0, x, 0)
+    terms = x_terms_batch(x)
+
+    # K and U are squares of pure fluid sums plus binary pair sums, raised to the powers 0.6 and 0.2
+    sk = x @ KI25
+    se = x @ EI25
+    k3 = sk**2 + np.einsum("ni,ij,nj->n", x, KIJ5, x)
+    u = se**2 + np.einsum("ni,ij,nj->n", x, UIJ5, x)
+    dk3 = 0.6 * (terms.K3 / k3)[:, None] * (2 * sk[:, None] * KI25 + 2 * x @ KIJ5)
+    du = 0.2 * (terms.U / u)[:, None] * (2 * se[:, None] * EI25 + 2 * x @ UIJ5)
+    dg = GI + 2 * x @ GIJ5
+    dq2 = 2 * terms.Q[:, None] * QI
+    df = 2 * x * FI
+
+    # Second virial coefficients of mixture
+    dbs = np.zeros((x.shape[0], x.shape[1], 18 + 1))
+    dbs[:, :, 1:] = 2 * np.tensordot(x, BSNIJ2, axes=(1, 0))
+
+    # csn[n] = an * U^un * G^gn * Q2^qn * F^fn, differentiated by the product rule
+    factors = np.stack(
+        (
+            terms.U[:, None] ** UN13,
+            np.where(GN13, terms.G[:, None], 1),
+            np.where(QN13, terms.Q2[:, None], 1),
+            np.where(FN13, terms.F[:, None], 1),
+        )
+    )  # (4, N, 46)
+    derivatives = (
+        UN13 * terms.U[:, None, None] ** (UN13 - 1) * du[:, :, None],
+        np.where(GN13, dg[:, :, None], 0),
+        np.where(QN13, dq2[:, :, None], 0),
+        np.where(FN13, df[:, :, None], 0),
+    )  # each (N, 21, 46)
+    dcsn = np.zeros((x.shape[0], x.shape[1], 58 + 1))
+    for k, derivative in enumerate(derivatives):
+        others = np.prod(np.delete(factors, k, axis=0), axis=0)
+        dcsn[:, :, 13:] += AN * others[:, None, :] * derivative
+
+    return terms, {"K3": dk3, "U": du, "G": dg, "Q2": dq2, "F": df, "bs": dbs, "csn": dcsn}
+
+
+def composition_gradient(t, d, x, normalise=False):
+    """Calculate d(Z)/d(xi) and d(D)/d(xi) at fixed P and T for N converged states.
+
+    Arguments:
+        t: temperatures (N,) in K.
+        d: converged molar densities (N,) in mol/l.
+        x: mole fractions of the 21 components, shape (21,) or (N, 21).
+        normalise: if True, differentiate the composition renormalised to a sum of 1 (a change of xi is balanced
+            by the other components in proportion to their mole fractions), otherwise each xi independently.
+            The renormalised derivatives are those of a composition that already sums to 1.
+
+    Returns:
+        dzdx, dDdx: arrays of shape (N, 21).
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    n = t.shape[0]
+    terms, gradient = x_terms_gradient(x)
+    k3 = np.broadcast_to(terms.K3, (n,))
+    bs = np.broadcast_to(terms.bs, (n, 18 + 1))
+    csn = np.broadcast_to(terms.csn, (n, 58 + 1))
+    dk3 = np.broadcast_to(gradient["K3"], (n, 21))
+    dbs = np.broadcast_to(gradient["bs"], (n, 21, 18 + 1))
+    dcsn = np.broadcast_to(gradient["csn"], (n, 21, 58 + 1))
+
+    rt = R * t
+    tun = tun_batch(t)
+    dred = k3 * d
+    dknn = np.empty((n, 9 + 1))
+    dknn[:, 0] = 1
+    for k in range(1, 9 + 1):
+        dknn[:, k] = dred * dknn[:, k - 1]
+    expn = np.exp(-dknn[:, :5])
+    expn[:, 0] = 1
+
+    # ar[0][1] / RT = sum_n (bs[n] * D - csn[n] * dred) * tun[n] (n <= 18) + sum_n csn[n] * phi_n (n >= 13)
+    # with phi_n = tun[n] * dred^bn * exp(-dred^kn) * (bn - kn * dred^kn) and dred = K3 * D
+    dknk = dknn[:, KN]
+    bkd = BNF - KNF * dknk
+    ckd = KNF * KNF * dknk
+    g = dknn[:, BN] * tun[:, 12:] * expn[:, KN]  # (N, 46)
+    phi = g * bkd
+    dphi = g * (bkd * bkd - ckd)  # dred * d(phi_n)/d(dred)
+
+    virial = np.einsum("nik,nk->ni", dbs[:, :, 1:], tun[:, :18]) * d[:, None]
+    virial -= (
+        np.einsum("nik,nk->ni", dcsn[:, :, 13:19], tun[:, 12:18]) * k3[:, None]
+        + dk3 * np.einsum("nk,nk->n", csn[:, 13:19], tun[:, 12:18])[:, None]
+    ) * d[:, None]
+    exponential = np.einsum("nik,nk->ni", dcsn[:, :, 13:], phi)
+    exponential += dk3 / k3[:, None] * np.einsum("nk,nk->n", csn[:, 13:], dphi)[:, None]
+    dar01 = rt[:, None] * (virial + exponential)
+
+    # d(P)/d(D) and Z at the converged density
+    sumb = (bs[:, 1:] * d[:, None] - np.pad(csn[:, 13:19] * dred[:, None], ((0, 0), (12, 0)))) * tun[:, :18]
+    ar01 = rt * (sumb.sum(axis=1) + (csn[:, 13:] * phi).sum(axis=1))
+    ar02 = rt * (csn[:, 13:] * g * (bkd * (bkd - 1) - ckd)).sum(axis=1)
+    dpdd = rt + 2 * ar01 + ar02
+    z = 1 + ar01 / rt
+
+    dddx = -d[:, None] * dar01 / dpdd[:, None]
+    dzdx = -(z / d)[:, None] * dddx
+    if normalise:
+        w = np.broadcast_to(x / x.sum(axis=1, keepdims=True), (n, 21))
+        dddx = dddx - np.einsum("ni,ni->n", w, dddx)[:, None]
+        dzdx = dzdx - np.einsum("ni,ni->n", w, dzdx)[:, None]
+
+    return dzdx, dddx
+
+
+def composition_gradient_batch(p, t, x, normalise=False, solver="newton", chunksize=CHUNKSIZE):
+    """Calculate Z, D and their derivatives with respect to each mole fraction at N (P, T) points.
+
+    Arguments:
+        p, t: pressures (kPa) and temperatures (K), broadcast to 1-D arrays of length N.
+        x: mole fractions of the 21 components, shape (21,) or (N, 21) (a dummy 0 at index 0 is dropped).
+        normalise: differentiate the renormalised composition (see composition_gradient()).
+        solver: density iteration scheme, "newton" or "halley".
+        chunksize: number of points evaluated together.
+
+    Returns:
+        dict of arrays: z, D, MM, ierr, herr, niter as from run_batch(), plus dzdx and dDdx of shape (N, 21)
+        (NaN where the density iteration failed).
+    """
+    p, t, x = as_state(p, t, x)
+    results = run_batch(p, t, x, chunksize=chunksize, solver=solver, properties=("z", "D"))
+    n = p.shape[0]
+    results["dzdx"] = np.full((n, 21), np.nan)
+    results["dDdx"] = np.full((n, 21), np.nan)
+
+    for start in range(0, n, chunksize):
+        rows = start + np.flatnonzero(results["ierr"][start : start + chunksize] == 0)
+        if rows.size:
+            x_rows = x if x.shape[0] == 1 else x[rows]
+            gradient = composition_gradient(t[rows], results["D"][rows], x_rows, normalise=normalise)
+            results["dzdx"][rows], results["dDdx"][rows] = gradient
+
+    return results
+
+
+def jacobian_batch(
+    p, t, x, properties=("z", "D"), terms=None, solver="newton", engine="numpy", chunksize=CHUNKSIZE
+):
+    """Calculate properties and their derivatives with respect to P and T at N (P, T) points.
+
+    Arguments:
+        p, t: pressures (kPa) and temperatures (K), broadcast to 1-D arrays of length N.
+        x: mole fractions of the 21 components, shape (21,) or (N, 21) (a dummy 0 at index 0 is dropped).
+        properties: outputs to differentiate, any of JACOBIAN_PROPERTIES.
+        terms: CompositionTerms for x (shared or per-row); calculated with x_terms_batch() when None.
+        solver: density iteration scheme, "newton" or "halley".
+        engine: "numpy" or "numba", see run_batch().
+        chunksize: number of points evaluated together.
+
+    Returns:
+        dict of 1-D arrays: the properties, d{name}dP at constant T (per kPa) and d{name}dT at constant P (per K)
+        for each of them, plus MM, ierr, herr and niter (NaN where the density iteration failed).
+
+    Raises:
+        ValueError: if a property has no analytic derivatives.
+    """
+    unknown = set(properties) - set(JACOBIAN_PROPERTIES)
+    if unknown:
+        raise ValueError(
+            f"No derivatives with respect to P and T for {sorted(unknown)}, expected a subset of {JACOBIAN_PROPERTIES}."
+        )
+
+    # D is always needed for the derivatives, z only for its own
+    needed = {"D"}.union(properties, *(JACOBIAN_INPUTS[name] for name in properties))
+    results = run_batch(p, t, x, terms, chunksize=chunksize, solver=solver, engine=engine, properties=needed)
+    t = np.broadcast_to(np.asarray(t, dtype=float).ravel(), results["ierr"].shape)
+    d = results["D"]
+    derivatives = {}
+    if set(properties) - {"H"}:
+        # density at constant T and at constant P, from P(D, T)
+        dpdd = results["dpdd"]
+        dpdt = results["dpdt"]
+        dddp = 1 / dpdd
+        dddt = -dpdt / dpdd
+        derivatives["D"] = (dddp, dddt)
+    if "z" in properties:
+        # z(D, T) = P / (D R T), differentiated at constant T and at constant D, then chained through D(P, T)
+        z = results["z"]
+        dzdd = (dpdd - R * t * z) / (d * R * t)
+        dzdt = (dpdt - d * R * z) / (d * R * t)
+        derivatives["z"] = (dzdd * dddp, dzdt + dzdd * dddt)
+    if "H" in properties:
+        derivatives["H"] = (-results["cp"] * results["JT"], results["cp"])
+    if "S" in properties:
+        derivatives["S"] = (-dpdt / (d * d * dpdd), results["cp"] / t)
+
+    output = {name: results[name] for name in properties}
+    for name in properties:
+        output[f"d{name}dP"], output[f"d{name}dT"] = derivatives[name]
+    for name in ("MM", "ierr", "herr", "niter"):
+        output[name] = results[name]
+
+    return output
@@ -0,0 +1,221 @@
+"""service.py module contains an asyncio front end that micro-batches concurrent DETAIL requests."""
+
+import asyncio
+import json
+import math
+
+from modules.AGA8Detail import AGA8Detail
+from modules.batch import check_solver, evaluation_plan
+from modules.cache import composition_key
+from modules.result import DetailResult
+
+import numpy as np
+
+
+def _run_group(p, t, x, solver, engine, properties):
+    """Evaluate the points of one composition with AGA8Detail.run_batch() (runs in the executor)."""
+    return AGA8Detail.run_batch(p, t, x, solver=solver, engine=engine, properties=properties)
+
+
+class DetailService:
+    """Awaitable AGA8 DETAIL calculator that collects concurrent requests into vectorised batches.
+
+    Requests arriving within window seconds of the first queued request are grouped by composition and
+    each group is evaluated as one AGA8Detail.run_batch() call in an executor, so the event loop is never
+    blocked by a calculation. Use it as an async context manager, or call start() and stop().
+
+    Example:
+        async with DetailService() as service:
+            result = await service.compute(5000, 300, x)
+    """
+
+    def __init__(
+        self, window=0.002, max_batch=4096, executor=None, solver="newton", engine="numpy", properties=None
+    ):
+        """Initialisation.
+
+        Arguments:
+            window: time (s) to wait for further requests after the first request of a batch.
+            max_batch: number of queued requests that closes a batch before the window has passed.
+            executor: concurrent.futures executor running the batches, the loop's default executor if None.
+            solver, engine: density iteration scheme and batch engine passed on to run_batch().
+            properties: names of the outputs to calculate (e.g. {"z", "D"}), every output if None.
+        """
+        check_solver(solver)
+        evaluation_plan(properties)  # raise for unknown names now rather than in the first batch
+        self.window = window
+        self.max_batch = max_batch
+        self.executor = executor
+        self.solver = solver
+        self.engine = engine
+        self.properties = properties
+
+        self.requests = 0
+        self.batched = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self._queue = None
+        self._collector = None
+        self._running = set()
+
+    async def __aenter__(self):
+        """Start the service."""
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        """Stop the service once the queued requests have been answered."""
+        await self.stop()
+
+    async def start(self):
+        """Start collecting requests on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._collector = asyncio.create_task(self._collect())
+
+        return self
+
+    async def stop(self):
+        """Answer the queued requests and stop the service."""
+        await self._queue.join()
+        self._collector.cancel()
+        await asyncio.gather(self._collector, return_exceptions=True)
+        await asyncio.gather(*self._running)
+
+    async def compute(self, p, t, x):
+        """Queue one (P, T, x) request and return its result once its batch has been evaluated.
+
+        Arguments:
+            p: pressure (kPa).
+            t: temperature (K).
+            x: gas composition as a 22-element list (dummy 0 at index 0).
+
+        Returns:
+            DetailResult of the run_batch() outputs of the point (plus MM, ierr, herr and niter).
+
+        Raises:
+            ValueError, TypeError: if p, t or x are not numbers, before the request is queued.
+        """
+        # checked here, as an exception in the collector would stop it answering every later request
+        key = composition_key(x)
+        p, t = float(p), float(t)
+        future = asyncio.get_running_loop().create_future()
+        self.requests += 1
+        self._queue.put_nowait((p, t, x, key, future))
+
+        return await future
+
+    def metrics(self):
+        """Return the queue depth and batch size counters as a dict."""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "requests": self.requests,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_size,
+            "mean_batch_size": self.batched / self.batches if self.batches else 0.0,
+        }
+
+    async def _collect(self):
+        """Collect the requests of each window into a batch and dispatch it."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batches += 1
+            self.batched += len(batch)
+            self.last_batch_size = len(batch)
+            self.max_batch_size = max(self.max_batch_size, len(batch))
+
+            groups = {}
+            for request in batch:
+                groups.setdefault(request[3], []).append(request)
+            for group in groups.values():
+                task = asyncio.create_task(self._dispatch(group))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+    async def _dispatch(self, group):
+        """Evaluate the requests of one composition in the executor and resolve their futures."""
+        p = np.array([request[0] for request in group], dtype=float)
+        t = np.array([request[1] for request in group], dtype=float)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, _run_group, p, t, list(group[0][2]), self.solver, self.engine, self.properties
+            )
+        except Exception as error:  # a bad request must not take the service down
+            for *_, future in group:
+                if not future.done():
+                    future.set_exception(error)
+        else:
+            for i, (*_, future) in enumerate(group):
+                if not future.done():
+                    future.set_result(DetailResult.from_batch(results, i, p[i].item(), t[i].item()))
+        finally:
+            for _ in group:
+                self._queue.task_done()
+
+
+def _json_value(value):
+    """Replace the NaN of failed points by None, which JSON can represent."""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+
+    return value
+
+
+async def _handle_http(service, reader, writer):
+    """Answer one HTTP/1.1 request: POST /compute with {"P", "T", "x"} (or a list of them), or GET /metrics."""
+    try:
+        method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+        length = 0
+        while (line := (await reader.readline()).strip()) != b"":
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        body = await reader.readexactly(length) if length else b""
+
+        if method == "GET" and path == "/metrics":
+            status, payload = "200 OK", service.metrics()
+        elif method == "POST" and path == "/compute":
+            request = json.loads(body)
+            points = request if isinstance(request, list) else [request]
+            results = await asyncio.gather(*(service.compute(r["P"], r["T"], r["x"]) for r in points))
+            results = [{name: _json_value(value) for name, value in r._asdict().items()} for r in results]
+            status, payload = "200 OK", results if isinstance(request, list) else results[0]
+        else:
+            status, payload = "404 Not Found", {"error": f"No route for {method} {path}."}
+    except (ValueError, KeyError, TypeError) as error:
+        status, payload = "400 Bad Request", {"error": str(error)}
+    except Exception as error:  # always answer, rather than leave the connection open
+        status, payload = "500 Internal Server Error", {"error": f"{type(error).__name__}: {error}"}
+
+    data = json.dumps(payload).encode()
+    writer.write(
+        f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+        "Connection: close\r\n\r\n".encode()
+        + data
+    )
+    await writer.drain()
+    writer.close()
+
+
+async def serve_http(service, host="127.0.0.1", port=8080):
+    """Start a local HTTP/JSON endpoint for a started DetailService and return the asyncio.Server.
+
+    Routes:
+        POST /compute: body {"P": kPa, "T": K, "x": [22 mole fractions]} or a list of them; returns the
+            result(s) as JSON with null in place of NaN.
+        GET /metrics: returns DetailService.metrics().
+    """
+    return await asyncio.start_server(
+        lambda reader, writer: _handle_http(service, reader, writer), host, port
+    )
@@ -0,0 +1,90 @@
+"""session.py module contains a reusable DETAIL calculator that only re-runs the stages invalidated by a change of input."""
+
+from modules.AGA8Detail import AGA8Detail
+from modules.cache import composition_key
+from modules.result import DetailResult
+
+
+class DetailSession:
+    """Reusable AGA8 DETAIL calculator for a stream of P, T (and occasionally x) updates.
+
+    The pipeline stages are re-executed only when their inputs change:
+        - update_composition(x) invalidates the molar mass, composition terms and temperature terms.
+        - update(t=...) invalidates the temperature terms (tun, ideal gas sums), density and properties.
+        - update(p=...) invalidates only the density and properties.
+    """
+
+    def __init__(
+        self, p, t, x, cache=None, isotherm_cache=None, warm_start=False, solver="newton", properties=None
+    ):
+        """Initialisation.
+
+        Arguments:
+            p: pressure (kPa).
+            t: temperature (K).
+            x: gas composition as a 22-element list (dummy 0 at index 0).
+            cache, isotherm_cache: optional LRUCache instances passed on to AGA8Detail.
+            warm_start: if True, start each density iteration from the last converged density
+                instead of the ideal gas estimate (the result then agrees with a cold start to within TOLR).
+            solver: density iteration scheme, "newton" or "halley" (see AGA8Detail.density_detail()).
+            properties: names of the outputs to calculate (e.g. {"z", "D"}), every output if None.
+        """
+        self.calc = AGA8Detail(
+            p=p, t=t, x=x, cache=cache, isotherm_cache=isotherm_cache, solver=solver, properties=properties
+        ).setup_detail()
+        self.warm_start = warm_start
+        self.composition_dirty = True
+        self.state_dirty = True
+        self._result = None
+        self._density = None  # last converged density, the warm start estimate
+
+    def update(self, p=None, t=None, x=None):
+        """Set a new pressure (kPa), temperature (K) and/or gas composition and return the result at the new state.
+
+        A composition x only invalidates the composition terms if its mole fractions differ from the current ones.
+        """
+        if x is not None and x is not self.calc.x and composition_key(x) != composition_key(self.calc.x):
+            self._set_composition(x)
+        if p is not None and p != self.calc.P:
+            self.calc.P = p
+            self.state_dirty = True
+        if t is not None and t != self.calc.T:
+            self.calc.T = t  # tun is recalculated as T differs from told
+            self.state_dirty = True
+
+        return self.result()
+
+    def update_composition(self, x):
+        """Set a new gas composition and return the result at the current P and T."""
+        self._set_composition(x)
+
+        return self.result()
+
+    def _set_composition(self, x):
+        """Set a new gas composition and invalidate every stage."""
+        self.calc.x = x
+        self.composition_dirty = True
+        self.state_dirty = True
+
+    def result(self):
+        """Run the invalidated stages (if any) and return the outputs as an immutable DetailResult.
+
+        When the density iteration fails, D is the ideal gas density, ierr=1 and the other properties are None.
+        """
+        calc = self.calc
+        if self.composition_dirty:
+            calc.composition_detail()
+            self.composition_dirty = False
+
+        if self.state_dirty:
+            if self.warm_start and self._result is not None and self._result.ierr == 0:
+                calc.D = -self._density  # a negative D is used as the initial density estimate
+            else:
+                calc.D = 1e10  # start the density iteration from the ideal gas estimate
+            calc.density_detail()
+            self._density = calc.D
+            calc.properties_detail()
+            self._result = DetailResult.from_detail(calc)
+            self.state_dirty = False
+
+        return self._result
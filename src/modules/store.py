@@ -0,0 +1,172 @@
+"""store.py module contains a memory-mapped binary file format for precomputed grids of DETAIL results.
+
+Layout of a store file:
+    - MAGIC (8 bytes) and the length of the header (little-endian uint64).
+    - A UTF-8 JSON header: format version, engine version, composition and its hash, solver, the grid
+      axes P (kPa) and T (K) and, per column, its name, dtype, shape and byte offset.
+    - The column arrays, C-ordered with shape (len(P), len(T)), each starting at an ALIGNMENT boundary.
+
+ResultStore maps the columns read-only with np.memmap, so processes opening the same file share its
+pages through the operating system instead of each holding a copy.
+"""
+
+import json
+import os
+import struct
+
+from modules.AGA8Detail import AGA8Detail
+from modules.batch import OUTPUTS
+from modules.cache import composition_hash
+from modules.constants import VERSION
+
+import numpy as np
+
+MAGIC = b"AGA8GRID"
+FORMAT_VERSION = 1
+ALIGNMENT = 64  # byte alignment of the column arrays
+DEFAULT_COLUMNS = ("z", "D", "W")
+COLUMNS = OUTPUTS + ("MM", "ierr", "niter")  # run_batch() results that can be stored
+
+
+def _align(offset):
+    """Round offset up to the next ALIGNMENT boundary."""
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_grid(path, P, T, x, columns=DEFAULT_COLUMNS, solver="newton", engine="numpy"):
+    """Evaluate the DETAIL method on the (P, T) grid of one composition and write the results to a store file.
+
+    The grid is evaluated one pressure row at a time straight into a memory-mapped temporary file next to path,
+    which replaces path once every row has been written, so a failed write leaves no partial store behind.
+
+    Arguments:
+        path: file to create (overwritten if it exists).
+        P, T: 1-D grid axes, pressures (kPa) and temperatures (K).
+        x: gas composition as a 22-element list (dummy 0 at index 0).
+        columns: names of the run_batch() results to store, any of COLUMNS (e.g. z, D, W, H, S, cp, kappa, ierr).
+        solver, engine: density iteration scheme and batch engine passed on to run_batch().
+
+    Returns:
+        ResultStore opened on the new file.
+
+    Raises:
+        ValueError: if a column is not one of COLUMNS (checked before the file is created).
+    """
+    unknown = sorted(set(columns) - set(COLUMNS))
+    if unknown:
+        raise ValueError(f"Unknown column(s) {unknown}, expected a subset of {COLUMNS}.")
+
+    P = np.asarray(P, dtype=float).ravel()
+    T = np.asarray(T, dtype=float).ravel()
+    shape = (P.size, T.size)
+    header = {
+        "format_version": FORMAT_VERSION,
+        "engine_version": VERSION,
+        "engine": engine,
+        "solver": solver,
+        "composition": [float(xi) for xi in x],
+        "composition_hash": composition_hash(x),
+        "axes": {"P": P.tolist(), "T": T.tolist()},
+        "columns": [],
+    }
+    dtypes = {name: "<i1" if name == "ierr" else "<f8" for name in columns}
+
+    # the column offsets follow the header, whose length depends on the offsets: repeat until they agree
+    start = 0
+    while True:
+        offset = start
+        header["columns"] = []
+        for name in columns:
+            header["columns"].append({"name": name, "dtype": dtypes[name], "shape": shape, "offset": offset})
+            offset = _align(offset + np.dtype(dtypes[name]).itemsize * P.size * T.size)
+        encoded = json.dumps(header).encode()
+        if _align(len(MAGIC) + 8 + len(encoded)) <= start:
+            break
+        start = _align(len(MAGIC) + 8 + len(encoded))
+    encoded = encoded.ljust(start - len(MAGIC) - 8)  # pad the header with spaces up to the first column
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as file:
+            file.write(MAGIC + struct.pack("<Q", len(encoded)) + encoded)
+            file.truncate(offset)
+
+        arrays = {
+            column["name"]: np.memmap(
+                temporary, dtype=column["dtype"], mode="r+", offset=column["offset"], shape=shape
+            )
+            for column in header["columns"]
+        }
+        properties = [name for name in columns if name in OUTPUTS]  # only the stages these need are run
+        for i, p in enumerate(P):
+            results = AGA8Detail.run_batch(
+                np.full(T.size, p), T, x, solver=solver, engine=engine, properties=properties
+            )
+            for name, array in arrays.items():
+                array[i] = results[name]
+        for array in arrays.values():
+            array.flush()
+        del arrays
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+    return ResultStore(path)
+
+
+class ResultStore:
+    """Read-only, memory-mapped view of a store file written by write_grid()."""
+
+    def __init__(self, path):
+        """Initialisation.
+
+        Arguments:
+            path: store file to open.
+
+        Raises:
+            ValueError: if the file is not a store, is truncated or has a damaged header, or was written by another
+                store format or engine version (whose results may differ from this engine's).
+        """
+        with open(path, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an AGA8 DETAIL result store.")
+            try:
+                (length,) = struct.unpack("<Q", file.read(8))
+                self.header = json.loads(file.read(length))
+                found = (self.header["format_version"], self.header["engine_version"])
+            except (struct.error, KeyError, TypeError, UnicodeDecodeError, json.JSONDecodeError) as error:
+                raise ValueError(f"{path} has a damaged header ({error!r}).") from error
+
+        if found != (FORMAT_VERSION, VERSION):
+            raise ValueError(
+                f"{path} has (store format, engine version) {found}, expected {(FORMAT_VERSION, VERSION)}; "
+                "write the grid again."
+            )
+
+        self.path = path
+        self.P = np.array(self.header["axes"]["P"])
+        self.T = np.array(self.header["axes"]["T"])
+        self.composition = self.header["composition"]
+        self.composition_hash = self.header["composition_hash"]
+        self.engine_version = self.header["engine_version"]
+        self._columns = {
+            column["name"]: np.memmap(
+                path, dtype=column["dtype"], mode="r", offset=column["offset"], shape=tuple(column["shape"])
+            )
+            for column in self.header["columns"]
+        }
+
+    @property
+    def columns(self):
+        """Return the names of the stored columns."""
+        return list(self._columns)
+
+    def __getitem__(self, name):
+        """Return the read-only (len(P), len(T)) memory-mapped array of a column."""
+        return self._columns[name]
+
+    def matches(self, x):
+        """Return True if the store was computed for the gas composition x."""
+        return composition_hash(x) == self.composition_hash
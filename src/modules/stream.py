@@ -0,0 +1,47 @@
+"""stream.py module contains a lazy processor for time series of AGA8 DETAIL states."""
+
+from modules.session import DetailSession
+
+
+def stream(records, x=None, warm_start=True, cache=None, isotherm_cache=None, solver="newton", properties=None):
+    """Evaluate a stream of (timestamp, P, T) or (timestamp, P, T, x) records and yield one result per record.
+
+    The records are consumed one at a time, so memory use does not grow with the length of the stream.
+    With warm_start each density iteration starts from the previous converged density, which needs far
+    fewer iterations than the ideal gas estimate on slowly varying (e.g. SCADA) data.
+
+    Arguments:
+        records: iterable of (timestamp, p, t) or (timestamp, p, t, x) tuples with p in kPa, t in K and
+            x a 22-element composition (dummy 0 at index 0).
+        x: composition of the records without their own composition.
+        warm_start: start each density iteration from the previous converged density.
+        cache, isotherm_cache: optional LRUCache instances passed on to AGA8Detail.
+        solver: density iteration scheme, "newton" or "halley" (see AGA8Detail.density_detail()).
+        properties: names of the outputs to calculate (e.g. {"z", "D"}), every output if None.
+
+    Yields:
+        DetailResult of the DetailSession outputs (including niter) with the record's timestamp.
+    """
+    session = None
+    for record in records:
+        timestamp, p, t = record[:3]
+        xi = record[3] if len(record) > 3 else x
+        if xi is None:
+            raise ValueError(f"No gas composition given for the record at {timestamp}.")
+
+        if session is None:
+            session = DetailSession(
+                p=p,
+                t=t,
+                x=xi,
+                cache=cache,
+                isotherm_cache=isotherm_cache,
+                warm_start=warm_start,
+                solver=solver,
+                properties=properties,
+            )
+            result = session.result()
+        else:
+            result = session.update(p=p, t=t, x=xi)
+
+        yield result._replace(timestamp=timestamp)
@@ -0,0 +1,283 @@
+"""table.py module contains the table mode: fast interpolated DETAIL properties of a fixed gas composition.
+
+A PropertyTable holds exact AGA8Detail results on a rectilinear (P, T) grid that is refined adaptively
+until piecewise bicubic (4 x 4 point Lagrange) interpolation meets a tolerance at the midpoints between
+the nodes. The finished table is verified against the exact engine at the cell centres and at random
+validation points, and the largest error found is kept in PropertyTable.max_error.
+
+Queries locate their cell with a binary search per axis and evaluate the cell's bicubic polynomial from
+16 precomputed coefficients, which costs a small fraction of an exact evaluation.
+"""
+
+from modules.AGA8Detail import AGA8Detail
+
+import numpy as np
+
+TABLE_PROPERTIES = ("z", "D", "H", "S", "cp", "W", "kappa")
+INITIAL_NODES = 9  # nodes per axis of the starting grid
+FLOOR = 0.01  # errors are relative to max(|value|, FLOOR * largest |value| of the property on the table)
+SAFETY = 0.25  # refinement targets SAFETY * tol, as the midpoint errors underestimate the largest error
+
+
+def _stencil(axis, q):
+    """Return the first node (N,) of the 4-point stencil around each q and the cubic Lagrange weights (N, 4)."""
+    first = np.clip(np.searchsorted(axis, q, side="right") - 2, 0, axis.size - 4)
+    nodes = axis[first[:, None] + np.arange(4)]
+    weights = np.ones((q.size, 4))
+    for a in range(4):
+        for b in range(4):
+            if a != b:
+                weights[:, a] *= (q - nodes[:, b]) / (nodes[:, a] - nodes[:, b])
+
+    return first, weights
+
+
+def interpolate(P, T, values, p, t):
+    """Interpolate tabulated values (M, len(P), len(T)) at the points (p, t) with piecewise bicubic Lagrange polynomials.
+
+    Each point uses the 4 x 4 nodes around the cell that contains it (shifted inwards at the edges).
+
+    Returns:
+        array (M, N) of the interpolated values.
+    """
+    i, wp = _stencil(P, p)
+    j, wt = _stencil(T, t)
+    offsets = np.arange(4)
+    corners = values[:, i[:, None, None] + offsets[:, None], j[:, None, None] + offsets[None, :]]
+
+    return np.einsum("na,mnab,nb->mn", wp, corners, wt)
+
+
+def _cells(P, T, p, t):
+    """Return the flat index of the grid cell containing each point (p, t) and the local coordinates u, v in [0, 1]."""
+    i = np.clip(np.searchsorted(P, p, side="right") - 1, 0, P.size - 2)
+    j = np.clip(np.searchsorted(T, t, side="right") - 1, 0, T.size - 2)
+    u = (p - P[i]) / (P[i + 1] - P[i])
+    v = (t - T[j]) / (T[j + 1] - T[j])
+
+    return i * (T.size - 1) + j, u, v
+
+
+def _power_basis(u, v):
+    """Return the bicubic monomials u^a * v^b, a, b = 0..3, of each point, shape (N, 16)."""
+    pu = np.stack((np.ones_like(u), u, u * u, u * u * u), axis=1)
+    pv = np.stack((np.ones_like(v), v, v * v, v * v * v), axis=1)
+
+    return (pu[:, :, None] * pv[:, None, :]).reshape(u.size, 16)
+
+
+def coefficients(P, T, values):
+    """Convert the piecewise bicubic interpolant of values (M, len(P), len(T)) to power-basis coefficients per cell.
+
+    The interpolant is sampled at 4 x 4 points inside every cell and the local bicubic polynomial is recovered
+    by inverting the Vandermonde matrix, so a query only needs its cell's 16 coefficients.
+
+    Returns:
+        array (M, (len(P) - 1) * (len(T) - 1), 16) of the coefficients of u^a * v^b.
+    """
+    samples = (np.arange(4) + 0.5) / 4
+    inverse = np.linalg.inv(np.vander(samples, 4, increasing=True))
+    p = P[:-1, None, None, None] + np.diff(P)[:, None, None, None] * samples[:, None]
+    t = T[None, :-1, None, None] + np.diff(T)[None, :, None, None] * samples[None, :]
+    p, t = np.broadcast_arrays(p, t)  # (cells along P, cells along T, 4, 4)
+    sampled = interpolate(P, T, values, p.ravel(), t.ravel()).reshape(values.shape[0], -1, 4, 4)
+
+    return np.einsum("ak,mckl,bl->mcab", inverse, sampled, inverse).reshape(values.shape[0], -1, 16)
+
+
+def evaluate(P, T, coefficient_table, p, t):
+    """Evaluate the per-cell bicubic polynomials of coefficients() at the points (p, t).
+
+    Returns:
+        array (M, N) of the interpolated values, NaN for points outside the table.
+    """
+    cell, u, v = _cells(P, T, p, t)
+    basis = _power_basis(u, v)
+    result = np.array([np.einsum("nk,nk->n", np.take(table, cell, axis=0), basis) for table in coefficient_table])
+    outside = (p < P[0]) | (p > P[-1]) | (t < T[0]) | (t > T[-1])
+    result[:, outside] = np.nan
+
+    return result
+
+
+class PropertyTable:
+    """Interpolation table of DETAIL properties over a (P, T) domain for one gas composition.
+
+    Build it with PropertyTable.build() and call it with arrays of pressures and temperatures.
+    """
+
+    def __init__(self, x, P, T, properties, values, max_error):
+        """Initialisation.
+
+        Arguments:
+            x: gas composition as a 22-element list (dummy 0 at index 0).
+            P, T: grid axes, pressures (kPa) and temperatures (K).
+            properties: names of the tabulated properties.
+            values: exact results on the grid, shape (len(properties), len(P), len(T)).
+            max_error: largest interpolation error found at the validation points, per property.
+        """
+        self.x = x
+        self.P = P
+        self.T = T
+        self.properties = tuple(properties)
+        self.values = values
+        self.coefficients = coefficients(P, T, values)
+        self.max_error = max_error
+
+    @classmethod
+    def build(
+        cls,
+        x,
+        p_range,
+        t_range,
+        properties=TABLE_PROPERTIES,
+        tol=1e-6,
+        max_nodes=513,
+        validation_points=2000,
+        solver="newton",
+        seed=0,
+    ):
+        """Tabulate properties of composition x on an adaptively refined (P, T) grid.
+
+        An interval of an axis is halved wherever interpolating at its midpoint (at every node of the other
+        axis) misses the exact result by more than SAFETY * tol, until no interval needs refining or an axis has
+        max_nodes nodes. Each pass only evaluates points it has not seen: the new nodes were midpoints of the pass
+        that inserted them, and the midpoints of unchanged intervals keep their results from the previous pass.
+        The table is then verified at the cell centres and at validation_points random points.
+
+        Arguments:
+            x: gas composition as a 22-element list (dummy 0 at index 0).
+            p_range, t_range: (min, max) of the pressures (kPa) and temperatures (K).
+            properties: run_batch() outputs to tabulate.
+            tol: largest allowed relative interpolation error (see FLOOR).
+            max_nodes: largest number of nodes per axis.
+            validation_points: number of random points checked against the exact engine.
+            solver: density iteration scheme of the exact evaluations.
+            seed: seed of the random validation points.
+
+        Raises:
+            ValueError: if the DETAIL method fails to converge inside the domain or the verified error exceeds tol.
+        """
+        properties = tuple(properties)
+        P = np.linspace(*p_range, INITIAL_NODES)
+        T = np.linspace(*t_range, INITIAL_NODES)
+
+        def exact(p, t):
+            """Evaluate the properties exactly at the points (p, t), shape (len(properties), N)."""
+            results = AGA8Detail.run_batch(p, t, x, solver=solver, properties=properties)
+            if results["ierr"].any():
+                failed = np.flatnonzero(results["ierr"])[0]
+                raise ValueError(
+                    f"DETAIL method failed to converge at P={p[failed]} kPa, T={t[failed]} K inside the table domain."
+                )
+            return np.array([results[name] for name in properties])
+
+        def grid(P, T):
+            """Evaluate the properties exactly on the grid P x T, shape (len(properties), len(P), len(T))."""
+            p, t = np.meshgrid(P, T, indexing="ij")
+            return exact(p.ravel(), t.ravel()).reshape(len(properties), P.size, T.size)
+
+        def errors(table, scale, p, t, desired=None):
+            """Return the exact values (unless given) and the relative interpolation errors at (p, t), each (M, N)."""
+            desired = exact(p, t) if desired is None else desired
+            actual = evaluate(P, T, table, p, t)
+            return desired, np.abs(actual - desired) / np.maximum(np.abs(desired), scale)
+
+        def midpoints(p, t, previous, current):
+            """Evaluate the properties at the midpoints (p, t), reusing those of the previous pass, shape (M, N).
+
+            previous and current map (p, t) to the values at the midpoints of the previous and of this pass.
+            """
+            keys = list(zip(p.tolist(), t.tolist()))
+            known = np.array([key in previous for key in keys], dtype=bool)
+            desired = np.empty((len(properties), len(keys)))
+            if known.any():
+                desired[:, known] = np.array([previous[key] for key, hit in zip(keys, known) if hit]).T
+            if not known.all():
+                desired[:, ~known] = exact(p[~known], t[~known])
+            current.update(zip(keys, desired.T))
+            return desired
+
+        values = grid(P, T)
+        previous = {}
+        while True:
+            scale = FLOOR * np.abs(values).max(axis=(1, 2))[:, None]
+            table = coefficients(P, T, values)
+
+            # midpoints of the P intervals at every T node, and of the T intervals at every P node; those of
+            # the intervals and nodes kept from the previous pass were evaluated then
+            current = {}
+            pm = (P[:-1] + P[1:]) / 2
+            tm = (T[:-1] + T[1:]) / 2
+            p, t = np.meshgrid(pm, T, indexing="ij")
+            at_pm = midpoints(p.ravel(), t.ravel(), previous, current)
+            found = errors(table, scale, p.ravel(), t.ravel(), at_pm)[1]
+            at_pm = at_pm.reshape(len(properties), *p.shape)
+            refine_p = found.max(axis=0).reshape(p.shape).max(axis=1) > SAFETY * tol
+            p, t = np.meshgrid(P, tm, indexing="ij")
+            at_tm = midpoints(p.ravel(), t.ravel(), previous, current)
+            found = errors(table, scale, p.ravel(), t.ravel(), at_tm)[1]
+            at_tm = at_tm.reshape(len(properties), *p.shape)
+            refine_t = found.max(axis=0).reshape(p.shape).max(axis=0) > SAFETY * tol
+            previous = current
+            if P.size + refine_p.sum() > max_nodes:
+                refine_p[:] = False
+            if T.size + refine_t.sum() > max_nodes:
+                refine_t[:] = False
+            if not (refine_p.any() or refine_t.any()):
+                break
+
+            # the new nodes at the old nodes of the other axis were evaluated as midpoints above, so only
+            # the crossings of new P and new T nodes are new evaluations
+            new_p, new_t = pm[refine_p], tm[refine_t]
+            if new_p.size and new_t.size:
+                crossings = grid(new_p, new_t)
+            else:
+                crossings = np.empty((len(properties), new_p.size, new_t.size))
+            values = np.concatenate(
+                (
+                    np.concatenate((values, at_tm[:, :, refine_t]), axis=2),
+                    np.concatenate((at_pm[:, refine_p, :], crossings), axis=2),
+                ),
+                axis=1,
+            )
+            P = np.concatenate((P, new_p))
+            T = np.concatenate((T, new_t))
+            order_p = np.argsort(P)
+            order_t = np.argsort(T)
+            P, T = P[order_p], T[order_t]
+            values = values[:, order_p][:, :, order_t]
+
+        # verify at the cell centres and at random points
+        rng = np.random.default_rng(seed)
+        p, t = np.meshgrid((P[:-1] + P[1:]) / 2, (T[:-1] + T[1:]) / 2, indexing="ij")
+        p = np.concatenate((p.ravel(), rng.uniform(*p_range, validation_points)))
+        t = np.concatenate((t.ravel(), rng.uniform(*t_range, validation_points)))
+        found = errors(table, scale, p, t)[1].max(axis=1)
+        max_error = dict(zip(properties, found.tolist()))
+        if found.max() > tol:
+            raise ValueError(
+                f"Table error {found.max():.3g} exceeds tol={tol} with {P.size} x {T.size} nodes, "
+                "increase max_nodes or tol, or narrow the domain."
+            )
+
+        return cls(x, P, T, properties, values, max_error)
+
+    def __call__(self, p, t, properties=None):
+        """Interpolate properties at the points (p, t).
+
+        Arguments:
+            p, t: pressures (kPa) and temperatures (K), broadcast to 1-D arrays.
+            properties: names of the properties to return, all tabulated properties by default.
+
+        Returns:
+            dict of 1-D arrays keyed by property name, NaN for points outside the table.
+        """
+        p, t = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(p, dtype=float)).ravel(), np.atleast_1d(np.asarray(t, dtype=float)).ravel()
+        )
+        names = self.properties if properties is None else tuple(properties)
+        rows = [self.properties.index(name) for name in names]
+        result = evaluate(self.P, self.T, self.coefficients[rows], p, t)
+
+        return dict(zip(names, result))
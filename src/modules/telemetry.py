@@ -0,0 +1,194 @@
+"""telemetry.py module contains the opt-in stage timers and convergence counters of the DETAIL pipeline."""
+
+import functools
+import threading
+import time
+
+from modules.constants import EPSILON
+
+import numpy as np
+
+MAXITER = 20  # iterations of the density iteration before it gives up
+# causes of a failed density iteration
+FAILURES = ("zero_pressure", "out_of_range", "max_iterations")
+
+
+class Telemetry:
+    """Collect stage timings, density iteration counts, failures and cache hit rates.
+
+    Pass one instance as telemetry= to AGA8Detail(...), AGA8Detail.run_batch(...) or batch.run_batch(...).
+    Nothing is measured without it, so a calculation without telemetry runs the plain code path. The
+    counters are thread-safe and are exported with as_dict() or prometheus().
+    """
+
+    def __init__(self):
+        """Initialisation."""
+        self._lock = threading.Lock()
+        self._caches = {}
+        self.reset()
+
+    def reset(self):
+        """Set every counter back to zero (watched caches keep their own counters)."""
+        with self._lock:
+            self.stages = {}  # stage -> [calls, seconds, max seconds]
+            self.iterations = [0] * (MAXITER + 1)  # number of points per density iteration count
+            self.creep = 0  # density steps of vlog += 0.1 taken where d(P)/d(D) or P was not positive
+            self.failures = dict.fromkeys(FAILURES, 0)
+
+    def watch(self, name, cache):
+        """Report the hit rate of an LRUCache under name."""
+        self._caches[name] = cache
+
+    def record_stage(self, stage, seconds):
+        """Add one timed call of a stage."""
+        with self._lock:
+            timer = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def record_density(self, niter, failure=None, creep=0):
+        """Add the outcome of one scalar density iteration (failure is one of FAILURES or None)."""
+        with self._lock:
+            self.iterations[niter] += 1
+            self.creep += creep
+            if failure is not None:
+                self.failures[failure] += 1
+
+    def record_density_batch(self, p, niter, ierr, creep=0):
+        """Add the outcome of the density iteration of a batch of points."""
+        failed = ierr != 0
+        zero = failed & (np.abs(p) < EPSILON)
+        exhausted = failed & ~zero & (niter >= MAXITER)
+        counts = np.bincount(niter, minlength=MAXITER + 1)
+        with self._lock:
+            for i, count in enumerate(counts.tolist()):
+                self.iterations[i] += count
+            self.creep += int(creep)
+            self.failures["zero_pressure"] += int(np.count_nonzero(zero))
+            self.failures["max_iterations"] += int(np.count_nonzero(exhausted))
+            self.failures["out_of_range"] += int(np.count_nonzero(failed)) - int(np.count_nonzero(zero | exhausted))
+
+    def timed(self, stage, function):
+        """Wrap function so that each call is recorded as a call of stage."""
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record_stage(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    def instrument(self, calc):
+        """Time the stages of an AGA8Detail calculator and record its density iterations.
+
+        The stage methods are replaced on the instance only, so other calculators are not affected.
+        """
+        calc.setup_detail = self.timed("setup", calc.setup_detail)
+        calc.x_terms_detail = self.timed("x_terms", calc.x_terms_detail)
+        calc.properties_detail = self.timed("properties", calc.properties_detail)
+        density_detail = self.timed("density", calc.density_detail)
+
+        @functools.wraps(density_detail)
+        def density():
+            density_detail()
+            self.record_density(calc.niter, calc.failure, calc.ncreep)
+            return calc
+
+        calc.density_detail = density
+        if calc.cache is not None:
+            self.watch("composition", calc.cache)
+        if calc.isotherm_cache is not None:
+            self.watch("isotherm", calc.isotherm_cache)
+
+        return calc
+
+    def as_dict(self):
+        """Return every counter as a dict."""
+        with self._lock:
+            points = sum(self.iterations)
+            stages = {
+                stage: {
+                    "calls": calls,
+                    "seconds": seconds,
+                    "mean_seconds": seconds / calls,
+                    "max_seconds": longest,
+                }
+                for stage, (calls, seconds, longest) in self.stages.items()
+            }
+            density = {
+                "points": points,
+                "iterations": {niter: count for niter, count in enumerate(self.iterations) if count},
+                "mean_iterations": sum(i * c for i, c in enumerate(self.iterations)) / points if points else 0.0,
+                "creep": self.creep,
+                "failures": dict(self.failures),
+            }
+
+        caches = {}
+        for name, cache in self._caches.items():
+            stats = cache.stats()
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            caches[name] = stats
+
+        return {"stages": stages, "density": density, "caches": caches}
+
+    def prometheus(self, prefix="aga8_detail"):
+        """Return the counters in the Prometheus text exposition format."""
+        metrics = self.as_dict()
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Wall time spent in each pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        lines += [
+            f'{prefix}_stage_seconds_total{{stage="{stage}"}} {timer["seconds"]!r}'
+            for stage, timer in metrics["stages"].items()
+        ]
+        lines += [
+            f"# HELP {prefix}_stage_calls_total Calls of each pipeline stage.",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        lines += [
+            f'{prefix}_stage_calls_total{{stage="{stage}"}} {timer["calls"]}'
+            for stage, timer in metrics["stages"].items()
+        ]
+
+        density = metrics["density"]
+        lines += [
+            f"# HELP {prefix}_density_iterations Iterations of the density iteration per point.",
+            f"# TYPE {prefix}_density_iterations histogram",
+        ]
+        counts = [density["iterations"].get(niter, 0) for niter in range(MAXITER + 1)]
+        for niter in range(1, MAXITER + 1):
+            lines.append(f'{prefix}_density_iterations_bucket{{le="{niter}"}} {sum(counts[: niter + 1])}')
+        total = sum(niter * count for niter, count in enumerate(counts))
+        lines += [
+            f'{prefix}_density_iterations_bucket{{le="+Inf"}} {density["points"]}',
+            f"{prefix}_density_iterations_sum {total}",
+            f"{prefix}_density_iterations_count {density['points']}",
+            f"# HELP {prefix}_density_creep_total Density steps of vlog += 0.1 taken without a usable Newton step.",
+            f"# TYPE {prefix}_density_creep_total counter",
+            f"{prefix}_density_creep_total {density['creep']}",
+            f"# HELP {prefix}_density_failures_total Failed density iterations by cause.",
+            f"# TYPE {prefix}_density_failures_total counter",
+        ]
+        lines += [
+            f'{prefix}_density_failures_total{{cause="{cause}"}} {count}'
+            for cause, count in density["failures"].items()
+        ]
+
+        for counter in ("hits", "misses"):
+            if metrics["caches"]:
+                lines += [
+                    f"# HELP {prefix}_cache_{counter}_total Cache {counter}.",
+                    f"# TYPE {prefix}_cache_{counter}_total counter",
+                ]
+            lines += [
+                f'{prefix}_cache_{counter}_total{{cache="{name}"}} {stats[counter]}'
+                for name, stats in metrics["caches"].items()
+            ]
+
+        return "\n".join(lines) + "\n"
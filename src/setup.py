@@ -1,15 +1,24 @@
 """setup.py module details the repository's custom package(s)."""
 
+import re
+
 from setuptools import find_packages, setup
 
 with open("requirements.txt") as requirement_file:
     requirements = requirement_file.read().split()
 
+# the version is kept in one place, modules/constants.py, which records it in the constants file and stored grids
+with open("modules/constants.py") as constants_file:
+    version = re.search(r'^VERSION = "([^"]+)"', constants_file.read(), re.M).group(1)
+
 setup(
     name="AGA8-Detail",
     description="A package to approximate the compressibility factor, z of a gas using P, T and gas composition, x.",
-    version="1.0.0",
+    version=version,
     author="Dan Seal",
     install_requires=requirements,
+    extras_require={"numba": ["numba"]},
     packages=find_packages(),
+    package_data={"modules": ["data/*.bin"]},  # precompiled DETAIL constants, see modules.constants
+    entry_points={"console_scripts": ["aga8-detail = modules.cli:main"]},
 )
@@ -1,6 +1,7 @@
 """Test AGA8 Detail implementation."""
 
 from modules.AGA8Detail import AGA8Detail
+from modules.batch import x_terms_packed
 
 import pytest
 
@@ -307,3 +308,119 @@ def test_aga8detail_z_approximation_example_5():
     desired = 0.8482020334710543
 
     assert actual == desired
+
+
+def test_x_terms_detail_matches_nested_loop_reference():
+    """Test the packed x_terms_detail() kernel is identical to the element-by-element pure fluid and binary pair sums."""
+    x = [0.0, 0.8, 0.0, 0.05, 0.09, 0.03, 0.0, 0.01, 0.0, 0.0, 0.0, 0.0, 0.0]
+    x += [0.0, 0.0, 0.005, 0.0, 0.0, 0.004, 0.006, 0.0, 0.005]
+
+    AGA8 = AGA8Detail(p=5000, t=300, x=x).x_terms_detail()
+
+    # reference: the original triple loop over i, j > i and n
+    K3 = U = G = Q = F = 0
+    bs = [0] * (18 + 1)
+    for i in range(1, 21 + 1):
+        if x[i] > 0:
+            xi2 = x[i] ** 2
+            K3 += x[i] * AGA8.ki25[i]
+            U += x[i] * AGA8.ei25[i]
+            G += x[i] * AGA8.gi[i]
+            Q += x[i] * AGA8.qi[i]
+            F += xi2 * AGA8.fi[i]
+            for n in range(1, 18 + 1):
+                bs[n] = bs[n] + xi2 * AGA8.bsnij2[i][i][n]
+    K3 = K3**2
+    U = U**2
+    for i in range(1, 21 + 1):
+        for j in range(i + 1, 21 + 1):
+            if x[i] > 0 and x[j] > 0:
+                xij = 2 * x[i] * x[j]
+                K3 += xij * AGA8.kij5[i][j]
+                U += xij * AGA8.uij5[i][j]
+                G += xij * AGA8.gij5[i][j]
+                for n in range(1, 18 + 1):
+                    bs[n] = bs[n] + xij * AGA8.bsnij2[i][j][n]
+
+    assert (AGA8.K3, AGA8.U, AGA8.G, AGA8.Q, AGA8.F) == (K3**0.6, U**0.2, G, Q, F)
+    assert AGA8.bs == bs
+
+    # the pure Python kernel (used until modules.batch is loaded) and the NumPy kernel give identical sums
+    for gas in (x, [0.0] + [1 / 21] * 21, [0.0, 1.0] + [0.0] * 20):
+        assert AGA8._x_terms_sums(gas) == x_terms_packed(gas)
+
+
+def test_pressure_detail_matches_full_alpha_r_detail():
+    """Test the density-only residual Helmholtz derivatives used by pressure_detail() equal those of alpha_r_detail()."""
+    x = [0.0, 0.8, 0.0, 0.05, 0.09, 0.03, 0.0, 0.01, 0.0, 0.0, 0.0, 0.0, 0.0]
+    x += [0.0, 0.0, 0.005, 0.0, 0.0, 0.004, 0.006, 0.0, 0.005]
+
+    AGA8 = AGA8Detail(p=20000, t=310, x=x).molar_mass_detail().x_terms_detail()
+    AGA8.D = 8.5
+
+    AGA8.pressure_detail()
+    actual = (AGA8.z, AGA8.dpddsave)
+
+    AGA8.alpha_r_detail(itau=0)
+    desired = (
+        1 + AGA8.ar[0][1] / AGA8.R / AGA8.T,
+        AGA8.R * AGA8.T + 2 * AGA8.ar[0][1] + AGA8.ar[0][2],
+    )
+
+    assert actual == desired
+
+
+def test_halley_density_solver_agrees_with_newton_in_fewer_iterations():
+    """Test the third order density iteration converges to the Newton result without needing more iterations."""
+    x = [0.0, 0.77824, 0.02, 0.06, 0.08, 0.03, 0.0015, 0.003, 0.0005, 0.00165, 0.00215, 0.00088]
+    x += [0.00024, 0.00015, 0.00009, 0.004, 0.005, 0.002, 0.0001, 0.0025, 0.007, 0.001]
+    total = {"newton": 0, "halley": 0}
+
+    for p, t in [(5000, 250), (20000, 250), (30000, 300), (50000, 300), (100000, 400)]:
+        newton = AGA8Detail(p=p, t=t, x=x).run()
+        halley = AGA8Detail(p=p, t=t, x=x, solver="halley").run()
+
+        assert halley.ierr == 0
+        assert halley.z == pytest.approx(newton.z, rel=1e-12)
+        assert halley.niter <= newton.niter
+        total["newton"] += newton.niter
+        total["halley"] += halley.niter
+
+    assert total["halley"] < total["newton"]
+
+    with pytest.raises(ValueError):
+        AGA8Detail(p=5000, t=300, x=x, solver="secant")
+
+
+def test_properties_selection_skips_unused_stages(monkeypatch):
+    """Test a property selection runs only the stages it needs and gives the same values as a full run."""
+    x = [0.0, 0.77824, 0.02, 0.06, 0.08, 0.03, 0.0015, 0.003, 0.0005, 0.00165, 0.00215, 0.00088]
+    x += [0.00024, 0.00015, 0.00009, 0.004, 0.005, 0.002, 0.0001, 0.0025, 0.007, 0.001]
+    desired = AGA8Detail(p=50000, t=400, x=x).run()
+
+    actual = AGA8Detail(p=50000, t=400, x=x, properties={"z", "D"}).run()
+    assert (actual.z, actual.D) == (desired.z, desired.D)
+    assert not hasattr(actual, "a0")  # the ideal gas part was skipped
+    assert actual.ar[1] == [0, 0, 0, 0]  # and so were the temperature derivatives
+    assert actual.H == 0
+
+    actual = AGA8Detail(p=50000, t=400, x=x, properties={"W", "kappa"}).run()
+    assert (actual.W, actual.kappa) == (desired.W, desired.kappa)
+    assert actual.ar[1][2] == 0  # the unused derivatives are skipped
+
+    actual = AGA8Detail(p=50000, t=400, x=x, properties={"D"}).run()
+    assert actual.D == desired.D
+    assert actual.ar is None  # no properties pass
+
+    # the ideal gas hyperbolic sums are only calculated for plans with the ideal gas part
+    calls = []
+    hyperbolic_sums = AGA8Detail._hyperbolic_sums
+    monkeypatch.setattr(AGA8Detail, "_hyperbolic_sums", lambda calc: calls.append(1) or hyperbolic_sums(calc))
+    for properties in ({"D"}, {"z", "D"}, {"z", "dpdd", "dpdt"}):
+        AGA8Detail(p=50000, t=400, x=x, properties=properties).run()
+    assert calls == []
+    assert AGA8Detail(p=50000, t=400, x=x, properties={"H"}).run().H == desired.H
+    assert calls == [1]
+
+    with pytest.raises(ValueError):
+        AGA8Detail(p=50000, t=400, x=x, properties={"speed"})
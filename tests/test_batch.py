@@ -0,0 +1,188 @@
+"""Test the vectorised batch implementation of AGA8 Detail."""
+
+from modules.AGA8Detail import AGA8Detail
+from modules.batch import composition_array, evaluation_plan, run_batch, x_terms_batch
+
+import numpy as np
+import pytest
+
+X_C = [
+    0.0,
+    0.77824,
+    0.02,
+    0.06,
+    0.08,
+    0.03,
+    0.0015,
+    0.003,
+    0.0005,
+    0.00165,
+    0.00215,
+    0.00088,
+    0.00024,
+    0.00015,
+    0.00009,
+    0.004,
+    0.005,
+    0.002,
+    0.0001,
+    0.0025,
+    0.007,
+    0.001,
+]
+
+X_UNISIM = [
+    0.0,
+    0.8605181275,
+    0.00468943511,
+    0.021032297039999998,
+    0.0830931073,
+    0.024005787129999998,
+    0.00266965599,
+    0.00310500342,
+    0.00039002352999999997,
+    0.00023977192000000002,
+    3.197816e-05,
+    4.9399800000000004e-06,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+    0.0,
+]
+
+PROPERTIES = [
+    "z",
+    "zd",
+    "D",
+    "P2",
+    "P3",
+    "dpdd",
+    "dpdt",
+    "d2pdd2",
+    "U",
+    "H",
+    "S",
+    "cv",
+    "cp",
+    "W",
+    "G",
+    "JT",
+    "kappa",
+]
+
+
+def test_run_batch_matches_run_for_each_point():
+    """Test AGA8Detail.run_batch() agrees with AGA8Detail.run() evaluated point by point."""
+    P = np.array([50000, 100, 5000, 11672.30591, 20000, 100000])  # Kpa
+    T = np.array([400, 300, 250, 329.1959501, 350, 500])  # K
+
+    actual = AGA8Detail.run_batch(P, T, X_C)
+
+    for i, (p, t) in enumerate(zip(P, T)):
+        desired = AGA8Detail(p=p, t=t, x=X_C).run()
+        for name in PROPERTIES:
+            assert actual[name][i] == pytest.approx(getattr(desired, name), rel=1e-10)
+        assert actual["MM"][i] == desired.MM
+
+    assert actual["ierr"].tolist() == [0] * len(P)
+    assert (actual["niter"] > 0).all()
+
+
+def test_run_batch_flags_failed_points_without_raising():
+    """Test a point that cannot be solved is reported through ierr/herr and returns the ideal gas density."""
+    actual = AGA8Detail.run_batch([0.0, 5000], [300, 300], X_C)
+
+    assert actual["ierr"].tolist() == [1, 0]
+    assert actual["herr"][0].startswith("Calculation failed to converge")
+    assert actual["herr"][1] == ""
+    assert actual["D"][0] == 0
+    assert np.isnan(actual["z"][0])
+    assert not np.isnan(actual["z"][1])
+
+
+def test_run_batch_chunks_do_not_change_results():
+    """Test the results do not depend on how the points are chunked."""
+    P = np.linspace(1000, 30000, 37)
+    T = np.linspace(260, 400, 37)
+    terms = AGA8Detail(p=None, t=None, x=X_C).molar_mass_detail().x_terms_detail().composition_terms()
+
+    whole = run_batch(P, T, composition_array(X_C), terms)
+    chunked = run_batch(P, T, composition_array(X_C), terms, chunksize=5)
+
+    for name in PROPERTIES:
+        np.testing.assert_allclose(whole[name], chunked[name], rtol=1e-13)
+
+
+def test_run_batch_with_a_composition_per_row_matches_run():
+    """Test AGA8Detail.run_batch() with an (N, 21) composition matrix agrees with AGA8Detail.run()."""
+    X = np.array([X_C[1:], X_UNISIM[1:], X_C[1:]])
+    P = np.array([50000, 11672.30591, 5000])  # Kpa
+    T = np.array([400, 329.1959501, 300])  # K
+
+    actual = AGA8Detail.run_batch(P, T, X)
+
+    for i in range(len(P)):
+        desired = AGA8Detail(p=P[i], t=T[i], x=[0.0] + X[i].tolist()).run()
+        for name in PROPERTIES + ["MM"]:
+            assert actual[name][i] == pytest.approx(getattr(desired, name), rel=1e-10)
+
+
+def test_x_terms_batch_matches_x_terms_detail():
+    """Test the vectorised composition terms agree with the scalar x_terms_detail()."""
+    desired = AGA8Detail(p=None, t=None, x=X_C).molar_mass_detail().x_terms_detail()
+
+    actual = x_terms_batch(np.array([X_C[1:]]))
+
+    for name in ["MM", "K3", "U", "G", "Q", "F", "Q2"]:
+        assert getattr(actual, name)[0] == pytest.approx(getattr(desired, name), rel=1e-12)
+    np.testing.assert_allclose(actual.bs[0], desired.bs, rtol=1e-12)
+    np.testing.assert_allclose(actual.csn[0], desired.csn, rtol=1e-12)
+
+
+def test_run_batch_halley_solver_matches_newton():
+    """Test the batch Halley density iteration agrees with the Newton one and with the scalar Halley iteration."""
+    P = np.array([5000, 20000, 30000, 50000, 100000])  # Kpa
+    T = np.array([250, 250, 300, 300, 400])  # K
+
+    newton = AGA8Detail.run_batch(P, T, X_C)
+    halley = AGA8Detail.run_batch(P, T, X_C, solver="halley")
+
+    np.testing.assert_allclose(halley["z"], newton["z"], rtol=1e-12)
+    assert halley["niter"].sum() < newton["niter"].sum()
+    for i, (p, t) in enumerate(zip(P, T)):
+        assert halley["niter"][i] == AGA8Detail(p=p, t=t, x=X_C, solver="halley").run().niter
+
+
+@pytest.mark.parametrize(
+    "properties, plan",
+    [
+        ({"D"}, (False, False, 0)),
+        ({"z", "D"}, (True, False, 0)),
+        ({"dpdt"}, (True, False, 1)),
+        ({"G"}, (True, True, 0)),
+        ({"W", "kappa"}, (True, True, 1)),
+        (None, (True, True, 2)),
+    ],
+)
+def test_run_batch_properties_selection(properties, plan):
+    """Test a property selection is planned with the stages it needs and returns the values of a full run."""
+    P = np.array([50000, 100, 5000, 11672.30591, 0.0])  # Kpa, P = 0 fails
+    T = np.array([400, 300, 250, 329.1959501, 300])  # K
+
+    assert tuple(evaluation_plan(properties)[1:]) == plan
+
+    desired = AGA8Detail.run_batch(P, T, X_C)
+    actual = AGA8Detail.run_batch(P, T, X_C, properties=properties)
+
+    assert set(actual) == set(properties or PROPERTIES + ["A"]) | {"MM", "ierr", "herr", "niter"}
+    for name in actual:
+        np.testing.assert_array_equal(actual[name], desired[name])
+
+    with pytest.raises(ValueError):
+        run_batch(P, T, X_C, properties=["speed"])
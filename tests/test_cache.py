@@ -0,0 +1,89 @@
+"""Test the opt-in caches of the DETAIL method."""
+
+from modules.AGA8Detail import AGA8Detail
+from modules.cache import LRUCache, composition_key
+
+import numpy as np
+import pytest
+
+X = [0.0, 0.9, 0.02, 0.01, 0.05, 0.02] + [0.0] * 16
+
+
+def test_lru_cache_evicts_least_recently_used_entry():
+    """Test the LRU cache keeps at most maxsize entries and counts hits, misses and evictions."""
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+
+    assert cache.get("a") == 1  # "a" is now the most recently used entry
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("b") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 1, "size": 2, "maxsize": 2}
+
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 0
+
+
+def test_lru_cache_rejects_invalid_maxsize():
+    """Test an LRU cache must be able to hold at least one entry."""
+    with pytest.raises(ValueError):
+        LRUCache(maxsize=0)
+
+
+def test_composition_key_is_canonical():
+    """Test lists, tuples and arrays of the same composition share a key."""
+    assert composition_key(X) == composition_key(tuple(X)) == composition_key(np.array(X))
+
+
+def test_run_with_composition_cache_reuses_terms_and_matches_uncached_run():
+    """Test a cached composition skips the composition terms and gives identical results."""
+    cache = LRUCache(maxsize=8)
+
+    first = AGA8Detail(p=5000, t=300, x=X, cache=cache).run()
+    second = AGA8Detail(p=7000, t=320, x=list(X), cache=cache).run()
+    desired = AGA8Detail(p=7000, t=320, x=X).run()
+
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 1
+    assert (second.z, second.D, second.MM, second.W) == (desired.z, desired.D, desired.MM, desired.W)
+    assert first.z != second.z
+
+
+def test_run_with_isotherm_cache_reuses_temperature_terms_and_matches_uncached_run():
+    """Test an isothermal sweep computes the temperature-dependent terms once and gives identical results."""
+    isotherm_cache = LRUCache(maxsize=8)
+
+    for p in [3000, 5000, 7000]:
+        actual = AGA8Detail(p=p, t=300, x=X, isotherm_cache=isotherm_cache).run()
+        desired = AGA8Detail(p=p, t=300, x=X).run()
+        assert (actual.z, actual.D, actual.H, actual.S, actual.cp) == (
+            desired.z,
+            desired.D,
+            desired.H,
+            desired.S,
+            desired.cp,
+        )
+
+    assert isotherm_cache.stats()["misses"] == 1
+    assert isotherm_cache.stats()["hits"] == 2
+
+    AGA8Detail(p=5000, t=310, x=X, isotherm_cache=isotherm_cache).run()
+
+    assert isotherm_cache.stats()["misses"] == 2
+
+
+@pytest.mark.parametrize("isotherm_cache", [None, LRUCache(maxsize=8)])
+def test_changing_x_at_the_same_temperature_recalculates_the_ideal_gas_sums(isotherm_cache):
+    """Test the temperature terms held by a calculator are not reused for another composition at the same T."""
+    other = [0.0, 0.8, 0.05, 0.02, 0.03, 0.02, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+    other += [0.0, 0.08, 0.0, 0.0]  # argon, not present in X
+    calc = AGA8Detail(p=5000, t=300, x=X, isotherm_cache=isotherm_cache).run()
+    calc.x = other
+    calc.run()
+    desired = AGA8Detail(p=5000, t=300, x=other).run()
+
+    assert (calc.z, calc.H, calc.S, calc.G) == (desired.z, desired.H, desired.S, desired.G)
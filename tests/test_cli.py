@@ -0,0 +1,103 @@
+"""Test the command line batch processor."""
+
+import csv
+
+from modules.AGA8Detail import AGA8Detail
+from modules.cli import main
+
+import numpy as np
+import pytest
+
+NAMES = ["Methane", "Nitrogen", "Carbon dioxide", "Ethane", "Propane"]
+X_1 = [0.9, 0.02, 0.01, 0.05, 0.02]
+X_2 = [0.85, 0.03, 0.02, 0.06, 0.04]
+
+
+def _write_input(path):
+    """Write 25 states with two compositions (in mol%) and one failing point (P = 0) to a CSV file."""
+    rows = []
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["time", "P_bar", "T_C"] + NAMES)
+        for i in range(25):
+            x = X_1 if i % 3 else X_2
+            row = [f"t{i}", 0 if i == 4 else 50 + i, 20 + i, *[100 * xi for xi in x]]
+            writer.writerow(row)
+            rows.append(row)
+
+    return rows
+
+
+def test_cli_streams_a_csv_file_in_chunks(tmp_path, capsys):
+    """Test every row is evaluated, mapped and written in input order across several chunks."""
+    rows = _write_input(tmp_path / "states.csv")
+    args = [str(tmp_path / "states.csv"), str(tmp_path / "results.csv"), "--p-column", "P_bar"]
+    args += ["--t-column", "T_C", "--p-factor", "100", "--t-offset", "273.15", "--scale", "100"]
+    args += ["--keep", "time", "--outputs", "z,W,ierr", "--chunksize", "10"]
+
+    assert main(args) == 0
+
+    with open(tmp_path / "results.csv", newline="") as file:
+        results = list(csv.DictReader(file))
+    assert len(results) == len(rows)
+    for row, result in zip(rows, results):
+        x = [0.0] + [float(value) / 100 for value in row[3:]] + [0.0] * 16
+        desired = AGA8Detail(p=float(row[1]) * 100, t=float(row[2]) + 273.15, x=x).run()
+        assert result["time"] == row[0]
+        assert int(result["ierr"]) == desired.ierr
+        if desired.ierr == 0:
+            assert float(result["z"]) == pytest.approx(desired.z, rel=1e-10)
+            assert float(result["W"]) == pytest.approx(desired.W, rel=1e-10)
+    assert "Processed 25 rows in 3 chunks, 1 failed to converge" in capsys.readouterr().err
+
+
+def test_cli_writes_parquet(tmp_path):
+    """Test a Parquet input is read in row groups and the results are written to Parquet."""
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pa.table({"P": [5000.0, 7000.0], "T": [300.0, 310.0], **{n: [x, x] for n, x in zip(NAMES, X_1)}})
+    pq.write_table(table, tmp_path / "states.parquet")
+
+    main([str(tmp_path / "states.parquet"), str(tmp_path / "results.parquet"), "--quiet"])
+
+    actual = pq.read_table(tmp_path / "results.parquet").column("z").to_numpy()
+    desired = AGA8Detail.run_batch([5000.0, 7000.0], [300.0, 310.0], [0.0] + X_1 + [0.0] * 16)["z"]
+    np.testing.assert_allclose(actual, desired, rtol=1e-12)
+
+
+@pytest.mark.parametrize("value", ["", "n/a"])
+def test_cli_reports_the_row_and_column_of_a_non_numeric_value(tmp_path, value):
+    """Test an empty or non-numeric cell stops the run with its row number and column name."""
+    rows = _write_input(tmp_path / "states.csv")
+    rows[13][2] = value
+    with open(tmp_path / "states.csv", "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["time", "P_bar", "T_C"] + NAMES)
+        writer.writerows(rows)
+
+    args = [str(tmp_path / "states.csv"), str(tmp_path / "results.csv"), "--p-column", "P_bar"]
+    args += ["--t-column", "T_C", "--scale", "100", "--chunksize", "10", "--quiet"]
+    with pytest.raises(SystemExit, match=f"Row 14 of the input file: column 'T_C' holds {value!r}"):
+        main(args)
+
+
+def test_cli_rejects_a_short_row_and_skips_blank_lines(tmp_path):
+    """Test a row missing values stops the run with its line number, while blank lines are skipped."""
+    rows = _write_input(tmp_path / "states.csv")
+    with open(tmp_path / "states.csv", "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["time", "P_bar", "T_C"] + NAMES)
+        writer.writerows(rows[:5])
+        file.write("\r\n")  # a blank line, line 7
+        writer.writerows(rows[5:])
+
+    args = [str(tmp_path / "states.csv"), str(tmp_path / "results.csv"), "--p-column", "P_bar"]
+    args += ["--t-column", "T_C", "--scale", "100", "--chunksize", "10", "--quiet"]
+    assert main(args) == 0
+    with open(tmp_path / "results.csv", newline="") as file:
+        assert len(list(csv.DictReader(file))) == len(rows)
+
+    with open(tmp_path / "states.csv", "a", newline="") as file:
+        csv.writer(file).writerow(rows[0][:-2])  # line 28
+    with pytest.raises(ValueError, match="Line 28 of the input file has 6 values, expected 8"):
+        main(args)
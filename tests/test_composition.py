@@ -0,0 +1,60 @@
+"""Test the immutable gas composition type."""
+
+import pickle
+
+from modules.AGA8Detail import AGA8Detail
+from modules.cache import composition_key
+from modules.composition import Composition
+from modules.molecule import COMPONENTS
+
+import numpy as np
+import pytest
+
+from test_batch import PROPERTIES, X_C, X_UNISIM
+
+
+def test_composition_construction():
+    """Test building, validating, normalising and hashing a Composition."""
+    gas = Composition(X_C)
+    assert gas == tuple(X_C)
+    assert Composition(X_C[1:]) == gas
+    assert Composition(np.asarray(X_C)) == gas
+    assert Composition.from_names(dict(zip(COMPONENTS, X_C[1:]))) == gas
+    assert hash(Composition(list(X_C))) == hash(gas)
+    assert composition_key(gas) == composition_key(X_C)
+    assert gas.nonzero == tuple(i for i in range(1, 22) if X_C[i] > 0)
+    assert gas.as_dict() == {COMPONENTS[i - 1]: X_C[i] for i in gas.nonzero}
+    assert gas.MM == AGA8Detail(p=None, t=None, x=X_C).molar_mass_detail().MM
+    assert gas.is_normalised
+    assert pickle.loads(pickle.dumps(gas)).nonzero == gas.nonzero
+
+    unisim = Composition(X_UNISIM)
+    assert not unisim.is_normalised
+    normalised = Composition(X_UNISIM, normalise=True)
+    assert normalised.is_normalised
+    assert normalised.nonzero == unisim.nonzero
+
+    with pytest.raises(AttributeError):
+        gas.MM = 0
+    for bad in ({"Methan": 1.0}, [1.0] * 20, [0.0] * 21, [-0.1] + [0.1] * 20, [float("nan")] * 21):
+        with pytest.raises(ValueError):
+            Composition(bad)
+
+
+@pytest.mark.parametrize("x", [X_C, X_UNISIM])
+def test_composition_results(x):
+    """Test that a Composition gives the same results as the list and that its terms are calculated once."""
+    gas = Composition(x)
+    reference = AGA8Detail(p=5000, t=300, x=x).run()
+    calc = AGA8Detail(p=5000, t=300, x=gas).run()
+    for prop in PROPERTIES + ["MM"]:
+        assert getattr(calc, prop) == getattr(reference, prop)
+
+    terms = gas.terms
+    assert AGA8Detail(p=6000, t=310, x=gas).composition_detail().composition_terms() == terms
+    assert gas.terms is terms
+
+    results = AGA8Detail.run_batch([5000, 6000], [300, 310], gas)
+    expected = AGA8Detail.run_batch([5000, 6000], [300, 310], x)
+    for prop in PROPERTIES:
+        assert np.array_equal(results[prop], expected[prop])
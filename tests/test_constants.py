@@ -0,0 +1,109 @@
+"""Test the shared DETAIL constants."""
+
+import json
+import struct
+import subprocess
+import sys
+
+from modules.AGA8Detail import AGA8Detail
+from modules.constants import (
+    CONSTANTS_MAGIC,
+    DetailConstants,
+    build_constants,
+    get_constants,
+    load_constants,
+    write_constants,
+)
+
+import pytest
+
+
+def _identical(a, b):
+    """Return True if two nested tables hold the same values with the same types."""
+    if isinstance(a, tuple):
+        return isinstance(b, tuple) and len(a) == len(b) and all(_identical(u, v) for u, v in zip(a, b))
+
+    return type(a) is type(b) and a == b
+
+
+def test_constants_are_built_once_and_shared_by_all_instances():
+    """Test every AGA8Detail instance references the same process-wide tables."""
+    x = [0.0, 1.0] + [0.0] * 20
+
+    first = AGA8Detail(p=5000, t=300, x=x)
+    second = AGA8Detail(p=6000, t=310, x=x)
+
+    assert get_constants() is get_constants()
+    assert first.bsnij2 is second.bsnij2 is get_constants().bsnij2
+    assert "bsnij2" not in vars(first)
+
+
+def test_constants_are_read_only():
+    """Test the shared tables cannot be rebound or mutated by a calculation."""
+    constants = get_constants()
+
+    with pytest.raises(AttributeError):
+        constants.n0i = None
+
+    with pytest.raises(TypeError):
+        constants.n0i[1][3] = 0.0
+
+
+def test_run_does_not_shift_shared_ideal_gas_terms():
+    """Test that running a calculation leaves the already shifted n0i table untouched."""
+    x = [0.0, 1.0] + [0.0] * 20
+    n0i_before = get_constants().n0i
+
+    AGA8Detail(p=5000, t=300, x=x).run()
+    AGA8Detail(p=5000, t=300, x=x).run()
+
+    assert get_constants().n0i == n0i_before
+    assert n0i_before[1][3] == pytest.approx(3.00088)
+
+
+def test_constants_file(tmp_path):
+    """Test the shipped constants file matches build_constants() and that damaged files are rejected."""
+    built = build_constants()
+    shipped = load_constants()  # regenerate with python -m modules.constants if this fails
+    for name in DetailConstants.__slots__:
+        assert _identical(getattr(shipped, name), getattr(built, name)), name
+
+    path = tmp_path / "constants.bin"
+    write_constants(path, built)
+    loaded = load_constants(path)
+    assert all(_identical(getattr(loaded, name), getattr(built, name)) for name in DetailConstants.__slots__)
+
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 1
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="checksum"):
+        load_constants(path)
+    path.write_bytes(b"not a constants file")
+    with pytest.raises(ValueError):
+        load_constants(path)
+    path.write_bytes(CONSTANTS_MAGIC + bytes(12 - len(CONSTANTS_MAGIC)))  # too short for the header length
+    with pytest.raises(ValueError, match="header"):
+        load_constants(path)
+
+    # a valid checksum but a header missing a key
+    write_constants(path, built)
+    data = path.read_bytes()
+    start = len(CONSTANTS_MAGIC) + 8
+    (length,) = struct.unpack_from("<Q", data, len(CONSTANTS_MAGIC))
+    header = json.loads(data[start : start + length])
+    del header["byteorder"]
+    encoded = json.dumps(header).encode().ljust(length)
+    path.write_bytes(data[:start] + encoded + data[start + length :])
+    with pytest.raises(ValueError, match="header"):
+        load_constants(path)
+
+
+def test_import_and_first_run_do_not_load_numpy():
+    """Test that importing the scalar calculator and running one state load neither NumPy nor the initialisation module."""
+    code = (
+        "import sys, modules.AGA8Detail; print('numpy' in sys.modules, 'modules.initialise' in sys.modules); "
+        "x = [0.0, 0.9, 0.02, 0.01, 0.05, 0.02] + [0.0] * 16; "
+        "print(modules.AGA8Detail.AGA8Detail(p=5000, t=300, x=x).run().ierr, 'numpy' in sys.modules)"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.split() == ["False", "False", "0", "False"]
@@ -0,0 +1,70 @@
+"""Test the PH and PS flash calculations."""
+
+from modules.AGA8Detail import AGA8Detail
+from modules.flash import flash_ph_batch, flash_ps_batch
+
+import numpy as np
+import pytest
+
+from test_batch import PROPERTIES, X_C
+
+P = np.linspace(1000, 15000, 40)  # Kpa
+T = np.linspace(260, 380, 40)  # K
+
+
+@pytest.mark.parametrize("flash, name", [("flash_ph", "H"), ("flash_ps", "S")])
+def test_flash_recovers_temperature(flash, name):
+    """Test that a flash at the enthalpy or entropy of a state returns that state, warm starts save iterations."""
+    reference = AGA8Detail(p=8000, t=310, x=X_C).run()
+    calc = getattr(AGA8Detail(p=8000, t=250, x=X_C), flash)(getattr(reference, name))
+    assert calc.ierr == 0
+    assert calc.T == pytest.approx(310, rel=1e-9)
+    for prop in PROPERTIES:
+        assert getattr(calc, prop) == pytest.approx(getattr(reference, prop), rel=1e-7, abs=1e-9)
+
+    # a converged calculator starts the next flash of a nearby state from its T and D
+    cold = getattr(AGA8Detail(p=7500, t=250, x=X_C), flash)(getattr(reference, name))
+    calc.P = 7500
+    getattr(calc, flash)(getattr(reference, name))
+    assert calc.T == pytest.approx(cold.T, rel=1e-9)
+    assert calc.nflash < cold.nflash
+
+    # the first density iteration also starts from the converged density: a flash to the state itself
+    # takes one temperature iteration and a single density iteration
+    calc = AGA8Detail(p=8000, t=310, x=X_C).run()
+    assert calc.niter > 1
+    getattr(calc, flash)(getattr(reference, name))
+    assert (calc.ierr, calc.nflash, calc.niter) == (0, 1, 1)
+
+    calc = getattr(AGA8Detail(p=8000, t=250, x=X_C), flash)(getattr(reference, name), maxiter=1)
+    assert calc.ierr == 2
+
+    # the outputs the flash needs are calculated without changing the selection of later calculations
+    calc = getattr(AGA8Detail(p=8000, t=250, x=X_C, properties={"z", "D"}), flash)(getattr(reference, name))
+    assert calc.T == pytest.approx(310, rel=1e-9)
+    assert set(calc.plan.outputs) == set(AGA8Detail(p=8000, t=250, x=X_C, properties={"z", "D"}).plan.outputs)
+    assert calc.run().result().cp is None
+
+
+@pytest.mark.parametrize("flash, name", [(flash_ph_batch, "H"), (flash_ps_batch, "S")])
+def test_flash_batch(flash, name):
+    """Test that the batch flash recovers the temperatures of run_batch() states and agrees with the scalar flash."""
+    reference = AGA8Detail.run_batch(P, T, X_C)
+    results = flash(P, reference[name], X_C, chunksize=16)
+    assert not results["ierr"].any()
+    assert np.allclose(results["T"], T, rtol=1e-9, atol=0)
+    for prop in PROPERTIES:
+        assert np.allclose(results[prop], reference[prop], rtol=1e-7, atol=1e-9)
+
+    calc = getattr(AGA8Detail(p=P[7] * 0.7, t=300, x=X_C), f"flash_p{name.lower()}")(reference[name][7])
+    other = flash(P[7] * 0.7, reference[name][7], X_C)
+    assert other["T"][0] == pytest.approx(calc.T, rel=1e-12)
+    assert other["niter"][0] == calc.nflash
+
+    warm = flash(P, reference[name], X_C, t0=T * 1.01, d0=reference["D"])
+    assert np.allclose(warm["T"], T, rtol=1e-9, atol=0)
+    assert warm["niter"].sum() < results["niter"].sum()
+
+    failed = flash(P, reference[name], X_C, t0=250, maxiter=1)
+    assert (failed["ierr"] == 2).all()
+    assert np.isnan(failed["z"]).all()
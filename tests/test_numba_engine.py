@@ -0,0 +1,69 @@
+"""Test the optional Numba-compiled engine."""
+
+from modules import numba_engine
+from modules.AGA8Detail import AGA8Detail
+
+import numpy as np
+import pytest
+
+from test_batch import PROPERTIES, X_C, X_UNISIM
+
+
+def test_numba_engine_matches_run_for_each_point():
+    """Test the compiled engine reproduces AGA8Detail.run() point by point, including a failed point."""
+    pytest.importorskip("numba")
+    P = np.array([50000, 100, 5000, 11672.30591, 20000, 100000, 0.0])  # Kpa
+    T = np.array([400, 300, 250, 329.1959501, 350, 500, 300])  # K
+
+    actual = AGA8Detail.run_batch(P, T, X_C, engine="numba")
+
+    for i, (p, t) in enumerate(zip(P[:-1], T[:-1])):
+        desired = AGA8Detail(p=p, t=t, x=X_C).run()
+        for name in PROPERTIES + ["MM", "niter"]:
+            assert actual[name][i] == getattr(desired, name)
+    assert actual["ierr"].tolist() == [0] * 6 + [1]
+    assert actual["D"][-1] == 0
+    assert np.isnan(actual["z"][-1])
+
+
+def test_numba_engine_with_a_composition_per_row_and_halley_solver():
+    """Test the compiled engine agrees with the NumPy engine for per-row compositions and the Halley iteration."""
+    pytest.importorskip("numba")
+    X = np.array([X_C[1:], X_UNISIM[1:], X_C[1:]])
+    P = np.array([50000, 11672.30591, 5000])  # Kpa
+    T = np.array([400, 329.1959501, 300])  # K
+
+    for solver in ["newton", "halley"]:
+        actual = AGA8Detail.run_batch(P, T, X, solver=solver, engine="numba")
+        desired = AGA8Detail.run_batch(P, T, X, solver=solver)
+
+        for name in PROPERTIES + ["MM"]:
+            np.testing.assert_allclose(actual[name], desired[name], rtol=1e-10)
+        assert actual["niter"].tolist() == desired["niter"].tolist()
+
+
+def test_numba_engine_falls_back_to_numpy_without_numba(monkeypatch):
+    """Test selecting the numba engine without Numba installed warns and uses the NumPy engine."""
+    monkeypatch.setattr(numba_engine, "HAVE_NUMBA", False)
+
+    with pytest.warns(RuntimeWarning):
+        actual = AGA8Detail.run_batch([5000, 20000], [300, 350], X_C, engine="numba")
+
+    desired = AGA8Detail.run_batch([5000, 20000], [300, 350], X_C)
+    for name in PROPERTIES:
+        np.testing.assert_array_equal(actual[name], desired[name])
+
+
+def test_numba_engine_properties_selection():
+    """Test the compiled engine returns the selected properties with the values of a full run."""
+    pytest.importorskip("numba")
+    P = np.array([50000, 100, 5000, 0.0])  # Kpa
+    T = np.array([400, 300, 250, 300])  # K
+
+    desired = AGA8Detail.run_batch(P, T, X_C, engine="numba")
+    for properties in [{"D"}, {"z", "D"}, {"W", "kappa"}]:
+        actual = AGA8Detail.run_batch(P, T, X_C, engine="numba", properties=properties)
+
+        assert set(actual) == properties | {"MM", "ierr", "herr", "niter"}
+        for name in actual:
+            np.testing.assert_array_equal(actual[name], desired[name])
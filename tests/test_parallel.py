@@ -0,0 +1,42 @@
+"""Test the multi-process evaluation of large batches."""
+
+from modules.AGA8Detail import AGA8Detail
+from modules.parallel import auto_chunksize, compute_parallel
+
+import numpy as np
+
+from test_batch import PROPERTIES, X_C, X_UNISIM
+
+
+def test_compute_parallel_returns_results_in_input_order():
+    """Test the results of a pool of workers match AGA8Detail.run_batch() point by point, failures included."""
+    P = np.linspace(0, 30000, 41)  # Kpa, P = 0 fails
+    T = np.linspace(400, 260, 41)  # K
+
+    actual = compute_parallel(P, T, X_C, workers=2, chunksize=7)
+    desired = AGA8Detail.run_batch(P, T, X_C)
+
+    for name in PROPERTIES + ["MM"]:
+        np.testing.assert_allclose(actual[name], desired[name], rtol=1e-13)
+    assert actual["ierr"].tolist() == desired["ierr"].tolist()
+    assert actual["herr"].tolist() == desired["herr"].tolist()
+    assert actual["ierr"][0] == 1
+
+
+def test_compute_parallel_with_a_composition_per_row():
+    """Test per-row compositions are sent with their chunks."""
+    X = np.array([X_C[1:], X_UNISIM[1:]] * 5)
+    P = np.linspace(1000, 20000, 10)  # Kpa
+    T = np.linspace(280, 350, 10)  # K
+
+    actual = compute_parallel(P, T, X, workers=2, chunksize=3)
+    desired = AGA8Detail.run_batch(P, T, X)
+
+    for name in PROPERTIES + ["MM"]:
+        np.testing.assert_allclose(actual[name], desired[name], rtol=1e-13)
+
+
+def test_auto_chunksize_spreads_points_over_the_workers():
+    """Test large batches give every worker several chunks and small ones are not over-split."""
+    assert auto_chunksize(10_000_000, 64) == 39063
+    assert auto_chunksize(100, 64) == 1024
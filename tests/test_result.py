@@ -0,0 +1,70 @@
+"""Test the compact result records."""
+
+import pickle
+
+from modules.AGA8Detail import AGA8Detail
+from modules.flash import flash_ph_batch
+from modules.result import DetailResult, to_structured
+from modules.sensitivity import composition_gradient_batch
+
+import numpy as np
+import pytest
+
+from test_batch import PROPERTIES, X_C
+
+
+def test_detail_result_is_a_compact_immutable_copy_of_run():
+    """Test AGA8Detail.result() copies the outputs into a slotted, immutable and picklable record."""
+    calc = AGA8Detail(p=5000, t=300, x=X_C).run()
+
+    actual = calc.result()
+
+    for name in PROPERTIES + ["MM", "ierr", "herr", "niter"]:
+        assert actual[name] == getattr(calc, name)
+        assert getattr(actual, name) == getattr(calc, name)
+    assert (actual.P, actual.T) == (5000, 300)
+    assert not hasattr(actual, "__dict__")
+    with pytest.raises(AttributeError):
+        actual.z = 1.0
+    with pytest.raises(KeyError):
+        actual["x"]
+    assert pickle.loads(pickle.dumps(actual)) == actual
+
+    failed = AGA8Detail(p=0, t=300, x=X_C, properties={"z", "D"}).run().result()
+    assert failed.ierr == 1
+    assert failed.z is None
+    assert failed.D == 0
+    assert failed.W is None  # not selected
+
+
+def test_batch_results_pack_into_a_structured_array():
+    """Test run_batch() results convert into a structured array and into per-point records."""
+    P = np.array([5000, 20000, 0.0])  # Kpa, P = 0 fails
+    T = np.array([300, 350, 300])  # K
+    results = AGA8Detail.run_batch(P, T, X_C, properties={"z", "D"})
+
+    actual = to_structured(results)
+
+    assert actual.dtype.names == ("z", "D", "MM", "ierr", "niter")
+    assert actual["ierr"].dtype == np.int8
+    np.testing.assert_array_equal(actual["z"], results["z"])
+
+    point = DetailResult.from_batch(results, 1, P[1], T[1])
+    assert point.z == results["z"][1]
+    assert isinstance(point.niter, int)
+    assert point.W is None
+
+
+def test_detail_result_from_flash_and_sensitivity_batches():
+    """Test per-point records of the flash and composition sensitivity batches, which carry extra columns."""
+    P = np.array([5000.0, 8000.0])  # Kpa
+    H = AGA8Detail.run_batch(P, np.array([300.0, 320.0]), X_C)["H"]
+    results = flash_ph_batch(P, H, X_C)
+
+    point = DetailResult.from_batch(results, 1, P[1])
+    assert point.ierr == 0
+    assert point.T == results["T"][1]
+    assert point.H == results["H"][1]
+
+    point = DetailResult.from_batch(composition_gradient_batch(P, 300, X_C), 0, P[0], 300)
+    assert point.D is not None and point.W is None
@@ -0,0 +1,87 @@
+"""Test the analytic derivatives with respect to composition, P and T."""
+
+from modules.AGA8Detail import AGA8Detail
+from modules.batch import run_batch
+from modules.sensitivity import composition_gradient_batch, jacobian_batch
+
+import numpy as np
+import pytest
+
+from test_batch import X_C, X_UNISIM
+
+P = np.array([500.0, 5000.0, 15000.0])  # Kpa
+T = np.array([250.0, 300.0, 400.0])  # K
+
+
+def finite_difference(x, h=1e-6, normalise=False):
+    """Second order one-sided finite differences of z and D with respect to each mole fraction, shape (3, 21)."""
+    steps = []
+    for i in range(21):
+        for k in (1, 2):
+            xs = x.copy()
+            xs[i] += k * h
+            steps.append(xs / xs.sum() if normalise else xs)
+    X = np.repeat(np.array([x] + steps), P.size, axis=0)
+    results = AGA8Detail.run_batch(np.tile(P, 43), np.tile(T, 43), X)
+
+    gradients = []
+    for name in ("z", "D"):
+        values = results[name].reshape(43, P.size)
+        base, plus, twice = values[0], values[1::2], values[2::2]
+        gradients.append(((-3 * base + 4 * plus - twice) / (2 * h)).T)
+
+    return gradients
+
+
+@pytest.mark.parametrize("x", [X_C, X_UNISIM])
+@pytest.mark.parametrize("normalise", [False, True])
+def test_composition_gradient(x, normalise):
+    """Test the analytic d(Z)/d(xi) and d(D)/d(xi) against finite differences, in batch and scalar form."""
+    x = np.asarray(x, dtype=float)[1:]
+    if normalise:
+        x = x / x.sum()
+    results = composition_gradient_batch(P, T, x, normalise=normalise)
+    dzdx, dddx = finite_difference(x, normalise=normalise)
+    assert not results["ierr"].any()
+    assert np.allclose(results["dzdx"], dzdx, rtol=0, atol=1e-7)
+    assert np.allclose(results["dDdx"], dddx, rtol=0, atol=1e-6)
+    if normalise:
+        assert np.allclose(results["dzdx"] @ x, 0, atol=1e-12)
+
+    calc = AGA8Detail(p=P[1], t=T[1], x=[0] + x.tolist()).run().sensitivity_detail(normalise=normalise)
+    assert calc.dzdx[0] == 0
+    assert np.allclose(calc.dzdx[1:], results["dzdx"][1], rtol=1e-12, atol=1e-15)
+    assert np.allclose(calc.dDdx[1:], results["dDdx"][1], rtol=1e-12, atol=1e-15)
+
+    # per-row compositions give the same gradients
+    per_row = composition_gradient_batch(P, T, np.tile(x, (P.size, 1)), normalise=normalise, chunksize=2)
+    assert np.allclose(per_row["dzdx"], results["dzdx"], rtol=1e-12, atol=1e-15)
+
+
+@pytest.mark.parametrize("engine", ["numpy", "numba"])
+@pytest.mark.parametrize("properties", [("z", "D", "H", "S"), ("z",), ("D",), ("H",), ("S",)])
+def test_jacobian(engine, properties):
+    """Test the analytic derivatives with respect to P and T against central finite differences."""
+    p = np.array([100.0, 5000.0, 15000.0, 30000.0])  # Kpa
+    t = np.array([250.0, 300.0, 350.0, 400.0])  # K
+    results = jacobian_batch(p, t, X_C, properties=properties, engine=engine)
+    reference = run_batch(p, t, X_C, properties=properties, engine=engine)
+    assert set(results) == set(properties) | {f"d{n}d{v}" for n in properties for v in "PT"} | {
+        "MM",
+        "ierr",
+        "herr",
+        "niter",
+    }
+    for name in properties:
+        assert np.array_equal(results[name], reference[name])
+
+    h = 1e-4
+    for variable, dp, dt in (("P", h, 0), ("T", 0, h)):
+        plus = AGA8Detail.run_batch(p * (1 + dp), t * (1 + dt), X_C, properties=properties)
+        minus = AGA8Detail.run_batch(p * (1 - dp), t * (1 - dt), X_C, properties=properties)
+        step = 2 * (p * dp + t * dt)
+        for name in properties:
+            assert np.allclose(results[f"d{name}d{variable}"], (plus[name] - minus[name]) / step, rtol=1e-6, atol=0)
+
+    with pytest.raises(ValueError):
+        jacobian_batch(p, t, X_C, properties=("W",))
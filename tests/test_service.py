@@ -0,0 +1,102 @@
+"""Test the asyncio micro-batching service."""
+
+import asyncio
+import json
+
+from modules.AGA8Detail import AGA8Detail
+from modules.service import DetailService, serve_http
+
+import pytest
+
+from test_batch import X_C, X_UNISIM
+
+
+def test_concurrent_requests_are_batched_by_composition():
+    """Test concurrent requests are answered from shared batches with the results of AGA8Detail.run()."""
+    states = [(5000 + 1000 * i, 280 + 5 * i, X_C if i % 2 else X_UNISIM) for i in range(20)]
+
+    async def main():
+        async with DetailService(window=0.05) as service:
+            results = await asyncio.gather(*(service.compute(p, t, x) for p, t, x in states))
+            return results, service.metrics()
+
+    results, metrics = asyncio.run(main())
+
+    for (p, t, x), actual in zip(states, results):
+        desired = AGA8Detail(p=p, t=t, x=x).run()
+        assert actual["z"] == pytest.approx(desired.z, rel=1e-10)
+        assert actual["W"] == pytest.approx(desired.W, rel=1e-10)
+        assert actual["ierr"] == 0
+    assert metrics["requests"] == 20
+    assert metrics["batches"] < 20
+    assert metrics["max_batch_size"] > 1
+    assert metrics["queue_depth"] == 0
+
+
+def test_http_endpoint_computes_points_and_reports_metrics():
+    """Test POST /compute returns JSON results (null for failed points) and GET /metrics the counters."""
+
+    async def request(port, method, path, payload=None):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, data = response.partition(b"\r\n\r\n")
+        return head.split(b" ")[1], json.loads(data)
+
+    async def main():
+        async with DetailService() as service:
+            server = await serve_http(service, port=0)
+            port = server.sockets[0].getsockname()[1]
+            points = [{"P": 5000, "T": 300, "x": X_C}, {"P": 0, "T": 300, "x": X_C}]
+            computed = await request(port, "POST", "/compute", points)
+            metrics = await request(port, "GET", "/metrics")
+            missing = await request(port, "GET", "/nothing")
+            server.close()
+            await server.wait_closed()
+            return computed, metrics, missing
+
+    (status, results), (_, metrics), (missing, _) = asyncio.run(main())
+
+    assert status == b"200"
+    assert results[0]["z"] == pytest.approx(AGA8Detail(p=5000, t=300, x=X_C).run().z, rel=1e-10)
+    assert results[1]["ierr"] == 1
+    assert results[1]["z"] is None
+    assert metrics["requests"] == 2
+    assert missing == b"404"
+
+
+def test_bad_request_does_not_stop_the_service():
+    """Test a malformed composition is rejected with a 400 and the next request is still answered."""
+
+    async def request(port, payload):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = json.dumps(payload).encode()
+        writer.write(f"POST /compute HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, data = response.partition(b"\r\n\r\n")
+        return head.split(b" ")[1], json.loads(data)
+
+    async def main():
+        async with DetailService() as service:
+            server = await serve_http(service, port=0)
+            port = server.sockets[0].getsockname()[1]
+            bad = await request(port, {"P": 5000, "T": 300, "x": "abc"})
+            good = await asyncio.wait_for(request(port, {"P": 5000, "T": 300, "x": X_C}), timeout=10)
+            with pytest.raises(TypeError):
+                await service.compute(5000, 300, 5)
+            result = await asyncio.wait_for(service.compute(5000, 300, X_C), timeout=10)
+            server.close()
+            await server.wait_closed()
+            return bad, good, result
+
+    (bad, _), (status, good), result = asyncio.run(main())
+
+    assert bad == b"400"
+    assert status == b"200"
+    assert good["z"] == pytest.approx(AGA8Detail(p=5000, t=300, x=X_C).run().z, rel=1e-10)
+    assert result.z == good["z"]
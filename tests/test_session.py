@@ -0,0 +1,70 @@
+"""Test the reusable DETAIL calculator session."""
+
+from modules.AGA8Detail import AGA8Detail
+from modules.session import DetailSession
+
+X_1 = [0.0, 0.9, 0.02, 0.01, 0.05, 0.02] + [0.0] * 16
+X_2 = [0.0, 0.85, 0.03, 0.02, 0.06, 0.03, 0.01] + [0.0] * 15
+
+
+def test_session_updates_match_fresh_runs():
+    """Test every update of a session gives exactly the result of a new AGA8Detail(...).run()."""
+    session = DetailSession(p=5000, t=300, x=X_1)
+
+    for p, t, x in [(5000, 300, X_1), (6000, 300, X_1), (6000, 320, X_1), (6000, 320, X_2), (8000, 280, X_2)]:
+        if x is not session.calc.x:
+            actual = session.update_composition(x)
+        actual = session.update(p=p, t=t)
+        desired = AGA8Detail(p=p, t=t, x=x).run()
+
+        for name in ["z", "zd", "D", "P3", "MM", "H", "S", "cp", "W", "JT", "kappa"]:
+            assert actual[name] == getattr(desired, name)
+
+
+def test_session_only_reruns_invalidated_stages(monkeypatch):
+    """Test a pressure update skips the composition terms and an unchanged state reuses the last result."""
+    session = DetailSession(p=5000, t=300, x=X_1)
+    session.result()
+    calls = {"x_terms": 0, "density": 0}
+    x_terms_detail = session.calc.x_terms_detail
+    density_detail = session.calc.density_detail
+
+    def count_x_terms():
+        calls["x_terms"] += 1
+        return x_terms_detail()
+
+    def count_density():
+        calls["density"] += 1
+        return density_detail()
+
+    monkeypatch.setattr(session.calc, "x_terms_detail", count_x_terms)
+    monkeypatch.setattr(session.calc, "density_detail", count_density)
+
+    session.update(p=6000)
+    session.update(p=6000)
+    session.update_composition(X_2)
+
+    assert calls == {"x_terms": 1, "density": 2}
+
+
+def test_session_reports_failed_density_without_stale_properties():
+    """Test a failed density iteration returns ierr=1 and no properties left over from a previous state."""
+    session = DetailSession(p=5000, t=300, x=X_1)
+    session.result()
+
+    actual = session.update(p=0)
+
+    assert actual["ierr"] == 1
+    assert actual["herr"] != ""
+    assert actual["z"] is None
+    assert actual["H"] is None
+
+
+def test_run_can_be_repeated_on_the_same_object():
+    """Test calling run() twice on one AGA8Detail object gives the same result."""
+    AGA8 = AGA8Detail(p=5000, t=300, x=X_1).run()
+    first = (AGA8.z, AGA8.MM, AGA8.W, AGA8.H)
+
+    AGA8.run()
+
+    assert (AGA8.z, AGA8.MM, AGA8.W, AGA8.H) == first
@@ -0,0 +1,73 @@
+"""Test the memory-mapped result store."""
+
+from modules.AGA8Detail import AGA8Detail
+from modules.constants import VERSION
+from modules.store import ResultStore, write_grid
+
+import numpy as np
+import pytest
+
+X = [0.0, 0.9, 0.02, 0.01, 0.05, 0.02] + [0.0] * 16
+
+
+def test_write_grid_round_trips_through_a_read_only_memmap(tmp_path):
+    """Test a written grid is mapped read-only with its header and the results of AGA8Detail.run_batch()."""
+    P = np.array([0.0, 1000, 5000, 20000])  # Kpa, P = 0 fails
+    T = np.array([250, 300, 350])  # K
+
+    write_grid(tmp_path / "grid.aga8", P, T, X, columns=("z", "W", "ierr"))
+    store = ResultStore(tmp_path / "grid.aga8")
+
+    assert store.columns == ["z", "W", "ierr"]
+    assert store.engine_version == VERSION
+    assert store.matches(X)
+    assert not store.matches([0.0, 1.0] + [0.0] * 20)
+    np.testing.assert_array_equal(store.P, P)
+    np.testing.assert_array_equal(store.T, T)
+    assert isinstance(store["z"], np.memmap)
+    for i, p in enumerate(P):
+        desired = AGA8Detail.run_batch(np.full(T.size, p), T, X)
+        np.testing.assert_array_equal(store["z"][i], desired["z"])
+        np.testing.assert_array_equal(store["ierr"][i], desired["ierr"])
+    with pytest.raises(ValueError):
+        store["z"][1, 1] = 0.0
+
+    with pytest.raises(ValueError, match="Unknown column"):
+        write_grid(tmp_path / "unknown.aga8", P, T, X, columns=("z", "density"))
+    assert not (tmp_path / "unknown.aga8").exists()
+
+
+def test_result_store_rejects_other_files(tmp_path):
+    """Test a file without the store header, a truncated store and a store of another engine version are not mapped."""
+    (tmp_path / "other.bin").write_bytes(b"not a result store")
+
+    with pytest.raises(ValueError):
+        ResultStore(tmp_path / "other.bin")
+
+    write_grid(tmp_path / "grid.aga8", [5000.0], [300.0], X)
+    data = (tmp_path / "grid.aga8").read_bytes()
+    (tmp_path / "truncated.aga8").write_bytes(data[:12])
+    with pytest.raises(ValueError, match="truncated.aga8 has a damaged header"):
+        ResultStore(tmp_path / "truncated.aga8")
+
+    old = data.replace(f'"engine_version": "{VERSION}"'.encode(), b'"engine_version": "0.0.0"')
+    (tmp_path / "old.aga8").write_bytes(old)
+    with pytest.raises(ValueError, match="engine version"):
+        ResultStore(tmp_path / "old.aga8")
+
+
+def test_failed_write_leaves_no_file(tmp_path, monkeypatch):
+    """Test a grid whose evaluation fails neither creates nor replaces the store file."""
+    write_grid(tmp_path / "grid.aga8", [5000.0], [300.0], X)
+    before = (tmp_path / "grid.aga8").read_bytes()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("evaluation failed")
+
+    monkeypatch.setattr(AGA8Detail, "run_batch", fail)
+    for name in ("grid.aga8", "new.aga8"):
+        with pytest.raises(RuntimeError):
+            write_grid(tmp_path / name, [5000.0, 6000.0], [300.0], X)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["grid.aga8"]
+    assert (tmp_path / "grid.aga8").read_bytes() == before
@@ -0,0 +1,46 @@
+"""Test the streaming time-series processor."""
+
+from modules.AGA8Detail import AGA8Detail
+from modules.stream import stream
+
+import numpy as np
+import pytest
+
+X_1 = [0.0, 0.9, 0.02, 0.01, 0.05, 0.02] + [0.0] * 16
+X_2 = [0.0, 0.85, 0.03, 0.02, 0.06, 0.03, 0.01] + [0.0] * 15
+
+
+def test_stream_warm_start_agrees_with_run_in_fewer_iterations():
+    """Test warm-started results agree with AGA8Detail.run() and need fewer iterations than cold starts."""
+    steps = np.arange(200)
+    P = 5000 + 50 * np.sin(steps / 20)  # Kpa
+    T = 300 + np.cos(steps / 30)  # K
+    records = [(i, P[i], T[i]) for i in steps]
+
+    cold = list(stream(iter(records), x=X_1, warm_start=False))
+    warm = list(stream(iter(records), x=X_1))
+
+    for i in steps[::20]:
+        desired = AGA8Detail(p=P[i], t=T[i], x=X_1).run()
+        assert cold[i]["z"] == desired.z
+        assert warm[i]["z"] == pytest.approx(desired.z, rel=1e-12)
+        assert warm[i]["timestamp"] == i
+    assert sum(r["niter"] for r in warm) < sum(r["niter"] for r in cold)
+
+
+def test_stream_follows_a_change_of_composition():
+    """Test records carrying their own composition are evaluated with it."""
+    records = [("t0", 5000, 300, X_1), ("t1", 5000, 300, X_2), ("t2", 6000, 310)]
+
+    actual = list(stream(records, x=X_1))
+
+    assert actual[0]["MM"] == AGA8Detail(p=5000, t=300, x=X_1).run().MM
+    assert actual[1]["MM"] == AGA8Detail(p=5000, t=300, x=X_2).run().MM
+    assert actual[2]["MM"] == actual[0]["MM"]
+    assert actual[2]["z"] == pytest.approx(AGA8Detail(p=6000, t=310, x=X_1).run().z, rel=1e-12)
+
+
+def test_stream_requires_a_composition():
+    """Test a record without a composition raises when no default composition is given."""
+    with pytest.raises(ValueError):
+        next(stream([(0, 5000, 300)]))
@@ -0,0 +1,58 @@
+"""Test the interpolated property tables."""
+
+from modules.AGA8Detail import AGA8Detail
+from modules.table import PropertyTable
+
+import numpy as np
+import pytest
+
+X = [0.0, 0.9, 0.02, 0.01, 0.05, 0.02] + [0.0] * 16
+
+
+def test_property_table_is_within_its_tolerance():
+    """Test a table matches AGA8Detail.run_batch() to tol inside its domain and returns NaN outside it."""
+    tol = 1e-5
+    table = PropertyTable.build(X, (100, 10000), (260, 340), properties=("z", "D", "W"), tol=tol)
+
+    assert set(table.max_error) == {"z", "D", "W"}
+    assert max(table.max_error.values()) <= tol
+
+    rng = np.random.default_rng(42)
+    p = rng.uniform(100, 10000, 500)  # kPa
+    t = rng.uniform(260, 340, 500)  # K
+    actual = table(p, t)
+    desired = AGA8Detail.run_batch(p, t, X)
+    for name in ("z", "D", "W"):
+        np.testing.assert_allclose(actual[name], desired[name], rtol=tol)
+
+    # nodes are reproduced exactly, up to rounding
+    np.testing.assert_allclose(table(table.P[3], table.T[2], ["z"])["z"], table.values[0, 3, 2], rtol=1e-12)
+
+    outside = table([50, 5000, 5000], [300, 250, 400])
+    assert np.isnan(outside["z"]).all()
+
+
+def test_property_table_reports_an_unreachable_tolerance():
+    """Test building a table fails when max_nodes is too small for tol."""
+    with pytest.raises(ValueError):
+        PropertyTable.build(X, (100, 10000), (260, 340), properties=("z",), tol=1e-9, max_nodes=17)
+
+
+def test_refinement_evaluates_each_node_once(monkeypatch):
+    """Test each refinement pass only evaluates new points, and the merged grid equals a fresh evaluation."""
+    points = []
+    run_batch = AGA8Detail.run_batch
+
+    def recording_run_batch(p, t, x, **kwargs):
+        points.extend(zip(p.tolist(), t.tolist()))
+        return run_batch(p, t, x, **kwargs)
+
+    monkeypatch.setattr(AGA8Detail, "run_batch", recording_run_batch)
+    table = PropertyTable.build(X, (100, 10000), (260, 340), properties=("z", "W"), tol=1e-6, validation_points=10)
+
+    assert table.P.size > 9 and table.T.size > 9  # both axes were refined
+    assert len(points) == len(set(points))
+    p, t = np.meshgrid(table.P, table.T, indexing="ij")
+    desired = run_batch(p.ravel(), t.ravel(), X, properties=("z", "W"))
+    for k, name in enumerate(("z", "W")):
+        np.testing.assert_allclose(table.values[k].ravel(), desired[name], rtol=1e-14)
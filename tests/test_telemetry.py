@@ -0,0 +1,64 @@
+"""Test the opt-in pipeline instrumentation."""
+
+from modules.AGA8Detail import AGA8Detail
+from modules.cache import LRUCache
+from modules.telemetry import Telemetry
+
+import numpy as np
+
+from test_batch import PROPERTIES, X_C
+
+P = [0.0, 100, 5000, 50000, 100000]  # Kpa, P = 0 fails
+T = [100, 150, 300]  # K, the low temperatures need creep steps or fail
+
+
+def test_telemetry_records_scalar_stages_iterations_and_failures():
+    """Test an instrumented calculator gives the same results and records what its density iterations did."""
+    telemetry = Telemetry()
+    cache = LRUCache()
+    niters = []
+    for p in P:
+        for t in T:
+            calc = AGA8Detail(p=p, t=t, x=X_C, cache=cache, telemetry=telemetry).run()
+            desired = AGA8Detail(p=p, t=t, x=X_C).run()
+            for name in PROPERTIES + ["ierr", "niter"]:
+                assert getattr(calc, name) == getattr(desired, name)
+            niters.append(calc.niter)
+
+    metrics = telemetry.as_dict()
+
+    assert metrics["stages"]["density"]["calls"] == len(P) * len(T)
+    assert metrics["stages"]["x_terms"]["calls"] == 1  # every other composition comes from the cache
+    assert metrics["density"]["points"] == len(niters)
+    assert metrics["density"]["iterations"] == {n: niters.count(n) for n in set(niters)}
+    assert metrics["density"]["creep"] > 0
+    assert metrics["density"]["failures"]["zero_pressure"] == len(T)
+    assert sum(metrics["density"]["failures"].values()) > len(T)
+    assert metrics["caches"]["composition"]["hit_rate"] == 14 / 15
+
+    text = telemetry.prometheus()
+    assert 'aga8_detail_stage_calls_total{stage="density"} 15' in text
+    assert 'aga8_detail_density_iterations_bucket{le="+Inf"} 15' in text
+    assert f'aga8_detail_density_failures_total{{cause="zero_pressure"}} {len(T)}' in text
+    assert 'aga8_detail_cache_hits_total{cache="composition"} 14' in text
+
+    telemetry.reset()
+    assert telemetry.as_dict()["density"]["points"] == 0
+
+
+def test_telemetry_records_batches():
+    """Test a batch records the same failure causes as the scalar calculations of its points."""
+    p, t = (a.ravel() for a in np.meshgrid(P, T))
+    scalar = Telemetry()
+    for pi, ti in zip(p, t):
+        AGA8Detail(p=pi, t=ti, x=X_C, telemetry=scalar).run()
+    batch = Telemetry()
+
+    results = AGA8Detail.run_batch(p, t, X_C, telemetry=batch)
+
+    metrics = batch.as_dict()
+    assert set(metrics["stages"]) == {"density", "properties"}
+    assert metrics["density"]["points"] == p.size
+    assert sum(n * c for n, c in metrics["density"]["iterations"].items()) == results["niter"].sum()
+    assert metrics["density"]["failures"] == scalar.as_dict()["density"]["failures"]
+    assert metrics["density"]["creep"] > 0